@@ -0,0 +1,295 @@
+"""
+Forma canônica de endereços digitados e tabela persistente de apelidos.
+
+"Av. Paulista, 1000" e "avenida paulista 1000 " viram o mesmo texto
+("avenida paulista 1000"), então o cache de rotas e as consultas à Routes
+API tratam os dois como o mesmo lugar. Apelidos ("Escritório") apontam para
+um endereço e ficam guardados num SQLite em data/.
+
+Uso (na raiz do projeto):
+    python3 -m app.address_normalizer show "Av. Paulista, nº 1000"
+    python3 -m app.address_normalizer add "Escritório" "Av. Paulista, 1000"
+    python3 -m app.address_normalizer list
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+
+# Tipos de logradouro abreviados (valem no começo de cada parte do endereço)
+STREET_TYPES = {
+    "al": "alameda",
+    "av": "avenida",
+    "ave": "avenida",
+    "bc": "beco",
+    "cond": "condominio",
+    "est": "estrada",
+    "estr": "estrada",
+    "jd": "jardim",
+    "lgo": "largo",
+    "lg": "largo",
+    "pc": "praca",
+    "pca": "praca",
+    "pq": "parque",
+    "r": "rua",
+    "rod": "rodovia",
+    "tv": "travessa",
+    "trav": "travessa",
+    "vl": "vila",
+}
+
+# Títulos abreviados em nomes de ruas (valem em qualquer posição)
+TITLES = {
+    "brig": "brigadeiro",
+    "cel": "coronel",
+    "dr": "doutor",
+    "dra": "doutora",
+    "eng": "engenheiro",
+    "gen": "general",
+    "gov": "governador",
+    "pres": "presidente",
+    "prof": "professor",
+    "profa": "professora",
+    "sta": "santa",
+    "sto": "santo",
+    "ten": "tenente",
+}
+
+# Marcadores de número ("nº 1000", "n. 1000") descartados antes de um número
+NUMBER_MARKERS = {"n", "no", "num", "numero"}
+
+_CEP = re.compile(r"\b(\d{5})-(\d{3})\b")
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def canonicalize_address(text):
+    """
+    Converte um endereço na forma canônica usada como chave: sem acentos,
+    minúsculo, abreviações por extenso, sem pontuação e espaços colapsados.
+
+    Args:
+        text (str): Endereço como digitado
+
+    Returns:
+        str: Endereço canônico (ex.: "avenida paulista 1000")
+    """
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = _CEP.sub(r"\1\2", text)
+
+    words = []
+    for part in text.split(","):
+        tokens = _NON_WORD.sub(" ", part).split()
+        for i, token in enumerate(tokens):
+            if i == 0 and token in STREET_TYPES:
+                token = STREET_TYPES[token]
+            elif token in TITLES:
+                token = TITLES[token]
+            elif token in NUMBER_MARKERS and i + 1 < len(tokens) and tokens[i + 1][0].isdigit():
+                continue
+            words.append(token)
+    return " ".join(words)
+
+
+class AddressNormalizer:
+    """
+    Resolve endereços digitados para a forma canônica, consultando antes a
+    tabela persistente de apelidos (SQLite).
+
+    Os resultados ficam memorizados e os contadores mostram quantas consultas
+    foram resolvidas por apelido e quantas a forma canônica juntou com outra
+    grafia do mesmo endereço.
+    """
+
+    # Endereços memorizados antes de esvaziar a memória de resultados
+    MAX_MEMO = 10_000
+
+    def __init__(self, path, clock=time.time):
+        """
+        Args:
+            path (str): Caminho do arquivo SQLite (ex.: data/addresses.sqlite3)
+            clock (callable): Fonte de tempo (injetável nos testes)
+        """
+        self.path = path
+        self.clock = clock
+        self.lookups = 0
+        self.alias_hits = 0
+        self.folded = 0
+        self._memo = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS aliases ("
+            " alias TEXT PRIMARY KEY,"
+            " address TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " address_text TEXT)"
+        )
+        # address_text: o endereço como foi digitado no add_alias, enviado à
+        # Routes API (bancos anteriores não têm a coluna; usam o canônico)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(aliases)")]
+        if "address_text" not in columns:
+            self._conn.execute("ALTER TABLE aliases ADD COLUMN address_text TEXT")
+        self._conn.commit()
+
+    def resolve(self, text):
+        """
+        Devolve a forma canônica do endereço, seguindo um apelido se houver.
+        """
+        with self._lock:
+            address, from_alias, folded, _ = self._lookup(text)
+            self.lookups += 1
+            if from_alias:
+                self.alias_hits += 1
+            elif folded:
+                self.folded += 1
+            return address
+
+    def request_address(self, text):
+        """
+        Texto a enviar à Routes API: o endereço para o qual o apelido aponta
+        (a API não sabe o que é "Escritório"), ou o próprio texto digitado.
+        """
+        with self._lock:
+            return self._lookup(text)[3]
+
+    def _lookup(self, text):
+        # (forma canônica, veio de apelido, grafia diferente da simples,
+        #  texto para a Routes API)
+        memo = self._memo.get(text)
+        if memo is None:
+            canonical = canonicalize_address(text)
+            row = self._conn.execute(
+                "SELECT address, address_text FROM aliases WHERE alias = ?", (canonical,)
+            ).fetchone()
+            memo = (
+                row[0] if row else canonical,
+                row is not None,
+                canonical != " ".join(str(text).split()).casefold(),
+                (row[1] or row[0]) if row else text,
+            )
+            if len(self._memo) >= self.MAX_MEMO:
+                self._memo.clear()
+            self._memo[text] = memo
+        return memo
+
+    def add_alias(self, alias, address):
+        """
+        Faz alias apontar para address (os dois em forma canônica).
+
+        Raises:
+            ValueError: Apelido ou endereço vazio, ou apelido igual ao endereço
+        """
+        key = canonicalize_address(alias)
+        with self._lock:
+            target, _, _, target_text = self._lookup(address)
+            if not key or not target:
+                raise ValueError("Apelido e endereço não podem ser vazios")
+            if key == target:
+                raise ValueError(f"'{alias}' já é a forma do próprio endereço")
+            target_text = " ".join(str(target_text).split())
+            self._conn.execute(
+                "INSERT OR REPLACE INTO aliases (alias, address, created_at, address_text)"
+                " VALUES (?, ?, ?, ?)",
+                (key, target, self.clock(), target_text),
+            )
+            # apelidos que apontavam para o apelido passam a apontar para o destino
+            self._conn.execute(
+                "UPDATE aliases SET address = ?, address_text = ? WHERE address = ?",
+                (target, target_text, key),
+            )
+            self._conn.commit()
+            self._memo.clear()
+
+    def remove_alias(self, alias):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM aliases WHERE alias = ?", (canonicalize_address(alias),)
+            )
+            self._conn.commit()
+            self._memo.clear()
+
+    def aliases(self):
+        """
+        Returns:
+            list[tuple[str, str]]: (apelido, endereço) em ordem alfabética
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT alias, address FROM aliases ORDER BY alias"
+            ).fetchall()
+
+    def stats(self):
+        """
+        Retorna os contadores da normalização.
+
+        Returns:
+            dict: {'lookups': int, 'alias_hits': int, 'folded': int,
+                   'alias_hit_rate': float, 'fold_rate': float, 'aliases': int}
+        """
+        with self._lock:
+            aliases = self._conn.execute("SELECT COUNT(*) FROM aliases").fetchone()[0]
+        lookups = self.lookups
+        return {
+            'lookups': lookups,
+            'alias_hits': self.alias_hits,
+            'folded': self.folded,
+            'alias_hit_rate': self.alias_hits / lookups if lookups else 0.0,
+            'fold_rate': self.folded / lookups if lookups else 0.0,
+            'aliases': aliases,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.address_normalizer",
+        description="Forma canônica de endereços e apelidos usados no cache de rotas.",
+    )
+    parser.add_argument("--db", default="data/addresses.sqlite3", help="arquivo de apelidos")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("show", help="mostra a forma canônica de um endereço")
+    show.add_argument("address")
+    add = commands.add_parser("add", help="cria ou troca um apelido")
+    add.add_argument("alias")
+    add.add_argument("address")
+    remove = commands.add_parser("remove", help="apaga um apelido")
+    remove.add_argument("alias")
+    commands.add_parser("list", help="lista os apelidos")
+    args = parser.parse_args(argv)
+
+    normalizer = AddressNormalizer(args.db)
+    try:
+        if args.command == "show":
+            print(normalizer.resolve(args.address))
+        elif args.command == "add":
+            try:
+                normalizer.add_alias(args.alias, args.address)
+            except ValueError as e:
+                print(f"Erro: {e}", file=sys.stderr)
+                return 1
+        elif args.command == "remove":
+            normalizer.remove_alias(args.alias)
+        else:
+            for alias, address in normalizer.aliases():
+                print(f"{alias} -> {address}")
+    finally:
+        normalizer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
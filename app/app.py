@@ -1,135 +1,29 @@
 import tkinter as tk
 from tkinter import messagebox
-import csv
-from decimal import Decimal, ROUND_HALF_UP
+import importlib.util
 import os
+import sqlite3
+import sys
+import threading
+import time
 from datetime import datetime
 
-class ExpenseCalculator:
-    """
-    Classe responsável por calcular as despesas consolidadas de uma viagem.
-    Consolida o custo total baseado na quilometragem, pedágios e taxas de estacionamento.
-    """
-    
-    # Taxa padrão por quilômetro (em R$)
-    DEFAULT_KM_RATE = 0.50
-    
-    def __init__(self, km_rate=None):
-        """
-        Inicializa o calculador de despesas.
-        
-        Args:
-            km_rate (float): Taxa de reembolso por km (padrão: R$ 0.50/km)
-        """
-        self.km_rate = km_rate if km_rate is not None else self.DEFAULT_KM_RATE
-    
-    def calculate_km_expense(self, distance):
-        """
-        Calcula a despesa baseada na quilometragem.
-        
-        Args:
-            distance (float): Distância em km
-            
-        Returns:
-            float: Despesa de quilometragem em R$
-        """
-        if distance < 0:
-            raise ValueError("Distância não pode ser negativa")
-        # Use Decimal for deterministic monetary rounding (ROUND_HALF_UP)
-        d_distance = Decimal(str(distance))
-        d_rate = Decimal(str(self.km_rate))
-        km_cost = (d_distance * d_rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        return float(km_cost)
-    
-    def calculate_total_expense(self, distance, tolls=0, parking=0):
-        """
-        Calcula a despesa total consolidada.
-        
-        Args:
-            distance (float): Distância em km
-            tolls (float): Valor de pedágios em R$
-            parking (float): Valor de estacionamento em R$
-            
-        Returns:
-            dict: Dicionário com detalhamento das despesas
-                {
-                    'distance_km': float,
-                    'km_expense': float,
-                    'tolls': float,
-                    'parking': float,
-                    'total': float
-                }
-        """
-        try:
-            tolls = float(tolls) if tolls else 0
-            parking = float(parking) if parking else 0
-            distance = float(distance)
-            
-            if distance < 0:
-                raise ValueError("Distância não pode ser negativa")
-            if tolls < 0:
-                raise ValueError("Pedágio não pode ser negativo")
-            if parking < 0:
-                raise ValueError("Estacionamento não pode ser negativo")
-            
-            km_expense = self.calculate_km_expense(distance)
-            # Use Decimal for rounding monetary values to avoid floating point
-            d_distance = Decimal(str(distance))
-            d_tolls = Decimal(str(tolls)) if str(tolls) != "" else Decimal('0')
-            d_parking = Decimal(str(parking)) if str(parking) != "" else Decimal('0')
-
-            km_expense = Decimal(str(self.calculate_km_expense(float(d_distance))))
-
-            d_tolls = d_tolls.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            d_parking = d_parking.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-            total = (km_expense + d_tolls + d_parking).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-            return {
-                'distance_km': float(d_distance.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)),
-                'km_expense': float(km_expense),
-                'tolls': float(d_tolls),
-                'parking': float(d_parking),
-                'total': float(total)
-            }
-            
-            return {
-                'distance_km': round(distance, 2),
-                'km_expense': km_expense,
-                'tolls': round(tolls, 2),
-                'parking': round(parking, 2),
-                'total': total
-            }
-        except ValueError as e:
-            raise ValueError(f"Erro no cálculo de despesas: {str(e)}")
-    
-    def get_expense_summary(self, distance, tolls=0, parking=0):
-        """
-        Retorna um resumo formatado das despesas.
-        
-        Args:
-            distance (float): Distância em km
-            tolls (float): Valor de pedágios em R$
-            parking (float): Valor de estacionamento em R$
-            
-        Returns:
-            str: String formatada com resumo das despesas
-        """
-        expense = self.calculate_total_expense(distance, tolls, parking)
-        summary = (
-            f"=== RESUMO DE DESPESAS ===\n"
-            f"Distância: {expense['distance_km']:.2f} km\n"
-            f"Despesa km: R$ {expense['km_expense']:.2f}\n"
-            f"Pedágios: R$ {expense['tolls']:.2f}\n"
-            f"Estacionamento: R$ {expense['parking']:.2f}\n"
-            f"─────────────────────────\n"
-            f"TOTAL: R$ {expense['total']:.2f}"
-        )
-        return summary
-try:
-    import requests
-except ImportError:
-    requests = None
+# Permite rodar como script (python3 app/app.py) importando os módulos
+# irmãos pelo pacote "app", do mesmo jeito que os testes fazem.
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.address_normalizer import AddressNormalizer
+from app.distance_estimator import OfflineDistanceEstimator
+from app.expense import ExpenseCalculator
+from app.history_view import HistoryView
+from app.metrics import Metrics
+from app.records import Trip, format_summary
+from app.repository import open_repository
+from app.route_cache import RouteCache
+from app.route_matrix import ROUTE_MATRIX_URL, RouteMatrixResolver
+from app.routes_client import ROUTES_URL, RoutesClient, distance_from_route, http_error, route_request
+from app.trip_store import ColumnarTripStore
 
 try:
     from dotenv import load_dotenv
@@ -140,6 +34,34 @@ except ImportError:
 
 
 class MileageTracker:
+    # Cabeçalho do data/trips.csv
+    CSV_HEADER = [
+        "origin",
+        "destination",
+        "start_odometer",
+        "end_odometer",
+        "distance",
+        "tolls",
+        "parking",
+        "km_expense",
+        "total_expense",
+        "timestamp",
+    ]
+
+    # Linhas visíveis em "Últimos registros" (o restante é lido ao rolar)
+    HISTORY_ROWS = 6
+
+    # Endpoint da Routes API (pode ser trocado por um servidor local nos testes)
+    ROUTES_URL = ROUTES_URL
+    ROUTE_MATRIX_URL = ROUTE_MATRIX_URL
+
+    # Intervalo (ms) para verificar se a consulta em segundo plano terminou
+    LOOKUP_POLL_MS = 50
+
+    # Margem de erro relativa máxima para gravar a estimativa offline no
+    # lugar do hodômetro quando a Routes API falha
+    ESTIMATE_MAX_ERROR = 0.10
+
     def __init__(self, root):
         # Criacao da janela
         self.root = root
@@ -160,26 +82,9 @@ class MileageTracker:
             )
 
         # Se requests não estiver disponível, avisamos — o método que usa a API irá
-        # lançar um RuntimeError caso alguém tente usar a integração.
-        if requests is None:
-            print(
-                "Aviso: pacote 'requests' não encontrado. "
-                "A integração com Google Maps ficará indisponível."
-            )
-
-        # Configuração da API do Google Maps
-        load_dotenv()
-        self.api_key = os.getenv("GOOGLE_MAPS_API_KEY", "").strip()
-        if not self.api_key:
-            # Não é erro fatal: o sistema continua usando apenas o hodômetro
-            print(
-                "Aviso: GOOGLE_MAPS_API_KEY não definida. "
-                "Distâncias serão calculadas apenas pelo hodômetro."
-            )
-
-        # Se requests não estiver disponível, avisamos — o método que usa a API irá
-        # lançar um RuntimeError caso alguém tente usar a integração.
-        if requests is None:
+        # lançar um RuntimeError caso alguém tente usar a integração. O pacote
+        # só é importado na primeira consulta (ver RoutesClient.session).
+        if importlib.util.find_spec("requests") is None:
             print(
                 "Aviso: pacote 'requests' não encontrado. "
                 "A integração com Google Maps ficará indisponível."
@@ -213,8 +118,16 @@ class MileageTracker:
         self.entry_parking = tk.Entry(frame, width=20)
         self.entry_parking.grid(row=5, column=1, sticky='w', pady=2)
 
-        self.btn_save = tk.Button(frame, text="Salvar Viagem", command=self.save_trip)
-        self.btn_save.grid(row=6, column=0, columnspan=2, pady=10)
+        buttons = tk.Frame(frame)
+        buttons.grid(row=6, column=0, columnspan=2, pady=10)
+        self.btn_save = tk.Button(buttons, text="Salvar Viagem", command=self.save_trip)
+        self.btn_save.pack(side='left', padx=5)
+        # só fica habilitado enquanto há uma consulta ao Google Maps em andamento
+        self.btn_cancel = tk.Button(
+            buttons, text="Cancelar", command=self.cancel_lookup, state='disabled'
+        )
+        self.btn_cancel.pack(side='left', padx=5)
+        self._pending_lookup = None
 
         self.status = tk.Label(frame, text="", fg="green")
         self.status.grid(row=7, column=0, columnspan=2)
@@ -227,22 +140,222 @@ class MileageTracker:
 
         # área para visualizar últimos registros
         tk.Label(frame, text="Últimos registros:", font=("Arial", 9, "bold")).grid(row=10, column=0, sticky='w', pady=(10,0))
-        self.listbox = tk.Listbox(frame, width=80, height=6)
-        self.listbox.grid(row=11, column=0, columnspan=2, pady=2)
+        self.history = HistoryView(frame, height=self.HISTORY_ROWS, width=80)
+        self.history.grid(row=11, column=0, columnspan=2, pady=2, sticky='we')
+        self.listbox = self.history.listbox
+        # total reembolsado desde o início e no mês atual
+        self.totals_label = tk.Label(frame, text="", fg="gray")
+        self.totals_label.grid(row=12, column=0, columnspan=2, sticky='w')
 
         # garante pasta de dados e carrega existentes
         self.data_dir = os.path.join(os.getcwd(), "data")
         os.makedirs(self.data_dir, exist_ok=True)
         self.csv_path = os.path.join(self.data_dir, "trips.csv")
-        self.load_existing()
+        # tempos das etapas do salvamento e contadores de falhas (METRICS_ENABLED=1)
+        self.metrics = Metrics.from_env(self.data_dir)
+        # onde as viagens são gravadas: "csv" (padrão) ou "sqlite" (ver app/repository.py)
+        self.trips_backend = os.getenv("TRIPS_BACKEND", "csv").strip().lower() or "csv"
+        # endereços em forma canônica (grafias diferentes do mesmo endereço),
+        # nas chaves do cache de rotas e nas buscas por origem/destino
+        self.address_normalizer = AddressNormalizer(os.path.join(self.data_dir, "addresses.sqlite3"))
+        self._repository = None
+        self.warn_unmigrated_history()
+        self.routes_url = self.ROUTES_URL
+        self.route_matrix_url = self.ROUTE_MATRIX_URL
+        # cliente HTTP com pool de conexões, repetições e circuit breaker
+        self.routes_client = RoutesClient(timeout=10)
+        # armazenamento colunar opcional, mantido junto com o CSV
+        self.trip_store = None
+        if os.getenv("TRIPS_COLUMNAR_STORE", "").strip() == "1":
+            self.trip_store = ColumnarTripStore(os.path.join(self.data_dir, "trips_store"))
+        # cache persistente de distâncias já consultadas no Google Maps
+        # (grafias diferentes do mesmo endereço usam a mesma rota)
+        self.route_cache = RouteCache(
+            os.path.join(self.data_dir, "routes_cache.sqlite3"),
+            normalizer=self.address_normalizer,
+        )
+        # estimativa sem rede (calibrada com o histórico numa thread, depois
+        # da carga inicial; ver start_calibration)
+        self.distance_estimator = OfflineDistanceEstimator(
+            extra_coordinates=os.path.join(self.data_dir, "coordinates.json")
+        )
+        self._calibration = None
+        # a janela é desenhada primeiro; histórico e totais chegam em seguida
+        self._background_load = None
+        root.after_idle(self.start_background_load)
+
+    @property
+    def repository(self):
+        """
+        Repositório de viagens do CSV atual (TRIPS_BACKEND): grava as viagens
+        e fornece o histórico, as consultas por data e os totais.
+        """
+        if self._repository is None or self._repository.csv_path != self.csv_path:
+            if self._repository is not None:
+                self._repository.close()
+            self._repository = open_repository(
+                self.trips_backend, self.csv_path, self.CSV_HEADER, normalizer=self.address_normalizer
+            )
+        return self._repository
+
+    def warn_unmigrated_history(self):
+        """Avisa quando o SQLite ainda está vazio mas o trips.csv tem viagens."""
+        if self.trips_backend != "sqlite" or len(self.repository):
+            return
+        try:
+            with open(self.csv_path, 'rb') as f:
+                f.readline()
+                has_trips = bool(f.readline().strip())
+        except OSError:
+            return
+        if has_trips:
+            print(
+                "Aviso: TRIPS_BACKEND=sqlite com o banco vazio; as viagens do trips.csv "
+                f"não aparecem até a migração: python3 -m app.repository migrate {self.csv_path}"
+            )
+
+    def show_totals(self):
+        """Mostra o total reembolsado desde o início e o do mês atual."""
+        if self._background_load is not None:
+            # os totais ainda estão sendo lidos; aparecem quando a carga terminar
+            return
+        with self.metrics.span("running_totals"):
+            lifetime, month = self.repository.totals()
+        self.totals_label.config(
+            text=(
+                f"Total reembolsado: R$ {lifetime['total_expense']:.2f} ({lifetime['trips']} viagens)"
+                f" | Este mês: R$ {month['total_expense']:.2f} ({month['trips']} viagens)"
+            )
+        )
 
     def load_existing(self):
-        self.listbox.delete(0, tk.END)
-        if os.path.exists(self.csv_path):
-            with open(self.csv_path, newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    self.listbox.insert(tk.END, " | ".join(row))
+        """
+        Liga a lista de histórico ao repositório e mostra as viagens mais
+        recentes. Só as linhas visíveis são lidas; o resto vem do disco ao rolar.
+        """
+        source = self.repository.history()
+        if self.history.source is not source:
+            self.history.set_source(source)
+        with self.metrics.span("history_refresh"):
+            self.history.refresh()
+        self.start_history_index(source)
+        self.start_calibration()
+
+    def start_background_load(self):
+        """
+        Lê o histórico e os totais numa thread separada (com 1M de viagens
+        no CSV isso leva alguns segundos), para a janela abrir na hora.
+        O resultado é aplicado na thread do Tk por _poll_background_load.
+        """
+        # aberto aqui, na thread do Tk; a thread só lê (salvar fica
+        # desabilitado até a carga terminar)
+        try:
+            repository = self.repository
+        except (OSError, ValueError) as e:
+            self.status.config(text=f"Não foi possível abrir o histórico: {e}", fg="red")
+            return
+        pending = {'repository': repository, 'done': threading.Event()}
+
+        def worker():
+            try:
+                source = repository.history()
+                source.refresh()
+                repository.totals()
+                pending['result'] = source
+            except (OSError, ValueError) as e:
+                pending['error'] = e
+            pending['done'].set()
+
+        self._background_load = pending
+        self.btn_save.config(state='disabled')
+        self.history.info.config(text="Carregando histórico...")
+        self.totals_label.config(text="Calculando totais...")
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(self.LOOKUP_POLL_MS, self._poll_background_load, pending)
+
+    def _poll_background_load(self, pending):
+        if pending is not self._background_load:
+            return
+        if not pending['done'].is_set():
+            self.root.after(self.LOOKUP_POLL_MS, self._poll_background_load, pending)
+            return
+        self._background_load = None
+        if self._pending_lookup is None:
+            self.btn_save.config(state='normal')
+        if 'result' in pending and pending['repository'] is self._repository:
+            source = pending['result']
+            with self.metrics.span("history_refresh"):
+                self.history.set_source(source)
+                # inclui viagens salvas enquanto a carga estava em andamento
+                self.history.refresh()
+            self.start_history_index(source)
+            self.start_calibration()
+        else:
+            # repositório trocado no meio da carga ou falha de leitura: carrega aqui
+            self.load_existing()
+        self.show_totals()
+
+    def start_calibration(self):
+        """
+        Calibra a estimativa offline com as viagens do repositório numa
+        thread. Com um histórico grande a leitura leva segundos; feita aqui,
+        depois da carga inicial, uma falha da Routes API não espera por ela
+        (até a calibração terminar, a viagem usa o hodômetro).
+        """
+        repository = self.repository
+        estimator = self.distance_estimator
+        if self._calibration is repository or estimator.is_calibrated(repository):
+            return
+        self._calibration = repository
+
+        def worker():
+            try:
+                # com as viagens do repositório em uso (CSV ou SQLite)
+                estimator.ensure_calibrated(
+                    repository, lambda: ((row[0], row[1], row[4]) for row in repository.trips())
+                )
+            except (OSError, ValueError, sqlite3.Error):
+                # sem calibração a estimativa tem margem larga e não é usada
+                pass
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def start_history_index(self, source):
+        """
+        Monta o índice do histórico inteiro numa thread, enquanto a lista
+        mostra só as últimas viagens; quando termina, a lista passa a rolar
+        por todo o histórico.
+        """
+        if source.indexed:
+            return
+        done = threading.Event()
+
+        def worker():
+            try:
+                source.build_index()
+            except OSError:
+                # a busca monta o índice de novo quando precisar
+                pass
+            done.set()
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(self.LOOKUP_POLL_MS, self._poll_history_index, source, done)
+
+    def _poll_history_index(self, source, done):
+        if not done.is_set():
+            self.root.after(self.LOOKUP_POLL_MS, self._poll_history_index, source, done)
+            return
+        if self.history.source is source:
+            with self.metrics.span("history_refresh"):
+                self.history.refresh()
+
+    def append_to_history(self):
+        """
+        Mostra na lista a viagem recém-gravada no CSV (lê só o trecho novo
+        do arquivo) e rola até ela.
+        """
+        with self.metrics.span("history_refresh"):
+            self.history.refresh()
 
     def get_distance_from_gmaps(self, origin: str, dest: str) -> float:
         """
@@ -257,39 +370,11 @@ class MileageTracker:
                 "Defina a variável de ambiente GOOGLE_MAPS_API_KEY."
             )
 
-        url = "https://routes.googleapis.com/directions/v2:computeRoutes"
-
-        headers = {
-            "Content-Type": "application/json",
-            "X-Goog-Api-Key": self.api_key,
-            # Campo obrigatório: pelo menos um campo em routes.*
-            "X-Goog-FieldMask": "routes.distanceMeters",
-        }
-
-        body = {
-            "origin": {
-                "address": origin
-            },
-            "destination": {
-                "address": dest
-            },
-            "travelMode": "DRIVE",
-            # Mantemos o exemplo simples, compatível com a documentação.
-        }
+        headers, body = route_request(self.api_key, origin, dest)
 
-        try:
-            resp = requests.post(url, headers=headers, json=body, timeout=10)
-        except TypeError:
-            # requests is None or not callable
-            raise RuntimeError(
-                "A biblioteca 'requests' não está disponível. Instale-a com: pip install requests"
-            )
-        except Exception as e:
-            # requests may raise RequestException, handle below
-            raise
-        except requests.RequestException as e:
-            # Erros de rede (sem internet, DNS, timeout, etc.)
-            raise RuntimeError(f"Falha de comunicação com a API do Google Maps: {e}")
+        # Erros de rede (sem internet, DNS, timeout, etc.) e circuito aberto
+        # chegam aqui como RuntimeError
+        resp = self.routes_client.post(self.routes_url, headers=headers, json=body)
 
         # Se vier 4xx/5xx, queremos ver a mensagem do Google, não só "400 Bad Request"
         if not resp.ok:
@@ -297,33 +382,56 @@ class MileageTracker:
                 err_json = resp.json()
             except ValueError:
                 err_json = resp.text
-            raise RuntimeError(
-                f"Erro HTTP {resp.status_code} da API do Google Maps.\n"
-                f"Resposta: {err_json}"
-            )
-
-        data = resp.json()
-        routes = data.get("routes")
-        if not routes:
-            raise RuntimeError(
-                "A API do Google Maps não retornou nenhuma rota para os endereços informados."
-            )
+            raise http_error(resp.status_code, err_json)
 
-        distance_meters = routes[0].get("distanceMeters")
-        if distance_meters is None:
-            raise RuntimeError(
-                "A API do Google Maps não retornou o campo distanceMeters."
-            )
+        return distance_from_route(resp.json())
 
-        distance_km = float(distance_meters) / 1000.0
-        if distance_km <= 0:
-            raise RuntimeError(
-                "Distância retornada pela API do Google Maps é inválida (<= 0)."
-            )
+    def resolve_distance(self, origin: str, dest: str) -> float:
+        """
+        Obtém a distância em km consultando primeiro o cache persistente de
+        rotas e, se não houver entrada válida, a Google Maps Routes API.
 
+        Lança RuntimeError (como get_distance_from_gmaps) se a API falhar.
+        """
+        cached = self.route_cache.get(origin, dest)
+        if cached is not None:
+            return cached
+        # um apelido ("Escritório") vai à API como o endereço para o qual aponta
+        distance_km = self.get_distance_from_gmaps(
+            self.route_cache.request_address(origin), self.route_cache.request_address(dest)
+        )
+        self.route_cache.put(origin, dest, distance_km)
         return distance_km
 
+    def resolve_distances(self, pairs, max_workers=4):
+        """
+        Obtém as distâncias de várias viagens de uma vez (importação em lote),
+        usando o cache de rotas e o computeRouteMatrix da Routes API.
+
+        Args:
+            pairs (Sequence[tuple[str, str]]): Pares (origem, destino), um por viagem
+            max_workers (int): Máximo de requisições simultâneas à API
+
+        Returns:
+            tuple[list, list]: (distâncias em km ou None, mensagens de erro ou None),
+            na mesma ordem de pairs
+        """
+        resolver = RouteMatrixResolver(
+            self.api_key,
+            url=self.route_matrix_url,
+            max_workers=max_workers,
+            cache=self.route_cache,
+            client=self.routes_client,
+        )
+        return resolver.resolve(pairs)
+
     def save_trip(self):
+        # evita envio duplo enquanto a consulta anterior não termina, e
+        # gravações enquanto o histórico ainda está sendo lido
+        if self._pending_lookup is not None or self._background_load is not None:
+            return
+
+        validate_started = time.perf_counter()
         origin = self.entry_origin.get().strip()
         dest = self.entry_dest.get().strip()
         start = self.entry_start.get().strip()
@@ -349,81 +457,182 @@ class MileageTracker:
         if distance < 0:
             messagebox.showerror("Erro", "Hodômetro final menor que inicial.")
             return
+        # só validações aprovadas: o tempo das caixas de erro não entra
+        self.metrics.observe("validate", time.perf_counter() - validate_started)
+
+        trip = Trip(
+            origin=origin,
+            destination=dest,
+            start_odometer=start_f,
+            end_odometer=end_f,
+            distance=distance,
+            tolls=tolls_f,
+            parking=parking_f,
+            # momento do registro, gravado na coluna timestamp
+            timestamp=datetime.now().isoformat(timespec='seconds'),
+        )
+        self.start_lookup(trip)
 
-        distance_source = "hodometro"
+    def start_lookup(self, trip):
+        """
+        Dispara a consulta da distância (cache + Google Maps) numa thread
+        separada, para a janela não congelar durante a chamada HTTP.
+        O resultado é recolhido na thread do Tk por _poll_lookup.
+        """
+        pending = {'trip': trip, 'done': threading.Event(), 'started': time.perf_counter()}
 
-        # tenta calcular distância via Google Maps (Compute Routes)
-        try:
-            distance_gmaps = self.get_distance_from_gmaps(origin, dest)
-            if distance_gmaps > 0:
-                distance = distance_gmaps
-                distance_source = "gmaps"
-        except RuntimeError as e:
+        def worker():
+            try:
+                with self.metrics.span("routes_lookup"):
+                    pending['distance'] = self.resolve_distance(trip.origin, trip.destination)
+            except RuntimeError as e:
+                pending['error'] = e
+            except Exception as e:
+                # qualquer outra falha também cai na estimativa ou no hodômetro
+                pending['error'] = RuntimeError(str(e))
+            if 'error' in pending:
+                self.metrics.inc("api_failures")
+                with self.metrics.span("offline_estimate"):
+                    pending['estimate'] = self.estimate_distance(trip.origin, trip.destination)
+            pending['done'].set()
+
+        self._pending_lookup = pending
+        self.btn_save.config(state='disabled')
+        self.btn_cancel.config(state='normal')
+        self.status.config(text="Calculando distância via Google Maps...", fg="orange")
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(self.LOOKUP_POLL_MS, self._poll_lookup, pending)
+
+    def _poll_lookup(self, pending):
+        if pending is not self._pending_lookup:
+            # consulta cancelada: o resultado é descartado
+            return
+        if not pending['done'].is_set():
+            self.root.after(self.LOOKUP_POLL_MS, self._poll_lookup, pending)
+            return
+        self._end_lookup()
+
+        trip = pending['trip']
+        distance = trip.distance
+        distance_source = "hodometro"
+        estimate = pending.get('estimate')
+        if 'error' in pending and estimate is not None:
+            # estimativa offline com margem pequena: dispensa o aviso bloqueante
+            distance = estimate['distance_km']
+            distance_source = "estimativa"
+            self.metrics.inc("estimate_fallbacks")
+        elif 'error' in pending:
+            self.metrics.inc("odometer_fallbacks")
+            dialog_opened = time.perf_counter()
             # Feedback claro, mas continua usando a distância do hodômetro
             messagebox.showwarning(
                 "Aviso",
                 "Não foi possível calcular a distância via Google Maps. "
                 "A distância desta viagem será calculada pelo hodômetro.\n\n"
-                f"Detalhes: {e}"
+                f"Detalhes: {pending['error']}"
             )
+            # o tempo com o aviso aberto não conta no tempo do salvamento
+            pending['started'] += time.perf_counter() - dialog_opened
+        elif pending['distance'] > 0:
+            distance = pending['distance']
+            distance_source = "gmaps"
+
+        self.finish_save(trip.with_distance(distance), distance_source, estimate)
+        # do clique em "Salvar Viagem" até a viagem gravada e mostrada
+        self.metrics.observe("save_trip", time.perf_counter() - pending['started'])
 
-        # escreve no CSV (adiciona header se não existir)
-        # Calcula as despesas usando ExpenseCalculator
+    def estimate_distance(self, origin, dest):
+        """
+        Estimativa offline da distância, usada como alternativa quando a
+        Routes API falha. Só é devolvida se a margem de erro for de no
+        máximo ESTIMATE_MAX_ERROR. Não lê o histórico: usa a calibração
+        feita por start_calibration (ou nenhuma, se ainda não terminou).
+
+        Returns:
+            dict | None: Resultado de OfflineDistanceEstimator.estimate
+        """
         try:
-            expense_details = self.expense_calculator.calculate_total_expense(
-                distance, tolls_f, parking_f
-            )
-            expense_summary = self.expense_calculator.get_expense_summary(
-                distance, tolls_f, parking_f
-            )
+            estimate = self.distance_estimator.estimate(origin, dest)
+        except ValueError:
+            return None
+        if estimate is None or estimate['error_rate'] > self.ESTIMATE_MAX_ERROR:
+            return None
+        return estimate
+
+    def cancel_lookup(self):
+        """
+        Cancela a consulta em andamento. A viagem não é salva e os campos
+        continuam preenchidos para uma nova tentativa.
+        """
+        if self._pending_lookup is None:
+            return
+        self._end_lookup()
+        self.status.config(text="Consulta cancelada. A viagem não foi salva.", fg="red")
+
+    def _end_lookup(self):
+        self._pending_lookup = None
+        self.btn_save.config(state='normal')
+        self.btn_cancel.config(state='disabled')
+
+    def finish_save(self, trip, distance_source, estimate=None):
+        """
+        Calcula as despesas e grava a viagem no CSV, já com a distância final.
+
+        Args:
+            trip (Trip): Viagem com a distância final
+            distance_source (str): "gmaps", "estimativa" ou "hodometro"
+            estimate (dict): Estimativa offline usada (só com "estimativa")
+        """
+        # Calcula as despesas uma vez; o resumo é formatado a partir delas
+        try:
+            with self.metrics.span("calculate_total_expense"):
+                expense = self.expense_calculator.price_trip(trip)
+            with self.metrics.span("get_expense_summary"):
+                expense_summary = format_summary(expense)
             # Exibe o resumo de despesas na UI
-            self.expense_text.config(state='normal')
-            self.expense_text.delete(1.0, tk.END)
-            self.expense_text.insert(1.0, expense_summary)
-            self.expense_text.config(state='disabled')
+            self.display_expense_summary(expense_summary)
         except ValueError as e:
             messagebox.showerror("Erro", str(e))
             return
 
-        new_row = [
-            origin,
-            dest,
-            f"{start_f:.1f}",
-            f"{end_f:.1f}",
-            f"{distance:.1f}",
-            f"{tolls_f:.2f}",
-            f"{parking_f:.2f}",
-            f"{expense_details['km_expense']:.2f}",
-            f"{expense_details['total']:.2f}",
-        ]
-        write_header = not os.path.exists(self.csv_path)
-        with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if write_header:
-                writer.writerow([
-                    "origin",
-                    "destination",
-                    "start_odometer",
-                    "end_odometer",
-                    "distance",
-                    "tolls",
-                    "parking",
-                    "km_expense",
-                    "total_expense",
-                ])
-            writer.writerow(new_row)
+        new_row = trip.to_row(expense)
+        # grava no repositório (no CSV, o cabeçalho é gravado se o arquivo
+        # estiver vazio e o índice por data é atualizado em seguida)
+        try:
+            with self.metrics.span("trip_append"):
+                self.repository.append(new_row)
+        except (OSError, sqlite3.Error) as e:
+            messagebox.showerror("Erro", f"Não foi possível gravar a viagem: {e}")
+            return
+        self.metrics.inc("trips_saved", source=distance_source)
+        if self.trip_store is not None:
+            self.trip_store.append(new_row)
+        if distance_source != "estimativa":
+            # distâncias medidas (não estimadas) refinam a estimativa offline
+            self.distance_estimator.observe(trip.origin, trip.destination, trip.distance)
 
         # mensagem de status mostrando a origem da distância (só na UI)
         if distance_source == "gmaps":
             self.status.config(
-                text="Viagem salva com sucesso (distância via Google Maps)."
+                text="Viagem salva com sucesso (distância via Google Maps).",
+                fg="green",
+            )
+        elif distance_source == "estimativa":
+            self.status.config(
+                text=(
+                    "Google Maps indisponível: viagem salva com distância estimada "
+                    f"offline ({trip.distance:.1f} km ± {estimate['error_km']:.1f} km)."
+                ),
+                fg="orange",
             )
         else:
             self.status.config(
-                text="Viagem salva com sucesso (distância via hodômetro)."
+                text="Viagem salva com sucesso (distância via hodômetro).",
+                fg="green",
             )
 
-        self.load_existing()
+        self.append_to_history()
+        self.show_totals()
         # limpa campos
         self.entry_origin.delete(0, tk.END)
         self.entry_dest.delete(0, tk.END)
@@ -0,0 +1,482 @@
+"""
+Cliente assíncrono (asyncio) da Google Maps Routes API (computeRoutes).
+
+get_distance_from_gmaps faz uma requisição bloqueante por vez; aqui muitas
+distâncias são consultadas ao mesmo tempo num único event loop:
+
+- até max_concurrency requisições em andamento (semáforo), sobre conexões
+  HTTP/1.1 keep-alive reaproveitadas;
+- cada requisição tem seu próprio prazo (timeout), sem contar a espera
+  pela vaga no semáforo;
+- pares (origem, destino) iguais já em andamento dividem a mesma chamada.
+
+Cabeçalhos, field mask, mensagens de erro e validação do distanceMeters são
+os mesmos do aplicativo (app/routes_client.py). Como o servidor HTTP
+(app/server.py), usa só a biblioteca padrão.
+
+Uso (na raiz do projeto):
+    python3 -m app.async_routes pares.csv            # colunas origin,destination
+    python3 -m app.async_routes pares.csv --concurrency 64 --timeout 10
+"""
+import argparse
+import asyncio
+import csv
+import json
+import random
+import ssl
+import sys
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from app.routes_client import ROUTES_URL, RoutesClient, distance_from_route, http_error, route_request
+
+# Limites de uma resposta
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class _Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+
+class AsyncRoutesClient:
+    """
+    Consulta distâncias na Routes API com várias requisições simultâneas.
+    Deve ser usado dentro de um único event loop (ver AsyncRoutesResolver
+    para uso fora de código assíncrono).
+    """
+
+    TRAVEL_MODE = "DRIVE"
+    RETRY_STATUSES = RoutesClient.RETRY_STATUSES
+
+    def __init__(
+        self,
+        api_key,
+        url=ROUTES_URL,
+        max_concurrency=32,
+        timeout=10,
+        max_retries=2,
+        backoff_base=0.5,
+        backoff_max=8.0,
+        cache=None,
+        rng=random.random,
+    ):
+        """
+        Args:
+            api_key (str): Chave da Google Maps API
+            url (str): Endpoint do computeRoutes
+            max_concurrency (int): Requisições HTTP em andamento ao mesmo tempo
+            timeout (float): Prazo (s) de cada requisição, da conexão à resposta
+            max_retries (int): Tentativas extras para status transitórios / erros de rede
+            backoff_base (float): Espera base (s) do backoff exponencial
+            backoff_max (float): Espera máxima (s) entre tentativas
+            cache (RouteCache): Cache de rotas consultado antes da API (opcional)
+            rng: Injetável nos testes
+        """
+        self.api_key = api_key
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache
+        self.rng = rng
+
+        parts = urlsplit(url)
+        self._host = parts.hostname
+        default_port = 443 if parts.scheme == "https" else 80
+        self._port = parts.port or default_port
+        host = f"[{self._host}]" if ":" in self._host else self._host
+        self._host_header = host if self._port == default_port else f"{host}:{self._port}"
+        self._path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self._ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # conexões livres (reader, writer), reaproveitadas entre requisições
+        self._idle = []
+        # chave do par -> Task da consulta em andamento
+        self._inflight = {}
+
+        self.calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.failures = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.latencies = deque(maxlen=1000)
+
+    def _cache_lookup(self, pairs):
+        """
+        Chave, distância guardada e texto enviado à API de cada par
+        (bloqueante: SQLite do cache e do normalizador de endereços; roda fora
+        do event loop).
+        """
+        # com cache, grafias diferentes do mesmo endereço viram a mesma
+        # consulta, e apelidos vão à API como o endereço para o qual apontam
+        return [
+            (self.cache.make_key(origin, dest, self.TRAVEL_MODE),
+             self.cache.get(origin, dest, self.TRAVEL_MODE),
+             (self.cache.request_address(origin), self.cache.request_address(dest)))
+            for origin, dest in pairs
+        ]
+
+    async def distance(self, origin, dest):
+        """
+        Distância em km de origem a destino. Chamadas simultâneas com o mesmo
+        par esperam a mesma requisição.
+
+        Raises:
+            RuntimeError: Mesmas mensagens de get_distance_from_gmaps, prazo
+                esgotado ou falha de rede
+        """
+        origin, dest = str(origin).strip(), str(dest).strip()
+        if self.cache is None:
+            return await self._shared((origin, dest), origin, dest)
+        [(key, cached, request)] = await asyncio.to_thread(self._cache_lookup, [(origin, dest)])
+        return await self._shared(key, origin, dest, cached, request)
+
+    async def _shared(self, key, origin, dest, cached=None, request=None):
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(origin, dest, request))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: quem desistir (cancelamento) não cancela os outros que esperam
+        return await asyncio.shield(task)
+
+    async def resolve_many(self, pairs):
+        """
+        Distâncias de muitos pares, todas consultadas ao mesmo tempo.
+
+        Args:
+            pairs (Sequence[tuple[str, str]]): Pares (origem, destino), um por viagem
+
+        Returns:
+            tuple[list, list]: (distâncias, erros), como RouteMatrixResolver.resolve
+        """
+        pairs = [(str(origin).strip(), str(dest).strip()) for origin, dest in pairs]
+        if not self.api_key:
+            message = (
+                "Chave da API do Google Maps não configurada. "
+                "Defina a variável de ambiente GOOGLE_MAPS_API_KEY."
+            )
+            return [None] * len(pairs), [message] * len(pairs)
+        if self.cache is None:
+            lookups = [(pair, None, pair) for pair in pairs]
+        else:
+            # uma só ida à thread para ler o cache de todos os pares
+            lookups = await asyncio.to_thread(self._cache_lookup, pairs)
+        results = await asyncio.gather(
+            *(self._shared(key, origin, dest, cached, request)
+              for (origin, dest), (key, cached, request) in zip(pairs, lookups)),
+            return_exceptions=True,
+        )
+        distances = []
+        errors = []
+        for result in results:
+            if isinstance(result, RuntimeError):
+                distances.append(None)
+                errors.append(str(result))
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                distances.append(result)
+                errors.append(None)
+        return distances, errors
+
+    async def _fetch_and_store(self, origin, dest, request=None):
+        # request: (origem, destino) enviados à API (padrão: os digitados)
+        distance_km = await self._fetch(*(request or (origin, dest)))
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, origin, dest, distance_km, self.TRAVEL_MODE)
+        return distance_km
+
+    async def _fetch(self, origin, dest):
+        headers, body = route_request(self.api_key, origin, dest)
+        payload = json.dumps(body).encode("utf-8")
+        self.calls += 1
+        resp = None
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+            async with self._semaphore:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                start = time.monotonic()
+                try:
+                    resp = await asyncio.wait_for(self._post(headers, payload), self.timeout)
+                    error = None
+                except asyncio.TimeoutError:
+                    resp = None
+                    error = RuntimeError(
+                        f"Tempo esgotado ({self.timeout:g} s) na consulta à API do Google Maps."
+                    )
+                except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                    resp = None
+                    error = RuntimeError(f"Falha de comunicação com a API do Google Maps: {e}")
+                finally:
+                    self.in_flight -= 1
+                    self.latencies.append(time.monotonic() - start)
+
+            if resp is not None and resp.status not in self.RETRY_STATUSES:
+                break
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff_delay(attempt, resp))
+        else:
+            self.failures += 1
+            if resp is None:
+                raise error
+
+        # Se vier 4xx/5xx, queremos ver a mensagem do Google, não só "400 Bad Request"
+        if not 200 <= resp.status < 300:
+            try:
+                err_json = resp.json()
+            except ValueError:
+                err_json = resp.text
+            raise http_error(resp.status, err_json)
+        try:
+            data = resp.json()
+        except ValueError:
+            raise RuntimeError("Resposta inválida da API do Google Maps (JSON malformado).")
+        return distance_from_route(data)
+
+    def _backoff_delay(self, attempt, resp):
+        # "full jitter", respeitando o Retry-After do servidor (como o RoutesClient)
+        if resp is not None:
+            try:
+                return min(self.backoff_max, float(resp.headers.get("retry-after")))
+            except (TypeError, ValueError):
+                pass
+        return self.rng() * min(self.backoff_max, self.backoff_base * 2 ** attempt)
+
+    async def _connection(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        self.connections += 1
+        reader, writer = await asyncio.open_connection(
+            self._host, self._port, ssl=self._ssl, limit=MAX_HEADER_BYTES
+        )
+        return reader, writer, False
+
+    async def _post(self, headers, payload):
+        lines = [f"POST {self._path} HTTP/1.1", f"Host: {self._host_header}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines += [f"Content-Length: {len(payload)}", "Connection: keep-alive", "", ""]
+        request = "\r\n".join(lines).encode("latin-1") + payload
+
+        reader, writer, reused = await self._connection()
+        done = False
+        try:
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await reader.readline()
+                if not status_line:
+                    raise ConnectionResetError("conexão fechada pelo servidor")
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # conexão keep-alive fechada pelo servidor enquanto estava livre:
+                # repete uma vez numa conexão nova
+                writer.close()
+                reader, writer, _ = await self._connection()
+                writer.write(request)
+                await writer.drain()
+                status_line = await reader.readline()
+            resp, keep_alive = await self._read_response(reader, status_line)
+            done = keep_alive
+            return resp
+        finally:
+            if done:
+                self._idle.append((reader, writer))
+            else:
+                # resposta incompleta (prazo esgotado, erro) ou Connection: close
+                writer.close()
+
+    @staticmethod
+    async def _read_response(reader, status_line):
+        parts = status_line.decode("latin-1").split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise ValueError(f"resposta HTTP inválida: {status_line[:100]!r}")
+        status = int(parts[1])
+        headers = {}
+        size = 0
+        while True:
+            line = await reader.readline()
+            size += len(line)
+            if size > MAX_HEADER_BYTES:
+                raise ValueError("cabeçalhos da resposta grandes demais")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            chunks = []
+            total = 0
+            while True:
+                length = int((await reader.readline()).split(b";", 1)[0].strip() or b"0", 16)
+                if length == 0:
+                    # trailers até a linha vazia
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                total += length
+                if total > MAX_BODY_BYTES:
+                    raise ValueError("resposta grande demais")
+                chunks.append(await reader.readexactly(length))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+            keep_alive = True
+        elif "content-length" in headers:
+            length = int(headers["content-length"])
+            if length > MAX_BODY_BYTES:
+                raise ValueError("resposta grande demais")
+            body = await reader.readexactly(length)
+            keep_alive = True
+        else:
+            # sem tamanho: o corpo vai até o servidor fechar a conexão
+            body = await reader.read(MAX_BODY_BYTES)
+            keep_alive = False
+        if headers.get("connection", "").lower() == "close" or parts[0] == "HTTP/1.0":
+            keep_alive = False
+        return _Response(status, headers, body), keep_alive
+
+    def stats(self):
+        """
+        Returns:
+            dict: requisições, chamadas divididas, acertos do cache, repetições,
+            falhas, conexões abertas, pico de simultâneas e latências (s)
+        """
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'cache_hits': self.cache_hits,
+            'retries': self.retries,
+            'failures': self.failures,
+            'connections': self.connections,
+            'max_in_flight': self.max_in_flight,
+            'latency_p50': percentile(0.50),
+            'latency_p95': percentile(0.95),
+        }
+
+    async def aclose(self):
+        """Fecha as conexões livres."""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+class AsyncRoutesResolver:
+    """
+    Resolvedor com a interface do RouteMatrixResolver (resolve(pairs)) para
+    código síncrono, como o modo em lote e o importador: cada chamada roda um
+    AsyncRoutesClient num event loop próprio (pode ser chamado de várias
+    threads ao mesmo tempo).
+    """
+
+    def __init__(self, api_key, url=ROUTES_URL, cache=None, **options):
+        """
+        Args:
+            api_key (str): Chave da Google Maps API
+            url (str): Endpoint do computeRoutes
+            cache (RouteCache): Cache de rotas consultado antes da API (opcional)
+            **options: Demais argumentos do AsyncRoutesClient (max_concurrency, timeout, ...)
+        """
+        self.api_key = api_key
+        self.url = url
+        self.cache = cache
+        self.options = options
+        self.last_stats = None
+
+    def resolve(self, pairs):
+        """
+        Obtém a distância em km de cada par, na mesma ordem da entrada.
+
+        Returns:
+            tuple[list, list]: (distâncias, erros), como RouteMatrixResolver.resolve
+        """
+        return asyncio.run(self._resolve(pairs))
+
+    async def _resolve(self, pairs):
+        client = AsyncRoutesClient(self.api_key, self.url, cache=self.cache, **self.options)
+        try:
+            return await client.resolve_many(pairs)
+        finally:
+            await client.aclose()
+            self.last_stats = client.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.async_routes",
+        description="Consulta na Routes API as distâncias de vários pares origem/destino ao mesmo tempo.",
+    )
+    parser.add_argument("input", help="CSV com as colunas origin,destination ('-' para stdin)")
+    parser.add_argument("--concurrency", type=int, default=32, help="requisições simultâneas (padrão: 32)")
+    parser.add_argument("--timeout", type=float, default=10, help="prazo de cada requisição em s (padrão: 10)")
+    parser.add_argument("--data-dir", default="data", help="diretório do cache de rotas (padrão: data)")
+    args = parser.parse_args(argv)
+
+    from app.cli import make_resolver
+
+    resolver = make_resolver(args.data_dir, "routes", max_concurrency=args.concurrency, timeout=args.timeout)
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8-sig")
+    try:
+        pairs = [(row.get("origin", ""), row.get("destination", "")) for row in csv.DictReader(source)]
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    start = time.perf_counter()
+    distances, errors = resolver.resolve(pairs)
+    elapsed = time.perf_counter() - start
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["origin", "destination", "distance_km", "error"])
+    for (origin, dest), distance, error in zip(pairs, distances, errors):
+        writer.writerow([origin, dest, "" if distance is None else f"{distance:.1f}", error or ""])
+    stats = resolver.last_stats
+    print(
+        f"{len(pairs)} pares em {elapsed:.2f} s: {stats['calls']} requisições, "
+        f"{stats['coalesced']} divididas, {stats['cache_hits']} do cache, "
+        f"{sum(e is not None for e in errors)} falhas.",
+        file=sys.stderr,
+    )
+    return 0 if all(e is None for e in errors) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
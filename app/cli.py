@@ -0,0 +1,339 @@
+"""
+Modo em lote (sem interface gráfica) do Mileage Tracker.
+
+Lê viagens de um CSV ou JSONL, calcula as despesas com o ExpenseCalculator
+(opcionalmente resolvendo as distâncias pela Routes API) e grava as viagens
+precificadas no formato do data/trips.csv. Não importa tkinter.
+
+Uso (na raiz do projeto):
+    python3 -m app.cli viagens.csv -o precificadas.csv
+    python3 -m app.cli viagens.jsonl --output-format jsonl --resolve-distances
+"""
+import argparse
+import math
+import sys
+from datetime import date, datetime
+
+from app.records import Trip, expenses_from_batch
+
+# As dependências pesadas (requests, dotenv, sqlite3...) só são importadas
+# depois de interpretar os argumentos, para o --help responder na hora.
+
+
+# Formatos de data/hora aceitos além do ISO 8601 (dia antes do mês)
+TIMESTAMP_FORMATS = (
+    ("%d/%m/%Y %H:%M:%S", True),
+    ("%d/%m/%Y %H:%M", True),
+    ("%d/%m/%Y", False),
+    ("%d/%m/%y", False),
+    ("%d-%m-%Y %H:%M:%S", True),
+    ("%d-%m-%Y %H:%M", True),
+    ("%d-%m-%Y", False),
+    ("%d.%m.%Y", False),
+    ("%Y/%m/%d %H:%M:%S", True),
+    ("%Y/%m/%d", False),
+)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.cli",
+        description="Calcula as despesas de viagens em lote, sem interface gráfica.",
+    )
+    parser.add_argument("input", help="arquivo de viagens (.csv ou .jsonl; '-' para stdin)")
+    parser.add_argument(
+        "-o", "--output", default="-",
+        help="arquivo de saída (padrão: stdout)",
+    )
+    parser.add_argument(
+        "--input-format", choices=["csv", "jsonl"],
+        help="formato da entrada (padrão: pela extensão do arquivo)",
+    )
+    parser.add_argument(
+        "--output-format", choices=["csv", "jsonl"], default="csv",
+        help="formato da saída (padrão: csv)",
+    )
+    parser.add_argument(
+        "--km-rate", type=float, default=None,
+        help="taxa de reembolso por km em R$ (padrão: a do ExpenseCalculator)",
+    )
+    parser.add_argument(
+        "--resolve-distances", action="store_true",
+        help="consulta a distância na Google Maps Routes API (com cache em --data-dir)",
+    )
+    parser.add_argument(
+        "--resolver", choices=["matrix", "routes"], default="matrix",
+        help="com --resolve-distances: matrizes do computeRouteMatrix (padrão) ou "
+             "computeRoutes com várias requisições simultâneas",
+    )
+    parser.add_argument(
+        "--data-dir", default="data",
+        help="pasta de dados usada pelo cache de rotas (padrão: data)",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=5000,
+        help="viagens processadas por lote (define o uso de memória)",
+    )
+    return parser
+
+
+def parse_number(value, default=None):
+    """
+    Converte um número digitado (aceita vírgula decimal, como o formulário).
+
+    Raises:
+        ValueError: Valor ausente, não numérico ou não finito (nan, inf, 1e400)
+    """
+    if value is None or str(value).strip() == "":
+        if default is None:
+            raise ValueError("valor obrigatório ausente")
+        return default
+    number = float(str(value).strip().replace(',', '.'))
+    if not math.isfinite(number):
+        raise ValueError(f"valor não finito: {value!r}")
+    return number
+
+
+def parse_timestamp(value):
+    """
+    Converte a data/hora de uma viagem no texto ISO da coluna timestamp
+    ("2024-03-01" ou "2024-03-01T08:30:00"). Aceita ISO 8601 e datas com o
+    dia primeiro (01/03/2024, 01/03/24, 01-03-2024 08:30, 01.03.2024).
+
+    Returns:
+        str: Texto ISO ("" se value estiver vazio)
+
+    Raises:
+        ValueError: Data em outro formato ou inexistente (ex.: 31/02/2024)
+    """
+    text = str(value or "").strip()
+    if not text:
+        return ""
+    for parse in (date.fromisoformat, datetime.fromisoformat):
+        try:
+            parsed = parse(text)
+        except ValueError:
+            continue
+        if isinstance(parsed, datetime):
+            return parsed.isoformat(timespec='seconds')
+        return parsed.isoformat()
+    for fmt, has_time in TIMESTAMP_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return parsed.isoformat(timespec='seconds') if has_time else parsed.date().isoformat()
+    raise ValueError(f"data inválida: {text!r} (use AAAA-MM-DD ou DD/MM/AAAA)")
+
+
+def parse_trip(record):
+    """
+    Valida um registro de entrada e devolve a viagem com os campos já
+    convertidos.
+
+    Returns:
+        Trip: Viagem validada (timestamp "" se o registro não tiver data)
+
+    Raises:
+        ValueError: Registro incompleto ou com valores inválidos
+    """
+    origin = str(record.get("origin") or "").strip()
+    dest = str(record.get("destination") or "").strip()
+    if not origin or not dest:
+        raise ValueError("origem e destino são obrigatórios")
+    try:
+        start = parse_number(record.get("start_odometer"))
+        end = parse_number(record.get("end_odometer"))
+        tolls = parse_number(record.get("tolls"), 0.0)
+        parking = parse_number(record.get("parking"), 0.0)
+        distance = parse_number(record.get("distance"), end - start)
+    except ValueError:
+        raise ValueError("hodômetros e valores devem ser numéricos")
+    if end < start:
+        raise ValueError("hodômetro final menor que inicial")
+    if distance < 0 or tolls < 0 or parking < 0:
+        raise ValueError("distância, pedágio e estacionamento não podem ser negativos")
+    return Trip(
+        origin,
+        dest,
+        start,
+        end,
+        distance,
+        tolls,
+        parking,
+        # data/hora da viagem (opcional), em texto ISO
+        timestamp=parse_timestamp(record.get("timestamp")),
+    )
+
+
+def read_records(stream, fmt):
+    """
+    Gera (número da linha, registro) a partir de um CSV com cabeçalho ou JSONL.
+    """
+    if fmt == "jsonl":
+        import json
+
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError:
+                    yield line_no, None
+    else:
+        import csv
+
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class TripWriter:
+    """Grava viagens precificadas no formato do trips.csv (CSV ou JSONL)."""
+
+    def __init__(self, stream, fmt):
+        from app.trip_index import TIMESTAMP_FIELD
+        from app.trip_store import TRIP_FIELDS
+
+        self.fields = TRIP_FIELDS + [TIMESTAMP_FIELD]
+        self.fmt = fmt
+        self.stream = stream
+        if fmt == "csv":
+            import csv
+
+            self.writer = csv.writer(stream)
+            self.writer.writerow(self.fields)
+        else:
+            import json
+
+            self.json = json
+
+    def write(self, row):
+        if self.fmt == "csv":
+            self.writer.writerow(row)
+        else:
+            self.stream.write(self.json.dumps(dict(zip(self.fields, row)), ensure_ascii=False) + "\n")
+
+
+def make_resolver(data_dir, kind="matrix", **options):
+    """
+    Resolvedor de distâncias pela Routes API, com o cache de rotas de data_dir.
+
+    Args:
+        data_dir (str): Diretório do cache de rotas e de endereços
+        kind (str): "matrix" (computeRouteMatrix, em blocos) ou "routes"
+            (computeRoutes, um par por requisição, muitas ao mesmo tempo)
+        **options: Argumentos extras do resolvedor
+    """
+    import os
+
+    from app.address_normalizer import AddressNormalizer
+    from app.route_cache import RouteCache
+
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        load_dotenv = None
+    if load_dotenv is not None:
+        load_dotenv()
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY", "").strip()
+    normalizer = AddressNormalizer(os.path.join(data_dir, "addresses.sqlite3"))
+    cache = RouteCache(os.path.join(data_dir, "routes_cache.sqlite3"), normalizer=normalizer)
+    if kind == "routes":
+        from app.async_routes import AsyncRoutesResolver
+
+        return AsyncRoutesResolver(api_key, cache=cache, **options)
+    from app.route_matrix import RouteMatrixResolver
+
+    return RouteMatrixResolver(api_key, cache=cache, **options)
+
+
+def price_trips(records, writer, calculator, resolver=None, batch_size=5000, errors=None):
+    """
+    Precifica as viagens em lotes de batch_size, mantendo memória constante.
+
+    Returns:
+        tuple[int, int]: (viagens gravadas, registros rejeitados)
+    """
+    errors = errors or sys.stderr
+    written = 0
+    rejected = 0
+    for batch in batched(records, batch_size):
+        trips = []
+        for line_no, record in batch:
+            try:
+                if not isinstance(record, dict):
+                    raise ValueError("registro malformado")
+                trips.append(parse_trip(record))
+            except ValueError as e:
+                rejected += 1
+                print(f"linha {line_no}: {e}", file=errors)
+        if not trips:
+            continue
+
+        if resolver is not None:
+            distances, _ = resolver.resolve([(t.origin, t.destination) for t in trips])
+            trips = [
+                trip.with_distance(distance) if distance is not None and distance > 0 else trip
+                for trip, distance in zip(trips, distances)
+            ]
+
+        expenses = calculator.calculate_batch(
+            [t.distance for t in trips],
+            [t.tolls for t in trips],
+            [t.parking for t in trips],
+            dates=[t.timestamp or None for t in trips],
+        )
+        for trip, expense in zip(trips, expenses_from_batch(expenses)):
+            writer.write(trip.to_row(expense))
+        written += len(trips)
+    return written, rejected
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    import time
+
+    from app.expense import ExpenseCalculator
+
+    input_format = args.input_format or ("jsonl" if args.input.endswith(".jsonl") else "csv")
+    calculator = ExpenseCalculator(km_rate=args.km_rate)
+    resolver = make_resolver(args.data_dir, args.resolver) if args.resolve_distances else None
+
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        writer = TripWriter(target, args.output_format)
+        written, rejected = price_trips(
+            read_records(source, input_format), writer, calculator, resolver, args.batch_size
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    elapsed = time.perf_counter() - start
+
+    rate = written / elapsed if elapsed > 0 else 0.0
+    print(
+        f"{written} viagens precificadas em {elapsed:.2f} s ({rate:,.0f} viagens/s); "
+        f"{rejected} registros rejeitados.",
+        file=sys.stderr,
+    )
+    return 1 if rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""
+Estimativa de distância sem rede, usada quando a Routes API não responde.
+
+Os endereços são ligados a coordenadas de uma tabela local de cidades
+(app/coordinates.json, mais data/coordinates.json se existir). A distância
+em linha reta (haversine) é multiplicada por um fator de sinuosidade das
+estradas aprendido por região com as viagens já gravadas no trips.csv, e
+cada estimativa vem com a margem de erro observada nessas viagens.
+
+Uso (na raiz do projeto):
+    python3 -m app.distance_estimator "Av. Paulista, São Paulo" "Centro, Campinas"
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import threading
+from collections import deque
+
+from app.address_normalizer import canonicalize_address
+
+COORDINATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "coordinates.json")
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Região usada quando origem e destino ficam em estados diferentes
+INTERSTATE = "interestadual"
+# Região com todas as amostras, usada quando a região da viagem tem poucas
+ALL_REGIONS = "*"
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distância em linha reta (km) entre dois pontos na superfície da Terra."""
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    a = (
+        math.sin((p2 - p1) / 2) ** 2
+        + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def load_coordinates(*paths):
+    """
+    Lê tabelas de coordenadas (listas JSON de {"name", "uf", "lat", "lon"}).
+    Arquivos ausentes são ignorados; os posteriores sobrescrevem os anteriores.
+
+    Returns:
+        dict: nome canônico -> (lat, lon, uf)
+    """
+    places = {}
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            for item in json.load(f):
+                key = canonicalize_address(item["name"])
+                places[key] = (float(item["lat"]), float(item["lon"]), str(item.get("uf", "")).upper())
+    return places
+
+
+class OfflineDistanceEstimator:
+    """
+    Estima a distância rodoviária entre dois endereços sem acessar a rede.
+
+    O fator de sinuosidade (distância pela estrada / distância em linha
+    reta) de cada região é a mediana das viagens observadas; a margem de
+    erro é o percentil 90 do desvio relativo em torno dessa mediana.
+    """
+
+    # Sinuosidade e margem usadas enquanto não há viagens suficientes
+    DEFAULT_CIRCUITY = 1.3
+    DEFAULT_ERROR_RATE = 0.35
+    # Margem mínima: coordenadas são do centro da cidade, não do endereço
+    MIN_ERROR_RATE = 0.02
+    # Viagens mínimas numa região para usar o fator dela
+    MIN_SAMPLES = 5
+    # Viagens mais curtas que isso (em linha reta) não calibram: o centro
+    # da cidade não representa bem os dois endereços
+    MIN_CALIBRATION_KM = 10.0
+    # Razões fora deste intervalo são tratadas como erro de digitação
+    CIRCUITY_RANGE = (1.0, 3.0)
+    # Amostras guardadas por região (as mais recentes)
+    MAX_SAMPLES = 2000
+
+    def __init__(self, places=None, extra_coordinates=None):
+        """
+        Args:
+            places (dict): Tabela nome canônico -> (lat, lon, uf) (padrão: a embutida)
+            extra_coordinates (str): JSON adicional de coordenadas (ex.: data/coordinates.json)
+        """
+        if places is None:
+            places = load_coordinates(COORDINATES_FILE, extra_coordinates)
+        self.places = places
+        self._max_words = max((len(name.split()) for name in places), default=0)
+        self._located = {}
+        self._samples = {}
+        self._factors = {}
+        self._calibrated_from = None
+        self._lock = threading.Lock()
+
+    def locate(self, address):
+        """
+        Acha a cidade citada no endereço (a que aparece mais perto do fim).
+
+        Returns:
+            tuple | None: (lat, lon, uf) ou None se nenhuma cidade conhecida aparece
+        """
+        place = self._located.get(address)
+        if place is None and address not in self._located:
+            tokens = canonicalize_address(address).split()
+            for end in range(len(tokens), 0, -1):
+                for size in range(min(self._max_words, end), 0, -1):
+                    place = self.places.get(" ".join(tokens[end - size:end]))
+                    if place is not None:
+                        break
+                if place is not None:
+                    break
+            if len(self._located) >= 10_000:
+                self._located.clear()
+            self._located[address] = place
+        return place
+
+    @staticmethod
+    def _region(a, b):
+        return a[2] if a[2] == b[2] else INTERSTATE
+
+    def _sample(self, origin, dest, distance_km):
+        """
+        Returns:
+            tuple | None: (região, sinuosidade) da viagem, ou None se ela não calibra
+        """
+        a = self.locate(origin)
+        b = self.locate(dest)
+        if a is None or b is None:
+            return None
+        straight = haversine_km(a[0], a[1], b[0], b[1])
+        if straight < self.MIN_CALIBRATION_KM:
+            return None
+        ratio = float(distance_km) / straight
+        if not self.CIRCUITY_RANGE[0] <= ratio <= self.CIRCUITY_RANGE[1]:
+            return None
+        return self._region(a, b), ratio
+
+    def _add(self, samples, region, ratio):
+        for key in (region, ALL_REGIONS):
+            found = samples.get(key)
+            if found is None:
+                found = samples[key] = deque(maxlen=self.MAX_SAMPLES)
+            found.append(ratio)
+
+    def observe(self, origin, dest, distance_km):
+        """
+        Usa uma viagem com distância conhecida (Google Maps ou hodômetro)
+        para calibrar o fator da região.
+
+        Returns:
+            bool: True se a viagem entrou na calibração
+        """
+        sample = self._sample(origin, dest, distance_km)
+        if sample is None:
+            return False
+        region, ratio = sample
+        with self._lock:
+            self._add(self._samples, region, ratio)
+            self._factors.pop(region, None)
+            self._factors.pop(ALL_REGIONS, None)
+        return True
+
+    def calibrate(self, csv_path):
+        """
+        Calibra com todas as viagens do trips.csv (colunas origin,
+        destination e distance).
+
+        Returns:
+            int: Viagens usadas na calibração
+        """
+        if not os.path.exists(csv_path):
+            return self.calibrate_trips((), csv_path)
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            return self.calibrate_trips(
+                ((row.get("origin") or "", row.get("destination") or "", row.get("distance"))
+                 for row in csv.DictReader(f)),
+                csv_path,
+            )
+
+    def calibrate_trips(self, trips, source=None):
+        """
+        Calibra com viagens já gravadas, descartando a calibração anterior.
+        As amostras novas só substituem as anteriores no fim, então a
+        calibração pode rodar numa thread enquanto estimate é usado.
+
+        Args:
+            trips (Iterable): (origem, destino, distância em km) de cada viagem
+            source: De onde vieram as viagens (ver ensure_calibrated)
+
+        Returns:
+            int: Viagens usadas na calibração
+        """
+        samples = {}
+        used = 0
+        for origin, dest, distance in trips:
+            try:
+                distance = float(distance or "")
+            except ValueError:
+                continue
+            sample = self._sample(origin, dest, distance)
+            if sample is not None:
+                self._add(samples, *sample)
+                used += 1
+        with self._lock:
+            self._samples = samples
+            self._factors = {}
+            self._calibrated_from = source
+        return used
+
+    def is_calibrated(self, source):
+        """True se a calibração atual veio de source (ver ensure_calibrated)."""
+        return self._calibrated_from == source
+
+    def ensure_calibrated(self, source, trips=None):
+        """
+        Calibra na primeira vez (ou quando source muda): com as viagens de
+        trips(), se dado, ou com o CSV source.
+        """
+        if not self.is_calibrated(source):
+            if trips is None:
+                self.calibrate(source)
+            else:
+                self.calibrate_trips(trips(), source)
+
+    def _factor(self, region):
+        # (sinuosidade, margem de erro relativa, amostras)
+        # chamado com self._lock
+        factor = self._factors.get(region)
+        if factor is None:
+            samples = sorted(self._samples.get(region, ()))
+            n = len(samples)
+            if n < self.MIN_SAMPLES:
+                return None
+            mid = n // 2
+            median = samples[mid] if n % 2 else (samples[mid - 1] + samples[mid]) / 2
+            deviations = sorted(abs(r / median - 1) for r in samples)
+            error = max(self.MIN_ERROR_RATE, deviations[min(n - 1, math.ceil(0.9 * n) - 1)])
+            factor = self._factors[region] = (median, error, n)
+        return factor
+
+    def estimate(self, origin, dest):
+        """
+        Estima a distância rodoviária entre dois endereços.
+
+        Returns:
+            dict | None: {'distance_km', 'error_km', 'error_rate', 'region', 'samples'},
+            ou None se algum dos endereços não tem cidade conhecida
+            ou os dois caem no mesmo ponto da tabela
+        """
+        a = self.locate(origin)
+        b = self.locate(dest)
+        if a is None or b is None:
+            return None
+        straight = haversine_km(a[0], a[1], b[0], b[1])
+        if straight <= 0:
+            return None
+        region = self._region(a, b)
+        with self._lock:
+            factor = self._factor(region) or self._factor(ALL_REGIONS)
+        if factor is None:
+            circuity, error_rate, samples = self.DEFAULT_CIRCUITY, self.DEFAULT_ERROR_RATE, 0
+        else:
+            circuity, error_rate, samples = factor
+        distance = straight * circuity
+        return {
+            'distance_km': distance,
+            'error_km': distance * error_rate,
+            'error_rate': error_rate,
+            'region': region,
+            'samples': samples,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.distance_estimator",
+        description="Estima a distância entre dois endereços sem acessar a rede.",
+    )
+    parser.add_argument("origin")
+    parser.add_argument("destination")
+    parser.add_argument("--csv", default="data/trips.csv", help="trips.csv usado na calibração")
+    parser.add_argument("--coordinates", default="data/coordinates.json", help="coordenadas adicionais")
+    args = parser.parse_args(argv)
+
+    estimator = OfflineDistanceEstimator(extra_coordinates=args.coordinates)
+    used = estimator.calibrate(args.csv)
+    result = estimator.estimate(args.origin, args.destination)
+    if result is None:
+        print("Não foi possível estimar: cidade de origem ou destino desconhecida.", file=sys.stderr)
+        return 1
+    print(
+        f"{result['distance_km']:.1f} km ± {result['error_km']:.1f} km "
+        f"(região {result['region']}, {result['samples']} viagens de calibração; "
+        f"{used} viagens usadas do CSV)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
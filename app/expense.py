@@ -0,0 +1,391 @@
+import json
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from app.records import Expense, format_summary
+
+
+class ExpenseCalculator:
+    """
+    Classe responsável por calcular as despesas consolidadas de uma viagem.
+    Consolida o custo total baseado na quilometragem, pedágios e taxas de estacionamento.
+    """
+    
+    # Taxa padrão por quilômetro (em R$)
+    DEFAULT_KM_RATE = 0.50
+    
+    def __init__(self, km_rate=None, schedule=None):
+        """
+        Inicializa o calculador de despesas.
+        
+        Args:
+            km_rate (float): Taxa de reembolso por km (padrão: R$ 0.50/km)
+            schedule (RateSchedule): Tabela de taxas por data/faixa de distância;
+                quando informada, substitui km_rate
+        """
+        self.km_rate = km_rate if km_rate is not None else self.DEFAULT_KM_RATE
+        self.schedule = schedule
+
+    def rate_for(self, distance, trip_date=None):
+        """
+        Retorna a taxa por km aplicável a uma viagem.
+
+        Args:
+            distance (float): Distância em km
+            trip_date (date | str): Data da viagem (padrão: hoje)
+        """
+        if self.schedule is None:
+            return self.km_rate
+        return self.schedule.rate_for(trip_date, distance)
+    
+    def calculate_km_expense(self, distance, trip_date=None):
+        """
+        Calcula a despesa baseada na quilometragem.
+        
+        Args:
+            distance (float): Distância em km
+            trip_date (date | str): Data da viagem, usada com tabela de taxas
+            
+        Returns:
+            float: Despesa de quilometragem em R$
+        """
+        if distance < 0:
+            raise ValueError("Distância não pode ser negativa")
+        # Use Decimal for deterministic monetary rounding (ROUND_HALF_UP)
+        d_distance = Decimal(str(distance))
+        d_rate = Decimal(str(self.rate_for(distance, trip_date)))
+        km_cost = (d_distance * d_rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return float(km_cost)
+    
+    def calculate_expense(self, distance, tolls=0, parking=0, trip_date=None):
+        """
+        Calcula a despesa total consolidada como um registro Expense.
+
+        Args:
+            distance (float): Distância em km
+            tolls (float): Valor de pedágios em R$
+            parking (float): Valor de estacionamento em R$
+            trip_date (date | str): Data da viagem, usada com tabela de taxas
+
+        Returns:
+            Expense: Detalhamento das despesas
+        """
+        try:
+            tolls = float(tolls) if tolls else 0
+            parking = float(parking) if parking else 0
+            distance = float(distance)
+            
+            if distance < 0:
+                raise ValueError("Distância não pode ser negativa")
+            if tolls < 0:
+                raise ValueError("Pedágio não pode ser negativo")
+            if parking < 0:
+                raise ValueError("Estacionamento não pode ser negativo")
+            
+            # Use Decimal for rounding monetary values to avoid floating point
+            d_distance = Decimal(str(distance))
+            d_tolls = Decimal(str(tolls)) if str(tolls) != "" else Decimal('0')
+            d_parking = Decimal(str(parking)) if str(parking) != "" else Decimal('0')
+
+            km_expense = Decimal(str(self.calculate_km_expense(float(d_distance), trip_date)))
+
+            d_tolls = d_tolls.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            d_parking = d_parking.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+            total = (km_expense + d_tolls + d_parking).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+            return Expense(
+                distance_km=float(d_distance.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)),
+                km_expense=float(km_expense),
+                tolls=float(d_tolls),
+                parking=float(d_parking),
+                total=float(total),
+            )
+        except ValueError as e:
+            raise ValueError(f"Erro no cálculo de despesas: {str(e)}")
+
+    def price_trip(self, trip):
+        """
+        Calcula as despesas de uma viagem (a data vem do timestamp, se houver).
+
+        Args:
+            trip (Trip): Viagem validada
+
+        Returns:
+            Expense: Detalhamento das despesas
+        """
+        return self.calculate_expense(
+            trip.distance, trip.tolls, trip.parking, trip_date=trip.timestamp or None
+        )
+
+    def calculate_total_expense(self, distance, tolls=0, parking=0, trip_date=None):
+        """
+        Calcula a despesa total consolidada.
+        
+        Args:
+            distance (float): Distância em km
+            tolls (float): Valor de pedágios em R$
+            parking (float): Valor de estacionamento em R$
+            trip_date (date | str): Data da viagem, usada com tabela de taxas
+            
+        Returns:
+            dict: Dicionário com detalhamento das despesas
+                {
+                    'distance_km': float,
+                    'km_expense': float,
+                    'tolls': float,
+                    'parking': float,
+                    'total': float
+                }
+        """
+        return self.calculate_expense(distance, tolls, parking, trip_date).as_dict()
+    
+    def get_expense_summary(self, distance, tolls=0, parking=0, trip_date=None):
+        """
+        Retorna um resumo formatado das despesas. Quem já tem o resultado de
+        calculate_expense deve usar format_summary, sem recalcular.
+        
+        Args:
+            distance (float): Distância em km
+            tolls (float): Valor de pedágios em R$
+            parking (float): Valor de estacionamento em R$
+            trip_date (date | str): Data da viagem, usada com tabela de taxas
+            
+        Returns:
+            str: String formatada com resumo das despesas
+        """
+        return format_summary(self.calculate_expense(distance, tolls, parking, trip_date))
+
+    def calculate_batch(self, distances, tolls=None, parking=None, centavos=False, dates=None):
+        """
+        Calcula as despesas de muitas viagens de uma vez, em formato colunar.
+
+        Usa aritmética inteira em centavos em vez de criar vários Decimal por
+        viagem, mas com o mesmo arredondamento ROUND_HALF_UP de
+        calculate_total_expense (os resultados batem centavo a centavo).
+
+        Args:
+            distances (Sequence[float]): Distâncias em km
+            tolls (Sequence[float]): Pedágios em R$ (None = tudo zero)
+            parking (Sequence[float]): Estacionamentos em R$ (None = tudo zero)
+            centavos (bool): Se True, devolve inteiros em centavos em vez de float
+            dates (Sequence[date | str]): Datas das viagens, usadas com tabela
+                de taxas (None = hoje para todas)
+
+        Returns:
+            dict: Mesmas chaves de calculate_total_expense, cada uma com uma lista
+                {
+                    'distance_km': [...],
+                    'km_expense': [...],
+                    'tolls': [...],
+                    'parking': [...],
+                    'total': [...]
+                }
+        """
+        n = len(distances)
+        if tolls is None:
+            tolls = [0] * n
+        if parking is None:
+            parking = [0] * n
+        if len(tolls) != n or len(parking) != n or (dates is not None and len(dates) != n):
+            raise ValueError(
+                "Erro no cálculo de despesas: colunas com tamanhos diferentes"
+            )
+
+        schedule = self.schedule
+        if schedule is None:
+            rate_units, rate_scale = _parse_scaled(float(self.km_rate))
+        else:
+            # data (como veio na coluna) -> (limites das faixas, taxas escaladas)
+            tiers_by_date = {}
+
+        out_distance = [0] * n
+        out_km = [0] * n
+        out_tolls = [0] * n
+        out_parking = [0] * n
+        out_total = [0] * n
+
+        for i in range(n):
+            try:
+                d = float(distances[i])
+                t = float(tolls[i]) if tolls[i] else 0.0
+                p = float(parking[i]) if parking[i] else 0.0
+            except ValueError as e:
+                raise ValueError(f"Erro no cálculo de despesas (linha {i}): {str(e)}")
+            if d < 0:
+                raise ValueError(f"Erro no cálculo de despesas (linha {i}): Distância não pode ser negativa")
+            if t < 0:
+                raise ValueError(f"Erro no cálculo de despesas (linha {i}): Pedágio não pode ser negativo")
+            if p < 0:
+                raise ValueError(f"Erro no cálculo de despesas (linha {i}): Estacionamento não pode ser negativo")
+
+            if schedule is not None:
+                trip_date = None if dates is None else dates[i]
+                tiers = tiers_by_date.get(trip_date)
+                if tiers is None:
+                    try:
+                        tiers = tiers_by_date[trip_date] = schedule.tiers_for(trip_date)
+                    except ValueError as e:
+                        raise ValueError(f"Erro no cálculo de despesas (linha {i}): {str(e)}")
+                thresholds, scaled_rates = tiers
+                rate_units, rate_scale = scaled_rates[bisect_right(thresholds, d) - 1]
+            d_units, d_scale = _parse_scaled(d)
+            km = _round_half_up_cents(d_units * rate_units, d_scale + rate_scale)
+            t_cents = _round_half_up_cents(*_parse_scaled(t)) if t else 0
+            p_cents = _round_half_up_cents(*_parse_scaled(p)) if p else 0
+
+            out_distance[i] = _round_half_up_cents(d_units, d_scale)
+            out_km[i] = km
+            out_tolls[i] = t_cents
+            out_parking[i] = p_cents
+            out_total[i] = km + t_cents + p_cents
+
+        result = {
+            'distance_km': out_distance,
+            'km_expense': out_km,
+            'tolls': out_tolls,
+            'parking': out_parking,
+            'total': out_total,
+        }
+        if not centavos:
+            for key, column in result.items():
+                result[key] = [c / 100 for c in column]
+        return result
+
+
+class RateSchedule:
+    """
+    Tabela de taxas por km que muda com a data e com a faixa de distância.
+
+    Cada versão da tabela vale a partir de uma data de vigência e define
+    faixas pela distância mínima da viagem; a viagem inteira usa a taxa da
+    faixa em que sua distância cai. A tabela é compilada em listas ordenadas,
+    então achar a taxa de uma viagem são duas buscas binárias (bisect).
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries (Iterable[tuple]): (data de vigência, distância mínima em km, taxa).
+                Entradas com a mesma data formam uma versão completa da tabela,
+                que precisa ter uma faixa começando em 0 km.
+
+        Raises:
+            ValueError: Tabela vazia, sem faixa a partir de 0 km ou com faixa repetida
+        """
+        versions = {}
+        for effective_date, min_distance, rate in entries:
+            versions.setdefault(_date_key(effective_date), []).append(
+                (float(min_distance), float(rate))
+            )
+        if not versions:
+            raise ValueError("Tabela de taxas vazia")
+
+        self.dates = sorted(versions)
+        self.thresholds = []
+        self.rates = []
+        self.scaled_rates = []
+        for effective_date in self.dates:
+            tiers = sorted(versions[effective_date])
+            if tiers[0][0] != 0:
+                raise ValueError(
+                    f"Tabela de {effective_date} precisa de uma faixa a partir de 0 km"
+                )
+            thresholds = [t[0] for t in tiers]
+            if len(set(thresholds)) != len(thresholds):
+                raise ValueError(f"Tabela de {effective_date} tem faixas repetidas")
+            if any(rate < 0 for _, rate in tiers):
+                raise ValueError(f"Tabela de {effective_date} tem taxa negativa")
+            self.thresholds.append(thresholds)
+            self.rates.append([t[1] for t in tiers])
+            self.scaled_rates.append([_parse_scaled(t[1]) for t in tiers])
+        # data da viagem -> índice da versão (viagens costumam repetir datas)
+        self._version_cache = {}
+
+    @classmethod
+    def load(cls, path):
+        """
+        Carrega a tabela de um JSON com uma lista de objetos
+        {"effective_date": "AAAA-MM-DD", "min_distance_km": 0, "rate": 0.50}.
+        """
+        with open(path, encoding='utf-8') as f:
+            items = json.load(f)
+        return cls(
+            (item["effective_date"], item.get("min_distance_km", 0), item["rate"])
+            for item in items
+        )
+
+    def _version(self, date_key):
+        index = self._version_cache.get(date_key)
+        if index is None:
+            index = bisect_right(self.dates, date_key) - 1
+            if index < 0:
+                raise ValueError(f"Nenhuma taxa vigente em {date_key}")
+            self._version_cache[date_key] = index
+        return index
+
+    def rate_for(self, trip_date, distance):
+        """
+        Taxa por km de uma viagem com a data e a distância informadas.
+
+        Raises:
+            ValueError: Data anterior à primeira vigência
+        """
+        v = self._version(_date_key(trip_date))
+        return self.rates[v][bisect_right(self.thresholds[v], distance) - 1]
+
+    def tiers_for(self, trip_date):
+        """
+        Faixas vigentes na data: (distâncias mínimas, taxas como (inteiro, escala)),
+        usadas pelo cálculo em lote.
+        """
+        v = self._version(_date_key(trip_date))
+        return self.thresholds[v], self.scaled_rates[v]
+
+
+def _date_key(value):
+    """
+    Normaliza uma data (date, datetime, texto ISO ou None = hoje) para AAAA-MM-DD.
+    """
+    if value is None:
+        return date.today().isoformat()
+    if isinstance(value, str):
+        return value.strip()[:10]
+    return value.isoformat()[:10]
+
+
+def _parse_scaled(value):
+    """
+    Converte um float em (inteiro, escala) tal que value == inteiro / 10**escala,
+    usando a mesma representação decimal de Decimal(str(value)).
+    """
+    s = repr(value)
+    if 'e' in s or 'n' in s:
+        # notação científica (ou inf/nan): deixa o Decimal resolver
+        sign, digits, exponent = Decimal(s).as_tuple()
+        if not isinstance(exponent, int):
+            raise ValueError(f"Valor inválido: {s}")
+        units = int(''.join(map(str, digits)) or '0')
+        if sign:
+            units = -units
+        if exponent >= 0:
+            return units * 10 ** exponent, 0
+        return units, -exponent
+    int_part, _, frac = s.partition('.')
+    if frac == '0':
+        return int(int_part), 0
+    return int(int_part + frac), len(frac)
+
+
+def _round_half_up_cents(units, scale):
+    """
+    Arredonda units / 10**scale (não negativo) para centavos com ROUND_HALF_UP.
+    """
+    if scale <= 2:
+        return units * 10 ** (2 - scale)
+    divisor = 10 ** (scale - 2)
+    q, r = divmod(units, divisor)
+    if 2 * r >= divisor:
+        q += 1
+    return q
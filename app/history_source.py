@@ -0,0 +1,386 @@
+"""
+Leitura paginada do data/trips.csv para a lista de histórico e para o
+serviço HTTP (sem tkinter: o serviço roda em máquinas sem interface gráfica).
+"""
+import csv
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+from app.trip_store import TRIP_FIELDS
+
+
+def read_last_rows(path, n, block_size=8192):
+    """
+    Lê as últimas n linhas de um CSV sem percorrer o arquivo inteiro:
+    volta do final do arquivo em blocos até encontrar n linhas completas.
+
+    Args:
+        path (str): Caminho do CSV
+        n (int): Quantidade máxima de linhas a devolver
+        block_size (int): Tamanho do bloco lido a cada passo (bytes)
+
+    Returns:
+        list[list[str]]: Linhas já separadas em campos, da mais antiga para a mais nova
+    """
+    if n <= 0 or not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b''
+        # n + 1 quebras garantem n linhas completas mesmo com '\n' no final
+        while pos > 0 and data.count(b'\n') <= n:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.splitlines()
+    if pos > 0:
+        # a primeira linha pode ter sido cortada no meio
+        lines = lines[1:]
+    text = [line.decode('utf-8') for line in lines[-n:] if line.strip()]
+    return list(csv.reader(text))
+
+
+class HistorySource:
+    """
+    Acesso paginado às viagens do data/trips.csv para a lista de histórico.
+
+    A primeira leitura mostra só as últimas viagens, lidas do fim do arquivo
+    (o custo não depende do tamanho do histórico). O índice de offsets, com
+    o offset (em bytes) de uma linha a cada `every` viagens, é montado
+    depois por build_index (numa thread) ou na primeira busca; para mostrar
+    a viagem n, vai ao offset do bloco de n com seek e lê a partir dali. As
+    páginas lidas ficam num cache LRU pequeno.
+
+    A busca por endereço lê o arquivo em trechos de SEARCH_BYTES (a memória
+    não depende do tamanho do histórico nem de quantos endereços ele tem) e
+    guarda os resultados das últimas max_queries buscas; ao repetir uma
+    busca, só as viagens gravadas desde a anterior são lidas.
+    """
+
+    # bytes do final da parte indexada usados para detectar um CSV alterado
+    TAIL_BYTES = 64
+    # bytes lidos de cada vez na busca por endereço
+    SEARCH_BYTES = 1 << 20
+
+    def __init__(self, csv_path, every=128, page_rows=64, max_pages=16, seed_rows=None, max_queries=8):
+        """
+        Args:
+            csv_path (str): Caminho do trips.csv
+            every (int): Viagens por bloco do índice de offsets
+            page_rows (int): Viagens lidas do disco de cada vez
+            max_pages (int): Páginas mantidas em memória
+            seed_rows (int): Últimas viagens mostradas antes do índice (padrão: page_rows)
+            max_queries (int): Resultados de busca mantidos (por texto buscado)
+        """
+        self.csv_path = csv_path
+        self.every = every
+        self.page_rows = page_rows
+        self.max_pages = max_pages
+        self.seed_rows = seed_rows or page_rows
+        self.max_queries = max_queries
+        # refresh/rows/busca (thread do Tk) e build_index (outra thread)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._indexed = False
+        self._seed = []
+        self._offsets = array('q')
+        self._rows = 0
+        self._size = 0
+        self._first_line = None
+        self._tail = b''
+        self._columns = (0, 1)
+        self._pages = OrderedDict()
+        # texto buscado (casefold) -> (viagens encontradas, viagens verificadas)
+        self._results = OrderedDict()
+        self._query = None
+        self._matches = None
+
+    def __len__(self):
+        """Viagens na visão atual (todas, ou só as da busca)."""
+        if self._matches is not None:
+            return len(self._matches)
+        return self._rows if self._indexed else len(self._seed)
+
+    @property
+    def total(self):
+        return self._rows if self._indexed else len(self._seed)
+
+    @property
+    def indexed(self):
+        """False enquanto só as últimas viagens (lidas do fim do arquivo) estão disponíveis."""
+        return self._indexed
+
+    @property
+    def query(self):
+        return self._query
+
+    def _is_current(self, f, size):
+        if self._size > size:
+            return False
+        if self._size == 0:
+            return True
+        f.seek(0)
+        if f.readline() != self._first_line:
+            return False
+        start = max(0, self._size - self.TAIL_BYTES)
+        f.seek(start)
+        return f.read(self._size - start) == self._tail
+
+    def refresh(self):
+        """
+        Antes do índice, relê as últimas viagens do fim do arquivo. Depois,
+        indexa só as viagens acrescentadas desde a última chamada (se o
+        arquivo foi trocado, volta às últimas viagens) e atualiza a busca.
+
+        Returns:
+            int: Viagens novas
+        """
+        with self._lock:
+            if not os.path.exists(self.csv_path):
+                self._reset()
+                return 0
+            if self._indexed:
+                with open(self.csv_path, 'rb') as f:
+                    size = os.fstat(f.fileno()).st_size
+                    if self._is_current(f, size):
+                        old_rows = self._rows
+                        if size > self._size:
+                            self._index_tail(f)
+                        if self._rows > old_rows:
+                            # a última página pode ter sido lida pela metade
+                            for page in [p for p in self._pages if (p + 1) * self.page_rows > old_rows]:
+                                del self._pages[page]
+                            if self._query:
+                                self._matches = self.matches(self._query)
+                        return self._rows - old_rows
+                query = self._query
+                self._reset()
+                self._query = query
+            old_rows = len(self._seed)
+            self._seed_from_tail()
+            if self._query:
+                # a busca precisa do índice; sem ele, o arquivo é indexado aqui
+                self._matches = self.matches(self._query)
+            return max(0, len(self._seed) - old_rows)
+
+    def _seed_from_tail(self):
+        with open(self.csv_path, 'rb') as f:
+            first = f.readline()
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size:
+                f.seek(size - 1)
+                complete = f.read(1) == b'\n'
+        if not first.endswith(b'\n'):
+            self._seed = []
+            return
+        header = next(csv.reader([first.decode('utf-8')]), [])
+        has_header = set(TRIP_FIELDS) <= set(header)
+        rows = read_last_rows(self.csv_path, self.seed_rows + 2)
+        if not complete and rows:
+            # linha incompleta no fim (gravação interrompida): ignorada, como no índice
+            rows.pop()
+        if has_header and rows and rows[0] == header:
+            # arquivo pequeno: a leitura do fim chegou ao cabeçalho
+            rows.pop(0)
+        self._seed = rows[-self.seed_rows:]
+        if has_header:
+            self._columns = (header.index("origin"), header.index("destination"))
+
+    def build_index(self):
+        """
+        Monta o índice de offsets do arquivo inteiro. A leitura do arquivo é
+        feita sem travar a fonte, então pode rodar numa thread enquanto a
+        lista mostra as últimas viagens; chame refresh (na thread da lista)
+        depois para mostrar o histórico inteiro.
+
+        Returns:
+            int: Viagens indexadas
+        """
+        with self._lock:
+            if self._indexed or not os.path.exists(self.csv_path):
+                return self._rows
+        scan = HistorySource(self.csv_path, self.every)
+        with open(self.csv_path, 'rb') as f:
+            scan._index_tail(f)
+        with self._lock:
+            if not self._indexed:
+                query = self._query
+                self._reset()
+                for name in ('_offsets', '_rows', '_size', '_first_line', '_tail', '_columns'):
+                    setattr(self, name, getattr(scan, name))
+                self._indexed = True
+                self._query = query
+                # viagens gravadas durante a leitura, ou arquivo trocado
+                self.refresh()
+            return self._rows
+
+    def _index_tail(self, f):
+        f.seek(self._size)
+        pos = self._size
+        if self._first_line is None:
+            first = f.readline()
+            if not first.endswith(b'\n'):
+                return
+            self._first_line = first
+            header = next(csv.reader([first.decode('utf-8')]), [])
+            if set(TRIP_FIELDS) <= set(header):
+                self._columns = (header.index("origin"), header.index("destination"))
+                pos += len(first)
+            else:
+                # sem cabeçalho: a primeira linha já é uma viagem
+                f.seek(0)
+        offsets = self._offsets
+        rows = self._rows
+        every = self.every
+        while True:
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break
+            if rows % every == 0:
+                offsets.append(pos)
+            rows += 1
+            pos += len(line)
+        self._rows = rows
+        self._size = pos
+        start = max(0, pos - self.TAIL_BYTES)
+        f.seek(start)
+        self._tail = f.read(pos - start)
+
+    def _read(self, start, count):
+        """Lê count viagens a partir da viagem start, indo direto ao bloco."""
+        count = min(count, self._rows - start)
+        if count <= 0:
+            return []
+        block, skip = divmod(start, self.every)
+        with open(self.csv_path, 'rb') as f:
+            f.seek(self._offsets[block])
+            for _ in range(skip):
+                f.readline()
+            lines = [f.readline().decode('utf-8') for _ in range(count)]
+        return list(csv.reader(lines))
+
+    def _row(self, n):
+        page = n // self.page_rows
+        rows = self._pages.get(page)
+        if rows is None:
+            rows = self._pages[page] = self._read(page * self.page_rows, self.page_rows)
+            if len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page)
+        return rows[n - page * self.page_rows]
+
+    def rows(self, start, count):
+        """
+        Viagens [start, start + count) da visão atual, como listas de texto.
+        """
+        with self._lock:
+            end = min(start + count, len(self))
+            if self._matches is not None:
+                return [self._row(self._matches[i]) for i in range(max(0, start), end)]
+            if not self._indexed:
+                return self._seed[max(0, start):end]
+            return [self._row(n) for n in range(max(0, start), end)]
+
+    def rows_at(self, numbers):
+        """Viagens de números (posições no arquivo) dados, ex.: de matches()."""
+        with self._lock:
+            return [self._row(n) for n in numbers]
+
+    def _search(self, needle, start, offset, size, columns):
+        """
+        Viagens a partir da start com needle (casefold) na origem ou no
+        destino, lendo do offset do bloco de start até size. Não usa o estado
+        da fonte: roda sem a trava, com valores copiados sob ela.
+        """
+        found = array('I')
+        i_origin, i_dest = columns
+        with open(self.csv_path, 'rb') as f:
+            f.seek(offset)
+            for _ in range(start % self.every):
+                f.readline()
+            pos = f.tell()
+            n = start
+            rest = b''
+            while pos < size:
+                data = rest + f.read(min(self.SEARCH_BYTES, size - pos))
+                pos = f.tell()
+                cut = data.rfind(b'\n') + 1
+                text, rest = data[:cut].decode('utf-8').casefold(), data[cut:]
+                counted = 0
+                i = text.find(needle)
+                while i >= 0:
+                    begin = text.rfind('\n', 0, i) + 1
+                    end = text.index('\n', i)
+                    n += text.count('\n', counted, begin)
+                    counted = begin
+                    row = next(csv.reader([text[begin:end]]), [])
+                    if any(c < len(row) and needle in row[c] for c in (i_origin, i_dest)):
+                        found.append(n)
+                    i = text.find(needle, end)
+                n += text.count('\n', counted)
+        return found
+
+    def matches(self, query):
+        """
+        Números das viagens cuja origem ou destino contém query (sem
+        diferenciar maiúsculas), sem mudar a visão. Os últimos max_queries
+        resultados são mantidos e só completados com as viagens novas.
+
+        A leitura do arquivo é feita sem travar a fonte (como build_index),
+        então a busca pode rodar numa thread enquanto a lista rola.
+
+        Returns:
+            array: Números das viagens, em ordem
+        """
+        needle = (query or "").strip().casefold()
+        if not self._indexed:
+            self.build_index()
+        with self._lock:
+            if not needle:
+                return array('I', range(self._rows))
+            found, checked = self._results.get(needle, (array('I'), 0))
+            rows = self._rows
+            if checked >= rows:
+                self._results.move_to_end(needle)
+                return found
+            offsets = self._offsets
+            offset = offsets[checked // self.every]
+            size = self._size
+            columns = self._columns
+        found = found + self._search(needle, checked, offset, size, columns)
+        with self._lock:
+            if self._offsets is not offsets:
+                # arquivo trocado durante a leitura: busca de novo
+                return self.matches(query)
+            if self._results.get(needle, (None, 0))[1] <= rows:
+                self._results[needle] = (found, rows)
+                self._results.move_to_end(needle)
+                if len(self._results) > self.max_queries:
+                    self._results.popitem(last=False)
+            return found
+
+    def set_filter(self, query):
+        """
+        Restringe a visão às viagens cuja origem ou destino contém query
+        (sem diferenciar maiúsculas). query vazio volta a mostrar tudo.
+
+        Returns:
+            int: Viagens na visão
+        """
+        query = (query or "").strip()
+        with self._lock:
+            if not query:
+                self._query = None
+                self._matches = None
+                return len(self)
+            self._matches = self.matches(query)
+            self._query = query
+            return len(self._matches)
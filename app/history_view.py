@@ -0,0 +1,140 @@
+import threading
+import tkinter as tk
+
+
+class HistoryView(tk.Frame):
+    """
+    Lista de "Últimos registros" virtualizada: o Listbox só contém as linhas
+    visíveis, e a barra de rolagem representa o histórico inteiro. Ao rolar,
+    as linhas são buscadas no HistorySource.
+    """
+
+    # Intervalo (ms) entre as verificações de uma busca em andamento
+    POLL_MS = 50
+
+    def __init__(self, master, height=6, width=80, **kwargs):
+        super().__init__(master, **kwargs)
+        self.source = None
+        self.height = height
+        self.top = 0
+        self._pending_search = None
+
+        search = tk.Frame(self)
+        search.pack(fill='x')
+        tk.Label(search, text="Buscar endereço:").pack(side='left')
+        self.entry_search = tk.Entry(search, width=30)
+        self.entry_search.pack(side='left', padx=5)
+        self.entry_search.bind("<Return>", lambda event: self.search())
+        tk.Button(search, text="Buscar", command=self.search).pack(side='left')
+        tk.Button(search, text="Limpar", command=self.clear_search).pack(side='left', padx=5)
+        self.info = tk.Label(search, text="", fg="gray")
+        self.info.pack(side='left', padx=5)
+
+        body = tk.Frame(self)
+        body.pack(fill='both', expand=True, pady=2)
+        self.listbox = tk.Listbox(body, width=width, height=height)
+        self.listbox.pack(side='left', fill='both', expand=True)
+        self.scrollbar = tk.Scrollbar(body, orient='vertical', command=self.on_scroll)
+        self.scrollbar.pack(side='right', fill='y')
+
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll_by(-1 if e.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll_by(-1))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll_by(1))
+        self.listbox.bind("<Prior>", lambda e: self.scroll_by(-self.height))
+        self.listbox.bind("<Next>", lambda e: self.scroll_by(self.height))
+
+    def set_source(self, source):
+        self.source = source
+        self.top = 0
+        # uma busca na fonte anterior é descartada
+        self._pending_search = None
+
+    def on_scroll(self, action, *args):
+        """Comando da barra de rolagem ('moveto' fração | 'scroll' n units/pages)."""
+        if self.source is None:
+            return
+        if action == 'moveto':
+            self.show(int(float(args[0]) * len(self.source)))
+        elif action == 'scroll':
+            step = self.height if args[1] == 'pages' else 1
+            self.scroll_by(int(args[0]) * step)
+
+    def scroll_by(self, rows):
+        self.show(self.top + rows)
+        return "break"
+
+    def show(self, top):
+        """Mostra as linhas visíveis a partir da viagem top da visão atual."""
+        total = len(self.source) if self.source is not None else 0
+        self.top = max(0, min(top, total - self.height))
+        self.listbox.delete(0, tk.END)
+        rows = self.source.rows(self.top, self.height) if total else []
+        for row in rows:
+            self.listbox.insert(tk.END, " | ".join(row))
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        if self._pending_search is not None:
+            self.info.config(text=f"buscando {self._pending_search['query']!r}...")
+        elif self.source is not None and self.source.query:
+            self.info.config(text=f"{total} de {self.source.total} viagens")
+        elif self.source is not None and not self.source.indexed:
+            self.info.config(text=f"últimas {total} viagens (lendo o histórico...)")
+        else:
+            self.info.config(text=f"{total} viagens")
+
+    def refresh(self):
+        """Lê as viagens novas do CSV e rola até a mais recente."""
+        if self.source is not None:
+            self.source.refresh()
+        self.show(len(self.source) if self.source is not None else 0)
+
+    def search(self):
+        """
+        Busca o texto digitado numa thread separada (num histórico grande,
+        a primeira busca lê o arquivo inteiro), para a janela não congelar.
+        A lista é filtrada na thread do Tk por _poll_search.
+        """
+        if self.source is None:
+            return
+        query = self.entry_search.get().strip()
+        if not query:
+            self._pending_search = None
+            self.source.set_filter("")
+            self.show(len(self.source))
+            return
+        source = self.source
+        pending = {'source': source, 'query': query, 'done': threading.Event()}
+
+        def worker():
+            try:
+                source.matches(query)
+            except OSError as e:
+                pending['error'] = e
+            pending['done'].set()
+
+        self._pending_search = pending
+        self.show(self.top)
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(self.POLL_MS, self._poll_search, pending)
+
+    def _poll_search(self, pending):
+        if pending is not self._pending_search:
+            # outra busca começou, ou a fonte mudou: o resultado é descartado
+            return
+        if not pending['done'].is_set():
+            self.after(self.POLL_MS, self._poll_search, pending)
+            return
+        self._pending_search = None
+        if 'error' in pending:
+            self.show(self.top)
+            self.info.config(text=f"Erro na busca: {pending['error']}")
+            return
+        # o resultado ficou guardado por matches: filtrar não relê o arquivo
+        self.source.set_filter(pending['query'])
+        self.show(len(self.source))
+
+    def clear_search(self):
+        self.entry_search.delete(0, tk.END)
+        self.search()
@@ -0,0 +1,410 @@
+"""
+Importação em massa de viagens para o data/trips.csv.
+
+Lê planilhas e registros de hodômetro exportados (CSV, JSONL ou XLSX) e passa
+as viagens por um pipeline de etapas em threads, ligadas por filas limitadas:
+
+    leitura -> validação -> distâncias -> precificação -> gravação
+
+Enquanto um lote espera a Routes API, o seguinte já está sendo validado e o
+anterior gravado. Os registros inválidos vão para um arquivo de rejeitados
+(JSONL, com a linha de origem e o motivo) e não interrompem a importação. As
+viagens são gravadas pelo TripLog, um lote por fsync.
+
+Uso (na raiz do projeto):
+    python3 -m app.importer viagens.csv
+    python3 -m app.importer hodometro.xlsx --resolve-distances --rejects rejeitados.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+from datetime import date, datetime
+
+from app.cli import batched, make_resolver, parse_trip, read_records
+from app.expense import ExpenseCalculator
+from app.records import expenses_from_batch
+from app.trip_index import TIMESTAMP_FIELD, upgrade_csv_header
+from app.trip_log import TripLog
+from app.trip_store import TRIP_FIELDS
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+CSV_HEADER = TRIP_FIELDS + [TIMESTAMP_FIELD]
+
+# Nomes de coluna comuns em planilhas de quilometragem -> campos lidos por parse_trip
+COLUMN_ALIASES = {
+    "origem": "origin",
+    "destino": "destination",
+    "hodometro_inicial": "start_odometer",
+    "hodômetro_inicial": "start_odometer",
+    "km_inicial": "start_odometer",
+    "hodometro_final": "end_odometer",
+    "hodômetro_final": "end_odometer",
+    "km_final": "end_odometer",
+    "distancia": "distance",
+    "distância": "distance",
+    "km": "distance",
+    "pedagio": "tolls",
+    "pedágio": "tolls",
+    "estacionamento": "parking",
+    "data": "timestamp",
+    "data_hora": "timestamp",
+}
+
+# Marca de fim da fila entre duas etapas
+_DONE = object()
+
+
+def normalize_record(record):
+    """
+    Traduz os nomes de coluna conhecidos (origem, km_inicial, pedágio...) e
+    converte datas da planilha para texto ISO (as digitadas como texto são
+    convertidas por parse_trip, que rejeita formatos desconhecidos).
+    """
+    if not isinstance(record, dict):
+        return record
+    normalized = {}
+    for name, value in record.items():
+        key = str(name or "").strip().lower().replace(" ", "_")
+        key = COLUMN_ALIASES.get(key, key)
+        if isinstance(value, datetime):
+            value = value.isoformat(timespec='seconds')
+        elif isinstance(value, date):
+            value = value.isoformat()
+        if key not in normalized or normalized[key] in (None, ""):
+            normalized[key] = value
+    return normalized
+
+
+def read_csv(stream, delimiter=None):
+    """
+    Gera (número da linha, registro) de um CSV com cabeçalho. Sem delimiter,
+    usa ';' quando o cabeçalho tem mais ';' que ',' (planilhas exportadas com
+    vírgula decimal).
+    """
+    if delimiter is None:
+        first = stream.readline()
+        stream.seek(0)
+        delimiter = ";" if first.count(";") > first.count(",") else ","
+    reader = csv.DictReader(stream, delimiter=delimiter)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_xlsx(path):
+    """
+    Gera (número da linha, registro) a partir da primeira planilha de um XLSX,
+    com os nomes das colunas na primeira linha.
+
+    Raises:
+        RuntimeError: openpyxl não instalado
+    """
+    if openpyxl is None:
+        raise RuntimeError(
+            "A biblioteca 'openpyxl' não está disponível. Instale-a com: pip install openpyxl"
+        )
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(cell or "").strip() for cell in next(rows, ())]
+        for line_no, row in enumerate(rows, start=2):
+            if all(cell is None or cell == "" for cell in row):
+                continue
+            yield line_no, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "csv"
+
+
+class RejectWriter:
+    """Grava os registros rejeitados em JSONL; o arquivo só é criado no primeiro."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def write(self, line_no, error, record):
+        if self._file is None:
+            self._file = open(self.path, "w", encoding="utf-8")
+        entry = {'line': line_no, 'error': str(error), 'record': record}
+        self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class TripImporter:
+    """
+    Pipeline de importação: cada etapa roda numa thread e passa lotes para a
+    seguinte por uma fila de no máximo queue_size lotes, então a memória usada
+    não depende do tamanho do arquivo.
+    """
+
+    def __init__(self, csv_path, calculator=None, resolver=None, batch_size=2000,
+                 queue_size=4, resolve_workers=4, sync=True):
+        """
+        Args:
+            csv_path (str): trips.csv de destino (criado se não existir)
+            calculator (ExpenseCalculator): Calculador de despesas (padrão: taxa padrão)
+            resolver (RouteMatrixResolver): Resolve as distâncias pela Routes API
+                (None = usa a distância informada ou a dos hodômetros)
+            batch_size (int): Registros por lote entre as etapas
+            queue_size (int): Lotes em espera entre duas etapas
+            resolve_workers (int): Lotes consultados na API ao mesmo tempo (a
+                ordem das viagens no trips.csv é a da entrada)
+            sync (bool): fsync a cada lote gravado (ver TripLog)
+        """
+        self.csv_path = csv_path
+        self.calculator = calculator or ExpenseCalculator()
+        self.resolver = resolver
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.resolve_workers = resolve_workers
+        self.sync = sync
+
+    def run(self, records, rejects=None):
+        """
+        Importa os registros (pares (número da linha, registro)).
+
+        Args:
+            records (Iterable[tuple[int, dict]]): Registros de entrada
+            rejects (RejectWriter): Destino dos registros inválidos (None = descarta)
+
+        Returns:
+            dict: {'read', 'imported', 'rejected', 'resolved', 'elapsed',
+                   'busy': {etapa: segundos}}
+
+        Raises:
+            OSError: Falha ao gravar no trips.csv (a importação para)
+        """
+        stats = {'read': 0, 'imported': 0, 'rejected': 0, 'resolved': 0}
+        busy = {}
+        errors = []
+        stop = threading.Event()
+        now = datetime.now().isoformat(timespec='seconds')
+
+        def validate(batch):
+            trips = []
+            for line_no, record in batch:
+                try:
+                    if not isinstance(record, dict):
+                        raise ValueError("registro malformado")
+                    trip = parse_trip(normalize_record(record))
+                except ValueError as e:
+                    stats['rejected'] += 1
+                    if rejects is not None:
+                        rejects.write(line_no, e, record)
+                    continue
+                if not trip.timestamp:
+                    trip = replace(trip, timestamp=now)
+                trips.append(trip)
+            return trips
+
+        def resolve_batch(trips):
+            t0 = time.perf_counter()
+            distances, _ = self.resolver.resolve([(t.origin, t.destination) for t in trips])
+            resolved = 0
+            for i, distance in enumerate(distances):
+                # sem resposta da API fica a distância informada / dos hodômetros
+                if distance is not None and distance > 0:
+                    trips[i] = trips[i].with_distance(distance)
+                    resolved += 1
+            with lock:
+                stats['resolved'] += resolved
+                api_time[0] += time.perf_counter() - t0
+            return trips
+
+        # a espera pela API é o gargalo: vários lotes em consulta ao mesmo
+        # tempo, entregues à precificação na ordem em que foram lidos
+        lock = threading.Lock()
+        api_time = [0.0]
+        pool = ThreadPoolExecutor(self.resolve_workers) if self.resolver is not None else None
+
+        def resolve(trips):
+            if pool is None:
+                return trips
+            return pool.submit(resolve_batch, trips)
+
+        def price(trips):
+            if isinstance(trips, Future):
+                trips = trips.result()
+            expenses = self.calculator.calculate_batch(
+                [t.distance for t in trips],
+                [t.tolls for t in trips],
+                [t.parking for t in trips],
+                dates=[t.timestamp for t in trips],
+            )
+            return [trip.to_row(expense) for trip, expense in zip(trips, expenses_from_batch(expenses))]
+
+        log = TripLog(self.csv_path, CSV_HEADER, sync=self.sync)
+
+        def write(rows):
+            log.append_many(rows)
+            stats['imported'] += len(rows)
+
+        # cada etapa lê da sua fila e entrega na fila da seguinte
+        stages = [("validação", validate), ("distâncias", resolve), ("precificação", price), ("gravação", write)]
+        queues = [queue.Queue(self.queue_size) for _ in stages]
+
+        def put(q, item):
+            # não trava se a etapa seguinte parou por erro
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def get(q):
+            while True:
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return _DONE
+
+        def stage(name, fn, inbox, outbox):
+            spent = 0.0
+            try:
+                while True:
+                    item = get(inbox)
+                    if item is _DONE:
+                        break
+                    t0 = time.perf_counter()
+                    result = fn(item)
+                    spent += time.perf_counter() - t0
+                    if outbox is not None and result:
+                        put(outbox, result)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                busy[name] = spent
+                if outbox is not None:
+                    put(outbox, _DONE)
+
+        threads = [
+            threading.Thread(
+                target=stage,
+                args=(name, fn, queues[i], queues[i + 1] if i + 1 < len(queues) else None),
+                name=f"importer-{name}",
+                daemon=True,
+            )
+            for i, (name, fn) in enumerate(stages)
+        ]
+        start = time.perf_counter()
+        with log.locked():
+            upgrade_csv_header(self.csv_path, CSV_HEADER)
+        for thread in threads:
+            thread.start()
+        # a leitura roda nesta thread, entregando lotes à validação
+        spent = 0.0
+        try:
+            t0 = time.perf_counter()
+            for batch in batched(records, self.batch_size):
+                stats['read'] += len(batch)
+                spent += time.perf_counter() - t0
+                put(queues[0], batch)
+                if stop.is_set():
+                    break
+                t0 = time.perf_counter()
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            busy["leitura"] = spent
+            put(queues[0], _DONE)
+            for thread in threads:
+                thread.join()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+                busy["distâncias"] = api_time[0]
+            log.close()
+
+        stats['elapsed'] = time.perf_counter() - start
+        stats['busy'] = busy
+        if errors:
+            raise errors[0]
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.importer",
+        description="Importa viagens de planilhas e registros de hodômetro para o trips.csv.",
+    )
+    parser.add_argument("input", help="arquivo de viagens (.csv, .jsonl ou .xlsx)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl", "xlsx"],
+                        help="formato da entrada (padrão: pela extensão do arquivo)")
+    parser.add_argument("--delimiter", help="separador do CSV (padrão: ',' ou ';', pelo cabeçalho)")
+    parser.add_argument("--data-dir", default="data", help="diretório do trips.csv (padrão: data)")
+    parser.add_argument("--rejects", help="arquivo dos registros rejeitados (padrão: <entrada>.rejeitados.jsonl)")
+    parser.add_argument("--km-rate", type=float, default=None,
+                        help="taxa de reembolso por km em R$ (padrão: a do ExpenseCalculator)")
+    parser.add_argument("--resolve-distances", action="store_true",
+                        help="consulta a distância na Google Maps Routes API (com cache em --data-dir)")
+    parser.add_argument("--resolver", choices=["matrix", "routes"], default="matrix",
+                        help="com --resolve-distances: computeRouteMatrix (padrão) ou computeRoutes simultâneos")
+    parser.add_argument("--batch-size", type=int, default=2000, help="registros por lote entre as etapas")
+    args = parser.parse_args(argv)
+
+    input_format = args.input_format or detect_format(args.input)
+    rejects = RejectWriter(args.rejects or os.path.splitext(args.input)[0] + ".rejeitados.jsonl")
+    importer = TripImporter(
+        os.path.join(args.data_dir, "trips.csv"),
+        calculator=ExpenseCalculator(km_rate=args.km_rate),
+        resolver=make_resolver(args.data_dir, args.resolver) if args.resolve_distances else None,
+        batch_size=args.batch_size,
+    )
+    try:
+        if input_format == "xlsx":
+            stats = importer.run(read_xlsx(args.input), rejects)
+        else:
+            with open(args.input, newline="", encoding="utf-8-sig") as source:
+                if input_format == "csv":
+                    records = read_csv(source, args.delimiter)
+                else:
+                    records = read_records(source, input_format)
+                stats = importer.run(records, rejects)
+    except RuntimeError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    finally:
+        rejects.close()
+
+    elapsed = stats['elapsed']
+    rate = stats['imported'] / elapsed * 60 if elapsed > 0 else 0.0
+    print(
+        f"{stats['imported']} viagens importadas em {elapsed:.2f} s ({rate:,.0f} viagens/min); "
+        f"{stats['rejected']} registros rejeitados.",
+        file=sys.stderr,
+    )
+    if stats['rejected']:
+        print(f"Rejeitados gravados em {rejects.path}", file=sys.stderr)
+    return 1 if stats['rejected'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Métricas de tempo e contadores do Mileage Tracker.
+
+Cada etapa instrumentada é medida com `with metrics.span("etapa"):`; as
+durações viram resumos com p50/p95/p99 (sobre as últimas medições) e os
+contadores registram eventos como falhas da API e uso do hodômetro.
+
+Com as métricas desligadas, span() devolve sempre o mesmo objeto vazio e
+inc() retorna na hora, então a instrumentação praticamente não custa nada.
+Ligadas, elas podem ser lidas no formato texto do Prometheus por HTTP
+local e/ou gravadas periodicamente num JSON.
+
+Configuração (variáveis de ambiente / .env):
+    METRICS_ENABLED=1
+    METRICS_PORT=9464              # 0 desliga o endpoint HTTP
+    METRICS_JSON=data/metrics.json # vazio desliga o arquivo JSON
+    METRICS_DUMP_SECONDS=60
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Prefixo dos nomes das métricas expostas
+NAMESPACE = "mileage"
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _Summary:
+    __slots__ = ("count", "total", "recent")
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantiles(self):
+        values = sorted(self.recent)
+        if not values:
+            return {q: 0.0 for q in QUANTILES}
+        # nearest-rank: o menor valor com pelo menos q das medições até ele
+        return {q: values[max(0, math.ceil(q * len(values)) - 1)] for q in QUANTILES}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    inner = ",".join(
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in pairs
+    )
+    return "{" + inner + "}"
+
+
+class Metrics:
+    """
+    Registro de durações (resumos com quantis) e contadores.
+    Seguro para uso a partir de várias threads.
+    """
+
+    def __init__(self, enabled=True, window=1024):
+        """
+        Args:
+            enabled (bool): Se False, span/observe/inc não registram nada
+            window (int): Medições recentes usadas no cálculo dos quantis
+        """
+        self.enabled = enabled
+        self.window = window
+        self._summaries = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._dumper = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls, data_dir="data"):
+        """
+        Cria o registro a partir das variáveis METRICS_* e, se ligado,
+        inicia o endpoint HTTP e/ou a gravação periódica do JSON.
+        """
+        enabled = os.getenv("METRICS_ENABLED", "").strip() == "1"
+        metrics = cls(enabled=enabled)
+        if not enabled:
+            return metrics
+        port = int(os.getenv("METRICS_PORT", "9464") or 0)
+        if port:
+            metrics.serve(port)
+        json_path = os.getenv("METRICS_JSON", os.path.join(data_dir, "metrics.json")).strip()
+        if json_path:
+            metrics.start_dump(json_path, float(os.getenv("METRICS_DUMP_SECONDS", "60") or 60))
+        return metrics
+
+    def span(self, name, **labels):
+        """
+        Mede a duração do bloco `with` como uma observação de name.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = _Summary(self.window)
+            summary.add(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """
+        Retorna o estado atual das métricas.
+
+        Returns:
+            dict: {'timings': [{'name', 'labels', 'count', 'sum', 'p50', 'p95', 'p99'}],
+                   'counters': [{'name', 'labels', 'value'}]}
+        """
+        with self._lock:
+            summaries = [(key, s.count, s.total, s.quantiles()) for key, s in self._summaries.items()]
+            counters = list(self._counters.items())
+        timings = []
+        for (name, labels), count, total, quantiles in sorted(summaries):
+            timings.append({
+                'name': name,
+                'labels': dict(labels),
+                'count': count,
+                'sum': total,
+                'p50': quantiles[0.5],
+                'p95': quantiles[0.95],
+                'p99': quantiles[0.99],
+            })
+        return {
+            'timings': timings,
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(counters)
+            ],
+        }
+
+    def render_prometheus(self):
+        """
+        Métricas no formato texto do Prometheus (durações em segundos como
+        summary, contadores com sufixo _total).
+        """
+        snapshot = self.snapshot()
+        lines = []
+        seen = set()
+        for t in snapshot['timings']:
+            metric = f"{NAMESPACE}_{t['name']}_seconds"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            labels = sorted(t['labels'].items())
+            for q in QUANTILES:
+                lines.append(
+                    f"{metric}{_format_labels(labels + [('quantile', str(q))])} {t[f'p{int(q * 100)}']:.6g}"
+                )
+            lines.append(f"{metric}_sum{_format_labels(labels)} {t['sum']:.6g}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {t['count']}")
+        for c in snapshot['counters']:
+            metric = f"{NAMESPACE}_{c['name']}_total"
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(sorted(c['labels'].items()))} {c['value']}")
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path):
+        """Grava o snapshot atual em path (troca atômica do arquivo)."""
+        partial = path + ".tmp"
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump({'time': time.time(), **self.snapshot()}, f, ensure_ascii=False, indent=2)
+        os.replace(partial, path)
+
+    def start_dump(self, path, interval=60.0):
+        """Grava o JSON a cada interval segundos numa thread em segundo plano."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.dump_json(path)
+                except OSError:
+                    pass
+
+        self._dumper = threading.Thread(target=loop, daemon=True)
+        self._dumper.start()
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """
+        Expõe GET /metrics (texto do Prometheus) numa thread em segundo plano.
+
+        Returns:
+            int: Porta em uso (útil com port=0)
+        """
+        # importado aqui para não pesar na abertura da janela com as métricas desligadas
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,125 @@
+"""
+Registros compactos de viagem e de despesas.
+
+Trip e Expense são dataclasses imutáveis com __slots__: sem o __dict__ de
+cada instância, ocupam bem menos memória que os dicts usados antes, e podem
+ser usadas como chave (o resumo formatado de uma despesa é memorizado).
+"""
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+
+@dataclass(frozen=True, slots=True)
+class Expense:
+    """Despesas de uma viagem, já arredondadas para centavos."""
+
+    distance_km: float
+    km_expense: float
+    tolls: float
+    parking: float
+    total: float
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: Mesmo formato devolvido por ExpenseCalculator.calculate_total_expense
+        """
+        return {
+            'distance_km': self.distance_km,
+            'km_expense': self.km_expense,
+            'tolls': self.tolls,
+            'parking': self.parking,
+            'total': self.total,
+        }
+
+    def __getitem__(self, key):
+        # acesso no estilo do dict antigo: expense['total']
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def summary(self):
+        """Resumo formatado (ver format_summary)."""
+        return format_summary(self)
+
+
+def expenses_from_batch(batch):
+    """
+    Registros Expense a partir do resultado colunar de
+    ExpenseCalculator.calculate_batch (na ordem das viagens).
+
+    Returns:
+        list[Expense]: Uma despesa por viagem
+    """
+    return [
+        Expense(*values)
+        for values in zip(
+            batch['distance_km'], batch['km_expense'], batch['tolls'], batch['parking'], batch['total']
+        )
+    ]
+
+
+@lru_cache(maxsize=1024)
+def format_summary(expense):
+    """
+    Resumo das despesas para a janela, a partir de um resultado já calculado
+    (viagens com os mesmos valores reaproveitam o texto).
+
+    Args:
+        expense (Expense): Despesas calculadas
+
+    Returns:
+        str: String formatada com resumo das despesas
+    """
+    return (
+        f"=== RESUMO DE DESPESAS ===\n"
+        f"Distância: {expense.distance_km:.2f} km\n"
+        f"Despesa km: R$ {expense.km_expense:.2f}\n"
+        f"Pedágios: R$ {expense.tolls:.2f}\n"
+        f"Estacionamento: R$ {expense.parking:.2f}\n"
+        f"─────────────────────────\n"
+        f"TOTAL: R$ {expense.total:.2f}"
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class Trip:
+    """Uma viagem validada, antes de ser precificada."""
+
+    origin: str
+    destination: str
+    start_odometer: float
+    end_odometer: float
+    distance: float
+    tolls: float = 0.0
+    parking: float = 0.0
+    # data/hora do registro (texto ISO), gravada na coluna timestamp
+    timestamp: str = ""
+
+    def with_distance(self, distance):
+        """Cópia da viagem com outra distância (ex.: a da Routes API)."""
+        return replace(self, distance=distance)
+
+    def to_row(self, expense):
+        """
+        Linha do trips.csv desta viagem.
+
+        Args:
+            expense (Expense): Despesas calculadas para a viagem
+
+        Returns:
+            list[str]: Campos na ordem de TRIP_FIELDS + timestamp
+        """
+        return [
+            self.origin,
+            self.destination,
+            f"{self.start_odometer:.1f}",
+            f"{self.end_odometer:.1f}",
+            f"{self.distance:.1f}",
+            f"{self.tolls:.2f}",
+            f"{self.parking:.2f}",
+            f"{expense.km_expense:.2f}",
+            f"{expense.total:.2f}",
+            self.timestamp,
+        ]
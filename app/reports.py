@@ -0,0 +1,168 @@
+"""
+Relatórios de reembolso agregados a partir do data/trips.csv.
+
+O arquivo é lido uma única vez como um pipeline de geradores (linhas ->
+chave de agrupamento -> somas), então a memória usada depende só da
+quantidade de grupos, não do tamanho do histórico. As somas são exatas
+(inteiros escalados convertidos para Decimal no final).
+
+Uso (na raiz do projeto):
+    python3 -m app.reports data/trips.csv --by route
+    python3 -m app.reports data/trips.csv --by month --format csv
+"""
+import argparse
+import csv
+import sys
+from decimal import Decimal
+
+# Colunas somadas nos relatórios
+SUM_FIELDS = ("distance", "tolls", "parking", "km_expense", "total_expense")
+
+# Escala comum das somas: 10**-SCALE (valores com mais casas usam Decimal)
+SCALE = 4
+
+MISSING_KEY = "(não informado)"
+
+
+def route_key(row):
+    return f"{row['origin']} → {row['destination']}"
+
+
+def origin_key(row):
+    return row["origin"]
+
+
+def destination_key(row):
+    return row["destination"]
+
+
+def month_key(row):
+    # a data da viagem (AAAA-MM-DD...) é opcional no CSV
+    timestamp = (row.get("timestamp") or "").strip()
+    return timestamp[:7] if len(timestamp) >= 7 else MISSING_KEY
+
+
+def driver_key(row):
+    return (row.get("driver") or "").strip() or MISSING_KEY
+
+
+GROUP_KEYS = {
+    "route": route_key,
+    "origin": origin_key,
+    "destination": destination_key,
+    "month": month_key,
+    "driver": driver_key,
+}
+
+
+def to_units(text):
+    """
+    Converte o texto de um valor monetário/distância em inteiro na escala
+    comum (10**-SCALE), sem passar por float. Aceita vírgula decimal.
+    Valores com mais casas que SCALE viram Decimal (a soma continua exata).
+    """
+    text = text.strip().replace(',', '.')
+    if not text:
+        return 0
+    whole, _, frac = text.partition('.')
+    if len(frac) > SCALE or 'e' in text.lower():
+        return Decimal(text).scaleb(SCALE)
+    if whole in ("", "-", "+"):
+        whole += "0"
+    units = int(whole) * 10 ** SCALE
+    if frac:
+        value = int(frac) * 10 ** (SCALE - len(frac))
+        units += -value if whole.startswith('-') else value
+    return units
+
+
+def to_decimal(units):
+    """
+    Converte a soma escalada em Decimal exato, com 2 casas quando possível.
+    """
+    value = Decimal(units).scaleb(-SCALE)
+    cents = value.quantize(Decimal('0.01'))
+    return cents if cents == value else value.normalize()
+
+
+def iter_trips(path):
+    """
+    Gera as viagens do CSV como dicionários, sem carregar o arquivo inteiro.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+def aggregate(rows, key=route_key, fields=SUM_FIELDS):
+    """
+    Soma os campos de cada grupo em uma única passada.
+
+    Args:
+        rows (Iterable[dict]): Viagens (ex.: iter_trips(...))
+        key (callable): Função que devolve o grupo de uma viagem
+        fields (Sequence[str]): Colunas a somar
+
+    Returns:
+        dict: grupo -> {'trips': int, campo: Decimal, ...}
+    """
+    groups = {}
+    n = len(fields)
+    for row in rows:
+        group = key(row)
+        acc = groups.get(group)
+        if acc is None:
+            acc = groups[group] = [0] * (n + 1)
+        acc[n] += 1
+        for i, field in enumerate(fields):
+            acc[i] += to_units(row.get(field) or "")
+
+    result = {}
+    for group, acc in groups.items():
+        totals = {'trips': acc[n]}
+        for i, field in enumerate(fields):
+            totals[field] = to_decimal(acc[i])
+        result[group] = totals
+    return result
+
+
+def report(path, by="route"):
+    """
+    Relatório agrupado do trips.csv, ordenado pelo grupo.
+
+    Returns:
+        list[dict]: uma linha por grupo, com 'group', 'trips' e as somas
+    """
+    totals = aggregate(iter_trips(path), GROUP_KEYS[by])
+    return [{'group': group, **totals[group]} for group in sorted(totals)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.reports",
+        description="Totais de reembolso agrupados a partir do trips.csv.",
+    )
+    parser.add_argument("csv_path", nargs="?", default="data/trips.csv", help="caminho do trips.csv")
+    parser.add_argument("--by", choices=sorted(GROUP_KEYS), default="route", help="agrupamento")
+    parser.add_argument("--format", choices=["table", "csv"], default="table", help="formato da saída")
+    args = parser.parse_args(argv)
+
+    rows = report(args.csv_path, args.by)
+    columns = ["group", "trips", *SUM_FIELDS]
+    if args.format == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(columns)
+        writer.writerows([row[c] for c in columns] for row in rows)
+        return 0
+
+    width = max([len(str(row['group'])) for row in rows] + [len(args.by)])
+    print(f"{args.by:<{width}} {'viagens':>8} " + " ".join(f"{c:>14}" for c in SUM_FIELDS))
+    for row in rows:
+        print(
+            f"{row['group']:<{width}} {row['trips']:>8} "
+            + " ".join(f"{row[c]:>14}" for c in SUM_FIELDS)
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,696 @@
+"""
+Repositório de viagens: onde o MileageTracker grava as viagens e de onde lê
+o histórico e os totais.
+
+- CsvTripRepository: o data/trips.csv de sempre (TripLog, HistorySource,
+  índice por data e totais acumulados nos arquivos ao lado do CSV).
+- SqliteTripRepository: data/trips.sqlite3 em modo WAL, com índices por data,
+  origem e destino; "últimas 20 viagens para X" é uma busca no índice, sem
+  percorrer o histórico. Os totais por mês são mantidos numa tabela própria,
+  atualizada na mesma transação de cada gravação.
+
+O aplicativo usa o CSV, a menos que TRIPS_BACKEND=sqlite. Para levar um
+histórico existente para o banco (uma única vez):
+
+    python3 -m app.repository migrate data/trips.csv
+    python3 -m app.repository recent data/trips.sqlite3 --to "Av. Paulista, 1000"
+"""
+import abc
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from datetime import date
+
+from app.address_normalizer import AddressNormalizer, canonicalize_address
+from app.history_source import HistorySource
+from app.reports import MISSING_KEY, SCALE, SUM_FIELDS, aggregate, iter_trips, to_decimal
+from app.running_totals import RunningTotals
+from app.trip_index import TIMESTAMP_FIELD, TripDateIndex, timestamp_key, upgrade_csv_header
+from app.trip_log import TripLog
+from app.trip_store import TRIP_FIELDS
+
+CSV_HEADER = TRIP_FIELDS + [TIMESTAMP_FIELD]
+
+BACKENDS = ("csv", "sqlite")
+
+
+def _totals(counts):
+    """{'trips': int, campo: Decimal, ...}, no formato de reports.aggregate."""
+    totals = {'trips': counts[0] if counts else 0}
+    for i, field in enumerate(SUM_FIELDS, start=1):
+        totals[field] = to_decimal(counts[i] if counts else 0)
+    return totals
+
+
+class TripRepository(abc.ABC):
+    """
+    Operações que o aplicativo faz sobre o histórico de viagens. As viagens
+    entram e saem como listas de texto na ordem de CSV_HEADER.
+
+    Origem e destino são comparados na forma do AddressNormalizer (o mesmo
+    do cache de rotas), ou na forma canônica sem apelidos quando não há um.
+    """
+
+    # CSV ao qual o repositório pertence (o SQLite fica ao lado dele)
+    csv_path = None
+
+    def __init__(self, normalizer=None):
+        """
+        Args:
+            normalizer (AddressNormalizer): Forma dos endereços nas buscas (opcional)
+        """
+        self.normalizer = normalizer
+        self.normalize = normalizer.resolve if normalizer else canonicalize_address
+
+    def append(self, row):
+        """Grava uma viagem (só retorna depois de gravada)."""
+        self.append_many([row])
+
+    @abc.abstractmethod
+    def append_many(self, rows):
+        """Grava as viagens (só retorna depois de gravadas)."""
+
+    @abc.abstractmethod
+    def history(self):
+        """
+        Fonte paginada da lista de histórico (interface do HistorySource:
+        refresh, len, total, query, rows, set_filter, matches, rows_at).
+        Sempre o mesmo objeto.
+        """
+
+    @abc.abstractmethod
+    def recent(self, limit=20, origin=None, destination=None):
+        """
+        Viagens mais recentes primeiro, opcionalmente só as com essa origem
+        e/ou esse destino (sem diferenciar maiúsculas e espaços repetidos).
+
+        Returns:
+            list[list[str]]
+        """
+
+    @abc.abstractmethod
+    def between(self, start=None, end=None):
+        """Gera as viagens com start <= timestamp < end, em ordem de gravação."""
+
+    @abc.abstractmethod
+    def trips(self):
+        """Gera todas as viagens, em ordem de gravação (sem carregar todas)."""
+
+    @abc.abstractmethod
+    def totals(self, month=None):
+        """
+        Totais desde o início e de um mês ("AAAA-MM"; padrão: o atual).
+
+        Returns:
+            tuple[dict, dict]: (geral, mês), como RunningTotals.lifetime/month
+        """
+
+    def close(self):
+        pass
+
+
+class CsvTripRepository(TripRepository):
+    """Viagens no data/trips.csv, com os índices e totais mantidos ao lado."""
+
+    # Bytes lidos de cada vez ao percorrer o CSV do fim para o começo
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, csv_path, header=CSV_HEADER, sync=True, normalizer=None):
+        """
+        Args:
+            csv_path (str): Caminho do trips.csv
+            header (list[str]): Cabeçalho do arquivo
+            sync (bool): fsync a cada lote gravado (ver TripLog)
+            normalizer (AddressNormalizer): Forma dos endereços nas buscas (opcional)
+        """
+        super().__init__(normalizer)
+        self.csv_path = csv_path
+        self.log = TripLog(csv_path, header, sync=sync)
+        # históricos antigos ganham a coluna timestamp (vazia nas viagens antigas)
+        with self.log.locked():
+            upgrade_csv_header(csv_path, header)
+        self.date_index = TripDateIndex(csv_path)
+        self.running_totals = RunningTotals(csv_path)
+        self._history = None
+
+    def append_many(self, rows):
+        self.log.append_many(rows)
+        self.date_index.update()
+
+    def history(self):
+        if self._history is None:
+            self._history = HistorySource(self.csv_path)
+        return self._history
+
+    def _reversed_rows(self):
+        """Viagens do fim para o começo do arquivo, lendo em blocos."""
+        if not os.path.exists(self.csv_path):
+            return
+        with open(self.csv_path, 'rb') as f:
+            header = f.readline()
+            start = len(header) if header.endswith(b'\n') else 0
+            pos = os.fstat(f.fileno()).st_size
+            carry = b''
+            while pos > start:
+                size = min(self.BLOCK_SIZE, pos - start)
+                pos -= size
+                f.seek(pos)
+                lines = (f.read(size) + carry).split(b'\n')
+                # a primeira linha do bloco pode estar incompleta
+                carry = lines.pop(0) if pos > start else b''
+                for line in reversed(lines):
+                    if line.strip():
+                        yield next(csv.reader([line.decode('utf-8')]))
+            if carry.strip():
+                yield next(csv.reader([carry.decode('utf-8')]))
+
+    def recent(self, limit=20, origin=None, destination=None):
+        normalize = self.normalize
+        want_origin = normalize(origin) if origin else None
+        want_dest = normalize(destination) if destination else None
+        found = []
+        for row in self._reversed_rows():
+            if len(row) < 2:
+                continue
+            if want_origin is not None and normalize(row[0]) != want_origin:
+                continue
+            if want_dest is not None and normalize(row[1]) != want_dest:
+                continue
+            found.append(row)
+            if len(found) >= limit:
+                break
+        return found
+
+    def between(self, start=None, end=None):
+        return self.date_index.trips_between(start, end)
+
+    def trips(self):
+        if not os.path.exists(self.csv_path):
+            return
+        for row in iter_trips(self.csv_path):
+            yield [row.get(name) or "" for name in CSV_HEADER]
+
+    def totals(self, month=None):
+        return self.running_totals.lifetime(), self.running_totals.month(month)
+
+    def close(self):
+        self.log.close()
+
+
+class SqliteHistorySource:
+    """
+    Fonte da lista de histórico sobre o SqliteTripRepository. As viagens têm
+    ids contíguos (o repositório não apaga), então a viagem n é o id n + 1.
+    A busca por endereço procura na tabela de endereços distintos e junta os
+    ids pelos índices de origem e destino.
+    """
+
+    # Endereços por consulta com IN (limite de parâmetros do SQLite)
+    KEYS_PER_QUERY = 500
+
+    def __init__(self, repository):
+        self.repository = repository
+        # o aplicativo e as threads do serviço HTTP usam a mesma fonte
+        self._lock = threading.RLock()
+        self._rows = 0
+        self._query = None
+        self._needle = None
+        self._matches = None
+        # (texto normalizado, viagens verificadas, resultado) da última matches()
+        self._last_search = None
+
+    def __len__(self):
+        return self._rows if self._matches is None else len(self._matches)
+
+    @property
+    def total(self):
+        return self._rows
+
+    @property
+    def query(self):
+        return self._query
+
+    @property
+    def indexed(self):
+        # os índices ficam no banco: não há o que montar ao abrir
+        return True
+
+    def build_index(self):
+        return self._rows
+
+    def refresh(self):
+        """
+        Returns:
+            int: Viagens novas desde a última chamada
+        """
+        with self._lock:
+            old_rows = self._rows
+            self._rows = self.repository.last_id()
+            if self._rows < old_rows:
+                # banco trocado: refaz a busca ativa
+                self.set_filter(self._query)
+                return 0
+            if self._matches is not None and self._rows > old_rows:
+                for trip_id, origin_key, dest_key in self.repository.execute(
+                    "SELECT id, origin_key, destination_key FROM trips WHERE id > ? ORDER BY id",
+                    (old_rows,),
+                ):
+                    if self._needle in origin_key or self._needle in dest_key:
+                        self._matches.append(trip_id - 1)
+            return self._rows - old_rows
+
+    def rows(self, start, count):
+        with self._lock:
+            end = min(start + count, len(self))
+            start = max(0, start)
+            if end <= start:
+                return []
+            if self._matches is None:
+                return self.repository.rows_by_id(
+                    "id BETWEEN ? AND ? ORDER BY id", (start + 1, end)
+                )
+            numbers = self._matches[start:end]
+        return self.rows_at(numbers)
+
+    def rows_at(self, numbers):
+        """Viagens de números (posições no histórico) dados, ex.: de matches()."""
+        rows = []
+        for i in range(0, len(numbers), self.KEYS_PER_QUERY):
+            ids = [n + 1 for n in numbers[i:i + self.KEYS_PER_QUERY]]
+            marks = ",".join("?" * len(ids))
+            rows.extend(self.repository.rows_by_id(f"id IN ({marks}) ORDER BY id", ids))
+        return rows
+
+    def _find(self, needle, rows):
+        """Números das viagens até rows com needle na origem ou no destino."""
+        keys = [k for (k,) in self.repository.execute(
+            "SELECT key FROM addresses WHERE instr(key, ?) > 0", (needle,)
+        )]
+        ids = set()
+        for i in range(0, len(keys), self.KEYS_PER_QUERY):
+            chunk = keys[i:i + self.KEYS_PER_QUERY]
+            marks = ",".join("?" * len(chunk))
+            for column in ("origin_key", "destination_key"):
+                ids.update(trip_id for (trip_id,) in self.repository.execute(
+                    f"SELECT id FROM trips WHERE {column} IN ({marks}) AND id <= ?",
+                    (*chunk, rows),
+                ))
+        return array('q', sorted(trip_id - 1 for trip_id in ids))
+
+    def matches(self, query):
+        """
+        Números das viagens cuja origem ou destino contém query, sem mudar
+        a visão.
+
+        Returns:
+            array: Números das viagens, em ordem
+        """
+        query = (query or "").strip()
+        rows = self._rows
+        if not query:
+            return array('q', range(rows))
+        needle = self.repository.normalize(query)
+        last = self._last_search
+        if last is not None and last[:2] == (needle, rows):
+            return last[2]
+        found = self._find(needle, rows)
+        # a lista busca numa thread e depois aplica o filtro com set_filter
+        self._last_search = (needle, rows, found)
+        return found
+
+    def set_filter(self, query):
+        """
+        Restringe a visão às viagens cuja origem ou destino contém query.
+
+        Returns:
+            int: Viagens na visão
+        """
+        query = (query or "").strip()
+        with self._lock:
+            if not query:
+                self._query = self._needle = self._matches = None
+                return len(self)
+            needle = self.repository.normalize(query)
+            self._matches = array('q', self.matches(query))
+            self._query = query
+            self._needle = needle
+            return len(self._matches)
+
+
+class SqliteTripRepository(TripRepository):
+    """
+    Viagens num banco SQLite (modo WAL, vários processos podem ler e gravar).
+    Os valores ficam como texto, exatamente como no trips.csv; as somas por
+    mês ficam em inteiros na escala de app.reports (valores com mais de
+    SCALE casas decimais são arredondados nas somas).
+
+    origin_key/destination_key guardam os endereços na forma do normalizer
+    no momento da gravação (apelidos criados depois não mudam viagens já
+    gravadas).
+    """
+
+    # Versão da forma de origin_key/destination_key (PRAGMA user_version);
+    # bancos de uma versão anterior têm as chaves recalculadas ao abrir
+    KEYS_VERSION = 1
+
+    def __init__(self, path, csv_path=None, normalizer=None):
+        """
+        Args:
+            path (str): Arquivo do banco (ex.: data/trips.sqlite3)
+            csv_path (str): trips.csv correspondente (padrão: mesmo nome, .csv)
+            normalizer (AddressNormalizer): Forma dos endereços nas chaves (opcional)
+        """
+        super().__init__(normalizer)
+        self.path = path
+        self.csv_path = csv_path or os.path.splitext(path)[0] + ".csv"
+        self._lock = threading.Lock()
+        self._history = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # timeout: espera a trava de outro processo em vez de falhar na hora
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{name} TEXT NOT NULL" for name in CSV_HEADER)
+        self._conn.executescript(
+            f"CREATE TABLE IF NOT EXISTS trips ("
+            f" id INTEGER PRIMARY KEY, {columns},"
+            f" origin_key TEXT NOT NULL, destination_key TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS trips_timestamp ON trips (timestamp);"
+            "CREATE INDEX IF NOT EXISTS trips_origin ON trips (origin_key);"
+            "CREATE INDEX IF NOT EXISTS trips_destination ON trips (destination_key);"
+            "CREATE TABLE IF NOT EXISTS addresses (key TEXT PRIMARY KEY) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS month_totals ("
+            " month TEXT PRIMARY KEY, trips INTEGER NOT NULL,"
+            + ", ".join(f" {field} INTEGER NOT NULL" for field in SUM_FIELDS)
+            + ");"
+        )
+        self._conn.commit()
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < self.KEYS_VERSION:
+            self._rekey()
+
+        fields = ", ".join(CSV_HEADER)
+        marks = ", ".join("?" * (len(CSV_HEADER) + 2))
+        self._insert = f"INSERT INTO trips ({fields}, origin_key, destination_key) VALUES ({marks})"
+        units = ", ".join(
+            f"SUM(CAST(round(CAST({field} AS REAL) * {10 ** SCALE}) AS INTEGER))"
+            for field in SUM_FIELDS
+        )
+        updates = ", ".join(f"{field} = {field} + excluded.{field}" for field in SUM_FIELDS)
+        self._add_totals = (
+            f"INSERT INTO month_totals (month, trips, {', '.join(SUM_FIELDS)})"
+            f" SELECT CASE WHEN length(timestamp) >= 7 THEN substr(timestamp, 1, 7) ELSE ? END,"
+            f" COUNT(*), {units} FROM trips WHERE id > ? GROUP BY 1"
+            f" ON CONFLICT (month) DO UPDATE SET trips = trips + excluded.trips, {updates}"
+        )
+
+    def _rekey(self, page=10_000):
+        """Recalcula as chaves de endereço (bancos gravados com outra forma)."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last = 0
+            while True:
+                rows = conn.execute(
+                    "SELECT id, origin, destination FROM trips WHERE id > ? ORDER BY id LIMIT ?",
+                    (last, page),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE trips SET origin_key = ?, destination_key = ? WHERE id = ?",
+                    [(self.normalize(origin), self.normalize(dest), trip_id) for trip_id, origin, dest in rows],
+                )
+                if len(rows) < page:
+                    break
+                last = rows[-1][0]
+            conn.execute("DELETE FROM addresses")
+            conn.execute(
+                "INSERT OR IGNORE INTO addresses (key)"
+                " SELECT origin_key FROM trips UNION SELECT destination_key FROM trips"
+            )
+            conn.execute(f"PRAGMA user_version = {self.KEYS_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def rows_by_id(self, where, params):
+        """Viagens (listas de texto) que satisfazem where."""
+        fields = ", ".join(CSV_HEADER)
+        return [list(row) for row in self.execute(f"SELECT {fields} FROM trips WHERE {where}", params)]
+
+    def last_id(self):
+        return self.execute("SELECT COALESCE(MAX(id), 0) FROM trips")[0][0]
+
+    def __len__(self):
+        return self.last_id()
+
+    def append_many(self, rows):
+        """
+        Grava as viagens numa única transação, junto com os endereços novos e
+        as somas por mês.
+        """
+        width = len(CSV_HEADER)
+        params = []
+        for row in rows:
+            row = list(row[:width]) + [""] * (width - len(row))
+            params.append((*row, self.normalize(row[0]), self.normalize(row[1])))
+        if not params:
+            return
+        with self._lock:
+            conn = self._conn
+            # BEGIN IMMEDIATE: o id de partida não muda até o COMMIT
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                first = conn.execute("SELECT COALESCE(MAX(id), 0) FROM trips").fetchone()[0]
+                conn.executemany(self._insert, params)
+                conn.execute(
+                    "INSERT OR IGNORE INTO addresses (key)"
+                    " SELECT origin_key FROM trips WHERE id > ?"
+                    " UNION SELECT destination_key FROM trips WHERE id > ?",
+                    (first, first),
+                )
+                conn.execute(self._add_totals, (MISSING_KEY, first))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def history(self):
+        if self._history is None:
+            self._history = SqliteHistorySource(self)
+        return self._history
+
+    def recent(self, limit=20, origin=None, destination=None):
+        where = []
+        params = []
+        if origin:
+            where.append("origin_key = ?")
+            params.append(self.normalize(origin))
+        if destination:
+            where.append("destination_key = ?")
+            params.append(self.normalize(destination))
+        clause = " AND ".join(where) or "1"
+        return self.rows_by_id(f"{clause} ORDER BY id DESC LIMIT ?", (*params, limit))
+
+    def between(self, start=None, end=None, page=1000):
+        lo = timestamp_key(start)
+        hi = timestamp_key(end)
+        where = ["timestamp != ''"]
+        params = []
+        if lo is not None:
+            where.append("timestamp >= ?")
+            params.append(lo)
+        if hi is not None:
+            where.append("timestamp < ?")
+            params.append(hi)
+        return self._paged(" AND ".join(where), params, page)
+
+    def trips(self, page=1000):
+        return self._paged("1", (), page)
+
+    def _paged(self, clause, params, page):
+        last = 0
+        # em páginas, para não segurar a conexão enquanto quem chamou consome
+        while True:
+            rows = self.execute(
+                f"SELECT id, {', '.join(CSV_HEADER)} FROM trips"
+                f" WHERE {clause} AND id > ? ORDER BY id LIMIT ?",
+                (*params, last, page),
+            )
+            for row in rows:
+                yield list(row[1:])
+            if len(rows) < page:
+                return
+            last = rows[-1][0]
+
+    def totals(self, month=None):
+        month = month or date.today().isoformat()[:7]
+        lifetime = [0] * (len(SUM_FIELDS) + 1)
+        current = None
+        for key, *counts in self.execute(
+            f"SELECT month, trips, {', '.join(SUM_FIELDS)} FROM month_totals"
+        ):
+            for i, value in enumerate(counts):
+                lifetime[i] += value
+            if key == month:
+                current = counts
+        return _totals(lifetime), _totals(current)
+
+    def stats(self):
+        """
+        Returns:
+            dict: {'trips': int, 'addresses': int, 'months': int}
+        """
+        return {
+            'trips': self.last_id(),
+            'addresses': self.execute("SELECT COUNT(*) FROM addresses")[0][0],
+            'months': self.execute("SELECT COUNT(*) FROM month_totals")[0][0],
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def sqlite_path(csv_path):
+    """Banco do SQLite que acompanha um trips.csv (data/trips.sqlite3)."""
+    return os.path.splitext(csv_path)[0] + ".sqlite3"
+
+
+def open_repository(backend, csv_path, header=CSV_HEADER, normalizer=None, sync=True):
+    """
+    Args:
+        backend (str): "csv" ou "sqlite"
+        csv_path (str): Caminho do trips.csv (o banco fica ao lado dele)
+        normalizer (AddressNormalizer): Forma dos endereços nas buscas (opcional)
+        sync (bool): fsync a cada lote gravado no CSV (ver TripLog)
+
+    Raises:
+        ValueError: Backend desconhecido
+    """
+    if backend == "csv":
+        return CsvTripRepository(csv_path, header, sync=sync, normalizer=normalizer)
+    if backend == "sqlite":
+        return SqliteTripRepository(sqlite_path(csv_path), csv_path=csv_path, normalizer=normalizer)
+    raise ValueError(f"TRIPS_BACKEND desconhecido: {backend!r} (use {' ou '.join(BACKENDS)})")
+
+
+def data_normalizer(path):
+    """
+    AddressNormalizer do diretório de dados de path (o data/addresses.sqlite3
+    do aplicativo), ou None se ainda não existir.
+    """
+    addresses = os.path.join(os.path.dirname(os.path.abspath(path)), "addresses.sqlite3")
+    return AddressNormalizer(addresses) if os.path.exists(addresses) else None
+
+
+def migrate_csv(csv_path, repository, batch_size=50_000):
+    """
+    Copia as viagens de um trips.csv para um repositório vazio, em lotes.
+
+    Returns:
+        int: Viagens copiadas
+
+    Raises:
+        ValueError: O repositório já tem viagens
+    """
+    if len(repository):
+        raise ValueError("o banco já tem viagens; a migração é feita uma única vez")
+    copied = 0
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        if set(TRIP_FIELDS) <= set(header):
+            columns = [header.index(name) if name in header else None for name in CSV_HEADER]
+        else:
+            # sem cabeçalho: colunas na ordem do trips.csv
+            columns = list(range(len(CSV_HEADER)))
+            f.seek(0)
+            reader = csv.reader(f)
+        batch = []
+        for row in reader:
+            if not row:
+                continue
+            batch.append([row[i] if i is not None and i < len(row) else "" for i in columns])
+            if len(batch) >= batch_size:
+                repository.append_many(batch)
+                copied += len(batch)
+                batch = []
+        if batch:
+            repository.append_many(batch)
+            copied += len(batch)
+    return copied
+
+
+def _close(repository):
+    repository.close()
+    if repository.normalizer is not None:
+        repository.normalizer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.repository",
+        description="Migra o trips.csv para SQLite e consulta as viagens mais recentes.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="copia o trips.csv para o banco (uma única vez)")
+    migrate.add_argument("csv_path", nargs="?", default="data/trips.csv")
+    migrate.add_argument("--db", help="arquivo do banco (padrão: data/trips.sqlite3)")
+    migrate.add_argument("--verify", action="store_true", help="confere os totais com uma soma completa do CSV")
+    recent = commands.add_parser("recent", help="viagens mais recentes (por origem/destino)")
+    recent.add_argument("db", nargs="?", default="data/trips.sqlite3")
+    recent.add_argument("--from", dest="origin", help="origem")
+    recent.add_argument("--to", dest="destination", help="destino")
+    recent.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "recent":
+        if not os.path.exists(args.db):
+            print(f"Erro: {args.db} não existe (rode o migrate antes)", file=sys.stderr)
+            return 1
+        repository = SqliteTripRepository(args.db, normalizer=data_normalizer(args.db))
+        t0 = time.perf_counter()
+        rows = repository.recent(args.limit, args.origin, args.destination)
+        elapsed = time.perf_counter() - t0
+        for row in rows:
+            print(" | ".join(row))
+        print(f"{len(rows)} viagens em {elapsed * 1000:.2f} ms", file=sys.stderr)
+        _close(repository)
+        return 0
+
+    repository = SqliteTripRepository(
+        args.db or sqlite_path(args.csv_path), csv_path=args.csv_path, normalizer=data_normalizer(args.csv_path)
+    )
+    try:
+        t0 = time.perf_counter()
+        copied = migrate_csv(args.csv_path, repository)
+        print(f"{copied} viagens copiadas para {repository.path} em {time.perf_counter() - t0:.1f} s")
+        if args.verify:
+            lifetime, _ = repository.totals()
+            full = aggregate(iter_trips(args.csv_path), key=lambda row: "*").get("*", _totals(None))
+            if lifetime != full:
+                print(f"Diferença nos totais: {lifetime} != {full}", file=sys.stderr)
+                return 1
+            print("Totais conferem com a soma completa do CSV.")
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        _close(repository)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
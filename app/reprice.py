@@ -0,0 +1,221 @@
+"""
+Recalcula km_expense / total_expense de todo o histórico com uma nova taxa
+por km, usando vários processos.
+
+O trips.csv é dividido em faixas de bytes alinhadas ao início das linhas;
+cada processo precifica a sua faixa e grava uma parte, e as partes são
+juntadas na ordem original. Com --verify, os totais gerais são conferidos
+contra uma execução em um único processo (igualdade exata em centavos).
+
+Uso (na raiz do projeto):
+    python3 -m app.reprice data/trips.csv --km-rate 0.60 -o data/trips_repriced.csv
+    python3 -m app.reprice data/trips.csv --km-rate 0.60 --workers 32 --verify
+"""
+import argparse
+import csv
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.expense import ExpenseCalculator
+
+# Linhas precificadas por chamada a calculate_batch dentro de uma faixa
+BATCH_ROWS = 50_000
+# Bytes lidos do CSV de cada vez (a faixa nunca é carregada inteira)
+READ_BYTES = 1 << 20
+
+
+def read_header(path):
+    """
+    Devolve (cabeçalho, offset do fim da linha de cabeçalho).
+    """
+    with open(path, 'rb') as f:
+        line = f.readline()
+        return next(csv.reader([line.decode('utf-8')])), f.tell()
+
+
+def chunk_offsets(path, n_chunks):
+    """
+    Divide o corpo do CSV (depois do cabeçalho) em até n_chunks faixas de
+    bytes [início, fim), cada uma começando no início de uma linha.
+
+    Os endereços vêm de campos de uma linha só, então nenhuma linha do
+    trips.csv contém quebras de linha dentro de aspas.
+    """
+    _, body_start = read_header(path)
+    size = os.path.getsize(path)
+    bounds = [body_start]
+    with open(path, 'rb') as f:
+        for i in range(1, n_chunks):
+            target = body_start + (size - body_start) * i // n_chunks
+            if target <= bounds[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()  # avança até o início da próxima linha
+            pos = f.tell()
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def read_lines(f, start, end, block_size=READ_BYTES):
+    """
+    Gera as linhas (texto) da faixa [start, end) de f, lendo blocos de
+    block_size bytes; cada bloco é cortado na última quebra de linha.
+    """
+    f.seek(start)
+    remaining = end - start
+    carry = b''
+    while remaining > 0:
+        block = f.read(min(block_size, remaining))
+        if not block:
+            break
+        remaining -= len(block)
+        block = carry + block
+        cut = block.rfind(b'\n') + 1 if remaining > 0 else len(block)
+        carry = block[cut:]
+        if cut:
+            yield from io.StringIO(block[:cut].decode('utf-8'), newline='')
+    if carry:
+        yield carry.decode('utf-8')
+
+
+def format_cents(cents):
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def reprice_range(path, start, end, km_rate, out_path=None):
+    """
+    Precifica as linhas da faixa [start, end) do CSV com a taxa km_rate,
+    lendo e precificando aos poucos (BATCH_ROWS linhas por vez).
+
+    Args:
+        path (str): trips.csv de entrada
+        start, end (int): Faixa de bytes (alinhada a linhas)
+        km_rate (float): Nova taxa por km
+        out_path (str): Onde gravar as linhas precificadas (None = não grava)
+
+    Returns:
+        tuple[int, int, int]: (linhas, soma de km_expense, soma de total_expense) em centavos
+    """
+    header, _ = read_header(path)
+    col = {name: i for i, name in enumerate(header)}
+    i_dist, i_tolls, i_parking = col["distance"], col["tolls"], col["parking"]
+    i_km, i_total = col["km_expense"], col["total_expense"]
+
+    calculator = ExpenseCalculator(km_rate=km_rate)
+    rows_done = km_sum = total_sum = 0
+    out = open(out_path, 'w', newline='', encoding='utf-8') if out_path else None
+    try:
+        writer = csv.writer(out) if out else None
+        with open(path, 'rb') as f:
+            reader = csv.reader(read_lines(f, start, end))
+            while True:
+                rows = [row for _, row in zip(range(BATCH_ROWS), reader) if row]
+                if not rows:
+                    break
+                prices = calculator.calculate_batch(
+                    [r[i_dist] for r in rows],
+                    [r[i_tolls] for r in rows],
+                    [r[i_parking] for r in rows],
+                    centavos=True,
+                )
+                for row, km, total in zip(rows, prices['km_expense'], prices['total']):
+                    row[i_km] = format_cents(km)
+                    row[i_total] = format_cents(total)
+                    km_sum += km
+                    total_sum += total
+                if writer:
+                    writer.writerows(rows)
+                rows_done += len(rows)
+    finally:
+        if out:
+            out.close()
+    return rows_done, km_sum, total_sum
+
+
+def _reprice_part(args):
+    return reprice_range(*args)
+
+
+def reprice_file(path, out_path, km_rate, workers=None):
+    """
+    Recalcula o CSV inteiro em paralelo e grava o resultado em out_path.
+
+    Returns:
+        tuple[int, int, int]: (linhas, soma de km_expense, soma de total_expense) em centavos
+    """
+    workers = workers or os.cpu_count() or 1
+    # mais faixas que processos equilibra melhor a carga
+    ranges = chunk_offsets(path, workers * 4)
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp:
+        jobs = [
+            (path, start, end, km_rate, os.path.join(tmp, f"part-{i:05d}.csv"))
+            for i, (start, end) in enumerate(ranges)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_reprice_part, jobs))
+
+        with open(path, 'rb') as f:
+            header_line = f.readline()
+        partial = out_path + ".tmp"
+        with open(partial, 'wb') as out:
+            out.write(header_line)
+            for job in jobs:
+                with open(job[-1], 'rb') as part:
+                    shutil.copyfileobj(part, out, 1 << 20)
+        os.replace(partial, out_path)
+
+    return (
+        sum(r[0] for r in results),
+        sum(r[1] for r in results),
+        sum(r[2] for r in results),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.reprice",
+        description="Recalcula as despesas do histórico com uma nova taxa por km.",
+    )
+    parser.add_argument("csv_path", help="trips.csv de entrada")
+    parser.add_argument("--km-rate", type=float, required=True, help="nova taxa por km em R$")
+    parser.add_argument("-o", "--output", help="CSV de saída (padrão: <entrada>.repriced.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="processos (padrão: núcleos da máquina)")
+    parser.add_argument(
+        "--verify", action="store_true",
+        help="confere os totais contra uma execução em um único processo",
+    )
+    args = parser.parse_args(argv)
+    out_path = args.output or os.path.splitext(args.csv_path)[0] + ".repriced.csv"
+
+    t0 = time.perf_counter()
+    rows, km_sum, total_sum = reprice_file(args.csv_path, out_path, args.km_rate, args.workers)
+    elapsed = time.perf_counter() - t0
+    print(
+        f"{rows} viagens recalculadas em {elapsed:.2f} s "
+        f"({rows / elapsed if elapsed else 0:,.0f} viagens/s) -> {out_path}\n"
+        f"Total km: R$ {format_cents(km_sum)} | Total geral: R$ {format_cents(total_sum)}"
+    )
+
+    if args.verify:
+        _, body_start = read_header(args.csv_path)
+        expected = reprice_range(args.csv_path, body_start, os.path.getsize(args.csv_path), args.km_rate)
+        if expected != (rows, km_sum, total_sum):
+            print(
+                f"ERRO: totais divergentes da execução em um processo: {expected}",
+                file=sys.stderr,
+            )
+            return 1
+        print("Verificação: totais idênticos aos da execução em um único processo.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+def normalize_route_part(text):
+    """
+    Normaliza um endereço para compor a chave do cache
+    (espaços colapsados e sem diferença de maiúsculas/minúsculas).
+    """
+    return " ".join(str(text).split()).casefold()
+
+
+class RouteCache:
+    """
+    Cache persistente (SQLite) de distâncias entre origem e destino.
+
+    Evita repetir chamadas à Routes API para trajetos já conhecidos.
+    As entradas expiram após ttl segundos e, quando o cache passa de
+    max_entries, as menos usadas recentemente (LRU) são descartadas.
+    Com um AddressNormalizer, grafias diferentes do mesmo endereço (e seus
+    apelidos) compartilham a mesma entrada.
+    """
+
+    # 30 dias: rotas mudam pouco, mas não são eternas
+    DEFAULT_TTL = 30 * 24 * 3600
+    DEFAULT_MAX_ENTRIES = 50_000
+
+    def __init__(self, path, ttl=None, max_entries=None, clock=time.time, normalizer=None):
+        """
+        Inicializa (e cria, se preciso) o banco do cache.
+
+        Args:
+            path (str): Caminho do arquivo SQLite (ex.: data/routes_cache.sqlite3)
+            ttl (float): Validade de cada entrada em segundos
+            max_entries (int): Quantidade máxima de rotas guardadas
+            clock (callable): Fonte de tempo (injetável nos testes)
+            normalizer (AddressNormalizer): Forma canônica dos endereços (opcional)
+        """
+        self.path = path
+        self.ttl = ttl if ttl is not None else self.DEFAULT_TTL
+        self.max_entries = max_entries if max_entries is not None else self.DEFAULT_MAX_ENTRIES
+        self.clock = clock
+        self.normalizer = normalizer
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS routes ("
+            " origin TEXT NOT NULL,"
+            " destination TEXT NOT NULL,"
+            " travel_mode TEXT NOT NULL,"
+            " distance_km REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (origin, destination, travel_mode))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS routes_last_used ON routes (last_used)"
+        )
+        self._conn.commit()
+
+    def make_key(self, origin, dest, travel_mode="DRIVE"):
+        normalize = self.normalizer.resolve if self.normalizer else normalize_route_part
+        return (
+            normalize(origin),
+            normalize(dest),
+            str(travel_mode).upper(),
+        )
+
+    def request_address(self, text):
+        """
+        Texto enviado à Routes API para um endereço: com normalizador, um
+        apelido vira o endereço para o qual aponta; sem ele, o texto digitado.
+        """
+        if self.normalizer is None:
+            return text
+        return self.normalizer.request_address(text)
+
+    def get(self, origin, dest, travel_mode="DRIVE"):
+        """
+        Devolve a distância em km guardada para o trajeto, ou None se não
+        houver entrada válida.
+        """
+        key = self.make_key(origin, dest, travel_mode)
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT distance_km, created_at FROM routes"
+                " WHERE origin = ? AND destination = ? AND travel_mode = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            distance_km, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute(
+                    "DELETE FROM routes"
+                    " WHERE origin = ? AND destination = ? AND travel_mode = ?",
+                    key,
+                )
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE routes SET last_used = ?"
+                " WHERE origin = ? AND destination = ? AND travel_mode = ?",
+                (now, *key),
+            )
+            self._conn.commit()
+            self.hits += 1
+            return distance_km
+
+    def put(self, origin, dest, distance_km, travel_mode="DRIVE"):
+        """
+        Guarda a distância de um trajeto, descartando as entradas menos
+        usadas se o limite de tamanho for ultrapassado.
+        """
+        key = self.make_key(origin, dest, travel_mode)
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routes"
+                " (origin, destination, travel_mode, distance_km, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, float(distance_km), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM routes WHERE rowid IN ("
+                " SELECT rowid FROM routes ORDER BY last_used DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+
+    def stats(self):
+        """
+        Retorna os contadores do cache.
+
+        Returns:
+            dict: {'hits': int, 'misses': int, 'hit_rate': float, 'size': int},
+            mais 'addresses' (AddressNormalizer.stats) quando há normalizador
+        """
+        lookups = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self),
+        }
+        if self.normalizer is not None:
+            stats['addresses'] = self.normalizer.stats()
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
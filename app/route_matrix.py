@@ -0,0 +1,213 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.routes_client import RoutesClient, http_error
+
+
+ROUTE_MATRIX_URL = "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix"
+
+
+def plan_matrix_blocks(pairs, max_waypoints=50, max_elements=625, min_fill=0.5):
+    """
+    Agrupa pares (origem, destino) em blocos para o computeRouteMatrix.
+
+    Cada bloco é uma matriz origens x destinos. Pares com a mesma origem vão
+    juntos; origens diferentes só dividem um bloco enquanto os limites da API
+    (waypoints e elementos) forem respeitados e pelo menos min_fill dos
+    elementos cobrados forem realmente usados.
+
+    Args:
+        pairs (Iterable[tuple[str, str]]): Pares únicos (origem, destino)
+        max_waypoints (int): Limite de origens + destinos por requisição
+        max_elements (int): Limite de elementos (origens x destinos) por requisição
+        min_fill (float): Fração mínima de elementos úteis por bloco
+
+    Returns:
+        list[tuple[list[str], list[str], set]]: (origens, destinos, pares cobertos)
+    """
+    by_origin = {}
+    for origin, dest in pairs:
+        by_origin.setdefault(origin, [])
+        if dest not in by_origin[origin]:
+            by_origin[origin].append(dest)
+
+    # origens com muitos destinos viram blocos próprios de no máximo
+    # max_waypoints - 1 destinos
+    groups = []
+    chunk = min(max_waypoints - 1, max_elements)
+    for origin, dests in by_origin.items():
+        for i in range(0, len(dests), chunk):
+            groups.append((origin, dests[i:i + chunk]))
+    # grupos grandes primeiro: encaixam menos e definem os destinos do bloco
+    groups.sort(key=lambda g: -len(g[1]))
+
+    blocks = []
+    for origin, dests in groups:
+        for origins, destinations, covered in blocks:
+            new_dests = [d for d in dests if d not in destinations]
+            n_origins = len(origins) + 1
+            n_dests = len(destinations) + len(new_dests)
+            useful = len(covered) + len(dests)
+            if (
+                n_origins + n_dests <= max_waypoints
+                and n_origins * n_dests <= max_elements
+                and useful >= min_fill * n_origins * n_dests
+            ):
+                origins.append(origin)
+                destinations.extend(new_dests)
+                covered.update((origin, d) for d in dests)
+                break
+        else:
+            blocks.append(([origin], list(dests), {(origin, d) for d in dests}))
+    return blocks
+
+
+class RouteMatrixResolver:
+    """
+    Resolve distâncias de muitos pares (origem, destino) de uma vez usando a
+    Google Maps Routes API (distanceMatrix/v2:computeRouteMatrix).
+
+    Os pares são agrupados em matrizes dentro dos limites da API e as
+    requisições rodam em paralelo (até max_workers simultâneas).
+    """
+
+    TRAVEL_MODE = "DRIVE"
+
+    def __init__(self, api_key, url=ROUTE_MATRIX_URL, max_workers=4, cache=None, client=None):
+        """
+        Args:
+            api_key (str): Chave da Google Maps API
+            url (str): Endpoint do computeRouteMatrix
+            max_workers (int): Máximo de requisições simultâneas
+            cache (RouteCache): Cache de rotas consultado antes da API (opcional)
+            client (RoutesClient): Cliente HTTP compartilhado (opcional)
+        """
+        self.api_key = api_key
+        self.url = url
+        self.max_workers = max_workers
+        self.cache = cache
+        self.client = client if client is not None else RoutesClient(timeout=30)
+
+    def resolve(self, pairs):
+        """
+        Obtém a distância em km de cada par, na mesma ordem da entrada.
+
+        Args:
+            pairs (Sequence[tuple[str, str]]): Pares (origem, destino), um por viagem
+
+        Returns:
+            tuple[list, list]: (distâncias, erros). distâncias[i] é a distância
+            em km da viagem i ou None; erros[i] explica a falha quando houver.
+        """
+        pairs = [(str(o).strip(), str(d).strip()) for o, d in pairs]
+        found = {}
+        failed = {}
+
+        # com cache, pares com a mesma chave (mesmo endereço escrito de outro
+        # jeito) viram uma única consulta
+        if self.cache is not None:
+            keys = [self.cache.make_key(*pair, self.TRAVEL_MODE) for pair in pairs]
+        else:
+            keys = pairs
+        unique = {}
+        for key, pair in zip(keys, pairs):
+            unique.setdefault(key, pair)
+
+        missing = []
+        for key, pair in unique.items():
+            cached = self.cache.get(*pair, self.TRAVEL_MODE) if self.cache is not None else None
+            if cached is not None:
+                found[pair] = cached
+            else:
+                missing.append(pair)
+
+        if missing:
+            if not self.api_key:
+                message = (
+                    "Chave da API do Google Maps não configurada. "
+                    "Defina a variável de ambiente GOOGLE_MAPS_API_KEY."
+                )
+                failed.update((pair, message) for pair in missing)
+            else:
+                blocks = plan_matrix_blocks(missing)
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    results = pool.map(self._resolve_block, blocks)
+                    for block_found, block_failed in results:
+                        found.update(block_found)
+                        failed.update(block_failed)
+                if self.cache is not None:
+                    for pair in missing:
+                        if pair in found:
+                            self.cache.put(*pair, found[pair], self.TRAVEL_MODE)
+
+        # cada viagem usa o resultado do par representante da sua chave
+        pairs = [unique[key] for key in keys]
+        distances = [found.get(pair) for pair in pairs]
+        errors = [
+            None if pair in found else failed.get(pair, "Rota não retornada pela API.")
+            for pair in pairs
+        ]
+        return distances, errors
+
+    def _resolve_block(self, block):
+        origins, destinations, covered = block
+        try:
+            elements = self._request_matrix(origins, destinations)
+        except RuntimeError as e:
+            return {}, {pair: str(e) for pair in covered}
+
+        found = {}
+        failed = {}
+        for element in elements:
+            # o JSON do proto omite índices iguais a 0
+            pair = (
+                origins[element.get("originIndex", 0)],
+                destinations[element.get("destinationIndex", 0)],
+            )
+            if pair not in covered:
+                continue
+            status = element.get("status") or {}
+            if status.get("code") or element.get("condition") != "ROUTE_EXISTS":
+                failed[pair] = (
+                    "A API do Google Maps não encontrou rota: "
+                    f"{status.get('message') or element.get('condition')}"
+                )
+                continue
+            distance_km = float(element.get("distanceMeters", 0)) / 1000.0
+            if distance_km <= 0:
+                failed[pair] = "Distância retornada pela API do Google Maps é inválida (<= 0)."
+                continue
+            found[pair] = distance_km
+        return found, failed
+
+    def _request_matrix(self, origins, destinations):
+        headers = {
+            "Content-Type": "application/json",
+            "X-Goog-Api-Key": self.api_key,
+            "X-Goog-FieldMask": "originIndex,destinationIndex,distanceMeters,status,condition",
+        }
+        # apelidos vão à API como o endereço para o qual apontam
+        address = self.cache.request_address if self.cache is not None else str
+        body = {
+            "origins": [{"waypoint": {"address": address(o)}} for o in origins],
+            "destinations": [{"waypoint": {"address": address(d)}} for d in destinations],
+            "travelMode": self.TRAVEL_MODE,
+        }
+
+        resp = self.client.post(self.url, headers=headers, json=body)
+
+        if not resp.ok:
+            try:
+                err_json = resp.json()
+            except ValueError:
+                err_json = resp.text
+            raise http_error(resp.status_code, err_json)
+
+        try:
+            elements = resp.json()
+        except ValueError:
+            raise RuntimeError("Resposta inválida da API do Google Maps (JSON malformado).")
+        if not isinstance(elements, list):
+            raise RuntimeError(
+                "A API do Google Maps não retornou a matriz de rotas esperada."
+            )
+        return elements
@@ -0,0 +1,346 @@
+import random
+import threading
+import time
+from collections import deque
+
+# requests só é importado no primeiro uso do cliente: a importação custa
+# dezenas de milissegundos na abertura da janela
+_requests = None
+
+
+def load_requests():
+    """
+    Importa requests na primeira chamada.
+
+    Returns:
+        module | None: O módulo requests, ou None se não estiver instalado
+    """
+    global _requests
+    if _requests is None:
+        try:
+            import requests
+        except ImportError:
+            _requests = False
+        else:
+            _requests = requests
+    return _requests or None
+
+
+ROUTES_URL = "https://routes.googleapis.com/directions/v2:computeRoutes"
+# Campo obrigatório: pelo menos um campo em routes.*
+ROUTES_FIELD_MASK = "routes.distanceMeters"
+
+
+def route_request(api_key, origin, dest):
+    """
+    Cabeçalhos e corpo de um computeRoutes (só a distância da rota de carro).
+
+    Returns:
+        tuple[dict, dict]: (headers, corpo JSON)
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "X-Goog-Api-Key": api_key,
+        "X-Goog-FieldMask": ROUTES_FIELD_MASK,
+    }
+    body = {
+        "origin": {
+            "address": origin
+        },
+        "destination": {
+            "address": dest
+        },
+        "travelMode": "DRIVE",
+        # Mantemos o exemplo simples, compatível com a documentação.
+    }
+    return headers, body
+
+
+def http_error(status_code, detail):
+    """
+    Erro de uma resposta 4xx/5xx, com a mensagem do Google (não só "400 Bad Request").
+
+    Args:
+        status_code (int): Status HTTP
+        detail: Corpo da resposta (JSON decodificado ou texto)
+
+    Returns:
+        RuntimeError
+    """
+    return RuntimeError(
+        f"Erro HTTP {status_code} da API do Google Maps.\n"
+        f"Resposta: {detail}"
+    )
+
+
+def distance_from_route(data):
+    """
+    Distância em km da primeira rota de uma resposta do computeRoutes.
+
+    Raises:
+        RuntimeError: Sem rota, sem distanceMeters ou distância <= 0
+    """
+    routes = data.get("routes") if isinstance(data, dict) else None
+    if not routes:
+        raise RuntimeError(
+            "A API do Google Maps não retornou nenhuma rota para os endereços informados."
+        )
+
+    distance_meters = routes[0].get("distanceMeters")
+    if distance_meters is None:
+        raise RuntimeError(
+            "A API do Google Maps não retornou o campo distanceMeters."
+        )
+
+    distance_km = float(distance_meters) / 1000.0
+    if distance_km <= 0:
+        raise RuntimeError(
+            "Distância retornada pela API do Google Maps é inválida (<= 0)."
+        )
+    return distance_km
+
+
+def __getattr__(name):
+    # mantém app.routes_client.requests acessível de fora (ex.: mock.patch)
+    if name == "requests":
+        return load_requests()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class RoutesClient:
+    """
+    Cliente HTTP reutilizável para a Google Maps Routes API.
+
+    Mantém uma requests.Session com pool de conexões (keep-alive), repete
+    requisições que falham com status transitórios usando backoff exponencial
+    com jitter e abre um "circuit breaker" depois de falhas seguidas, para não
+    insistir numa API fora do ar. Também guarda a latência de cada chamada.
+    """
+
+    # Status que valem uma nova tentativa
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    # Estados do circuit breaker
+    CLOSED = "closed"
+    OPEN = "open"
+    # reset_timeout passou: uma única chamada testa a API
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        timeout=10,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_max=8.0,
+        failure_threshold=5,
+        reset_timeout=60.0,
+        pool_size=10,
+        sleep=time.sleep,
+        clock=time.monotonic,
+        rng=random.random,
+    ):
+        """
+        Args:
+            timeout (float): Timeout de cada requisição em segundos
+            max_retries (int): Tentativas extras para status transitórios / erros de rede
+            backoff_base (float): Espera base (s) do backoff exponencial
+            backoff_max (float): Espera máxima (s) entre tentativas
+            failure_threshold (int): Falhas seguidas que abrem o circuito
+            reset_timeout (float): Tempo (s) com o circuito aberto antes de testar de novo
+            pool_size (int): Conexões mantidas abertas por host
+            sleep, clock, rng: Injetáveis nos testes
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.pool_size = pool_size
+        self.sleep = sleep
+        self.clock = clock
+        self.rng = rng
+
+        self._session = None
+        # estado do circuito e contadores, compartilhados entre threads
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.open_until = None
+        self._probing = False
+
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.latencies = deque(maxlen=1000)
+
+    @property
+    def session(self):
+        """requests.Session criada só no primeiro uso (uma só entre as threads)."""
+        with self._lock:
+            if self._session is None:
+                requests = load_requests()
+                if requests is None:
+                    raise RuntimeError(
+                        "A biblioteca 'requests' não está disponível. Instale-a com: pip install requests"
+                    )
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """
+        Espera antes da próxima tentativa: "full jitter" sobre
+        backoff_base * 2**attempt, respeitando o Retry-After do servidor.
+        """
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        return self.rng() * min(self.backoff_max, self.backoff_base * 2 ** attempt)
+
+    def _admit(self):
+        """
+        Decide se uma chamada pode ir à API. Com o circuito meio-aberto, só
+        a primeira passa (o teste); as outras são recusadas até o resultado
+        dela fechar ou reabrir o circuito.
+
+        Returns:
+            bool: True se a chamada pode seguir
+        """
+        with self._lock:
+            if self.state == self.OPEN and self.clock() >= self.open_until:
+                self.state = self.HALF_OPEN
+                self.open_until = None
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    self.short_circuited += 1
+                    return False
+                self._probing = True
+            elif self.state == self.OPEN:
+                self.short_circuited += 1
+                return False
+            self.calls += 1
+            return True
+
+    def post(self, url, headers=None, json=None):
+        """
+        Faz um POST com as repetições e proteções do cliente.
+
+        Returns:
+            requests.Response: Resposta final (pode ser 4xx/5xx se as tentativas acabarem)
+
+        Raises:
+            RuntimeError: Circuito aberto ou falha de rede em todas as tentativas
+        """
+        session = self.session
+        requests = load_requests()
+        if not self._admit():
+            raise RuntimeError(
+                "API do Google Maps temporariamente ignorada após falhas seguidas. "
+                "Tente novamente mais tarde."
+            )
+
+        retries = 0
+        resp = None
+        error = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    retries += 1
+                start = self.clock()
+                try:
+                    resp = session.post(url, headers=headers, json=json, timeout=self.timeout)
+                    error = None
+                except requests.RequestException as e:
+                    resp = None
+                    error = e
+                with self._lock:
+                    self.latencies.append(self.clock() - start)
+
+                if resp is not None and resp.status_code not in self.RETRY_STATUSES:
+                    self._record_success(retries)
+                    return resp
+                if attempt < self.max_retries:
+                    self.sleep(self.backoff_delay(attempt, self._retry_after(resp)))
+        except BaseException:
+            # erro inesperado: conta como falha (e libera o teste do meio-aberto)
+            self._record_failure(retries)
+            raise
+
+        self._record_failure(retries)
+        if resp is not None:
+            return resp
+        raise RuntimeError(f"Falha de comunicação com a API do Google Maps: {error}")
+
+    @staticmethod
+    def _retry_after(resp):
+        if resp is None:
+            return None
+        try:
+            return float(resp.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
+
+    def _record_success(self, retries):
+        with self._lock:
+            self.retries += retries
+            self.consecutive_failures = 0
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._probing = False
+
+    def _record_failure(self, retries):
+        with self._lock:
+            self.retries += retries
+            self.failures += 1
+            self.consecutive_failures += 1
+            # no meio-aberto, uma falha do teste já reabre o circuito
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.open_until = self.clock() + self.reset_timeout
+                self._probing = False
+
+    def stats(self):
+        """
+        Retorna os contadores e latências do cliente.
+
+        Returns:
+            dict: chamadas, repetições, falhas, estado do circuito e latências (s)
+        """
+        with self._lock:
+            # cópia sob a trava: outras threads continuam registrando latências
+            recent = list(self.latencies)
+            counters = {
+                'calls': self.calls,
+                'retries': self.retries,
+                'failures': self.failures,
+                'short_circuited': self.short_circuited,
+                'circuit_open': self.state == self.OPEN,
+                'circuit_state': self.state,
+            }
+
+        latencies = sorted(recent)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            **counters,
+            'latency_last': recent[-1] if recent else 0.0,
+            'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_p50': percentile(0.50),
+            'latency_p95': percentile(0.95),
+        }
+
+    def close(self):
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
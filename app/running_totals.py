@@ -0,0 +1,278 @@
+"""
+Totais acumulados do data/trips.csv (geral, por mês e por trajeto).
+
+Os totais ficam num arquivo ao lado do CSV (trips.csv.totals) junto com a
+posição até onde o CSV já foi somado. Depois de cada gravação só as viagens
+novas são lidas, então "total reembolsado" e "total do mês" saem na hora,
+sem percorrer o histórico. Se o CSV mudar por outro caminho (editado,
+truncado ou substituído), os totais são refeitos do zero; verify() compara
+com uma soma completa feita por app.reports.
+
+Uso (na raiz do projeto):
+    python3 -m app.running_totals data/trips.csv
+    python3 -m app.running_totals data/trips.csv --verify
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date
+from decimal import Decimal
+
+from app.reports import SUM_FIELDS, aggregate, iter_trips, month_key, route_key, to_decimal, to_units
+
+
+def _dump_units(value):
+    # somas com mais casas que a escala comum são Decimal (ver reports.to_units)
+    return value if isinstance(value, int) else str(value)
+
+
+def _load_units(value):
+    return value if isinstance(value, int) else Decimal(value)
+
+
+class RunningTotals:
+    """
+    Somas incrementais de um trips.csv que só recebe acréscimos, guardadas
+    num arquivo auxiliar gravado a cada `checkpoint_every` viagens novas.
+    """
+
+    VERSION = 1
+    # bytes do final da parte somada usados para detectar um CSV alterado
+    TAIL_BYTES = 64
+
+    def __init__(self, csv_path, path=None, checkpoint_every=64):
+        """
+        Args:
+            csv_path (str): Caminho do trips.csv
+            path (str): Arquivo dos totais (padrão: <csv_path>.totals)
+            checkpoint_every (int): Viagens somadas entre gravações do arquivo
+                (as que faltarem são relidas do CSV na próxima abertura)
+        """
+        self.csv_path = csv_path
+        self.path = path or csv_path + ".totals"
+        self.checkpoint_every = checkpoint_every
+        self._state = None
+        self._unsaved = 0
+
+    def _empty_state(self):
+        return {
+            "version": self.VERSION,
+            "header": None,
+            "size": 0,
+            "tail": "",
+            # [viagens, soma de cada campo de SUM_FIELDS na escala de reports]
+            "overall": [0] * (len(SUM_FIELDS) + 1),
+            "months": {},
+            "routes": {},
+        }
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != self.VERSION:
+            return None
+        for acc in [state["overall"], *state["months"].values(), *state["routes"].values()]:
+            acc[1:] = [_load_units(v) for v in acc[1:]]
+        return state
+
+    def checkpoint(self):
+        """Grava os totais atuais no arquivo auxiliar (troca atômica)."""
+        if self._state is None:
+            return
+        state = dict(self._state)
+        for name in ("months", "routes"):
+            state[name] = {k: [acc[0], *map(_dump_units, acc[1:])] for k, acc in state[name].items()}
+        state["overall"] = [state["overall"][0], *map(_dump_units, state["overall"][1:])]
+        partial = self.path + ".tmp"
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(partial, self.path)
+        self._unsaved = 0
+
+    def _read_tail(self, f, end):
+        start = max(0, end - self.TAIL_BYTES)
+        f.seek(start)
+        return f.read(end - start).hex()
+
+    def _is_current(self, state, f, size):
+        """O CSV ainda começa com o que foi somado (só recebeu acréscimos)?"""
+        covered = state["size"]
+        if covered > size:
+            return False
+        if covered == 0:
+            return True
+        if self._read_tail(f, covered) != state["tail"]:
+            return False
+        f.seek(0)
+        return f.readline().decode('utf-8') == state["header"]
+
+    def _add_tail(self, state, f, size):
+        """Soma as linhas completas entre o fim da parte somada e size."""
+        f.seek(state["size"])
+        data = f.read(size - state["size"])
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+        lines = data[:end].split(b'\n')[:-1]
+        if state["header"] is None:
+            state["header"] = (lines.pop(0) + b'\n').decode('utf-8')
+        header = next(csv.reader([state["header"]]), [])
+
+        width = len(SUM_FIELDS) + 1
+        overall = state["overall"]
+        months = state["months"]
+        routes = state["routes"]
+        added = 0
+        # os endereços nunca têm quebra de linha: uma linha do arquivo = uma viagem
+        for row in csv.reader(line.decode('utf-8') for line in lines):
+            if not row:
+                continue
+            trip = dict(zip(header, row))
+            units = [to_units(trip.get(field) or "") for field in SUM_FIELDS]
+            for accs, key in ((months, month_key(trip)), (routes, route_key(trip))):
+                acc = accs.get(key)
+                if acc is None:
+                    acc = accs[key] = [0] * width
+                acc[0] += 1
+                for i, value in enumerate(units, start=1):
+                    acc[i] += value
+            overall[0] += 1
+            for i, value in enumerate(units, start=1):
+                overall[i] += value
+            added += 1
+
+        state["size"] += end
+        state["tail"] = self._read_tail(f, state["size"])
+        return added
+
+    def update(self):
+        """
+        Soma as viagens gravadas desde a última atualização, ou refaz os
+        totais se o CSV não é mais o que foi somado.
+
+        Returns:
+            int: Viagens somadas nesta chamada
+        """
+        state = self._state or self._load()
+        if not os.path.exists(self.csv_path):
+            self._state = self._empty_state()
+            return 0
+        added = 0
+        with open(self.csv_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if state is None or not self._is_current(state, f, size):
+                state = self._empty_state()
+                self._unsaved = self.checkpoint_every
+            if state["size"] < size:
+                added = self._add_tail(state, f, size)
+        self._state = state
+        self._unsaved += added
+        if self._unsaved and self._unsaved >= self.checkpoint_every:
+            self.checkpoint()
+        return added
+
+    def rebuild(self):
+        """Descarta os totais e soma o CSV inteiro de novo."""
+        self._state = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        return self.update()
+
+    @staticmethod
+    def _totals(acc):
+        totals = {'trips': acc[0] if acc else 0}
+        for i, field in enumerate(SUM_FIELDS, start=1):
+            totals[field] = to_decimal(acc[i] if acc else 0)
+        return totals
+
+    def lifetime(self):
+        """
+        Returns:
+            dict: {'trips': int, 'distance': Decimal, ..., 'total_expense': Decimal}
+        """
+        self.update()
+        return self._totals(self._state["overall"])
+
+    def month(self, key=None):
+        """
+        Totais de um mês ("AAAA-MM"; padrão: o mês atual).
+        """
+        self.update()
+        key = key or date.today().isoformat()[:7]
+        return self._totals(self._state["months"].get(key))
+
+    def by_month(self):
+        """
+        Returns:
+            dict: mês -> totais (mesmo formato de reports.aggregate)
+        """
+        self.update()
+        return {k: self._totals(acc) for k, acc in self._state["months"].items()}
+
+    def by_route(self):
+        self.update()
+        return {k: self._totals(acc) for k, acc in self._state["routes"].items()}
+
+    def verify(self):
+        """
+        Compara os totais acumulados com uma soma completa do CSV.
+
+        Returns:
+            list[str]: Diferenças encontradas (vazia se tudo confere)
+        """
+        problems = []
+        if not os.path.exists(self.csv_path):
+            return problems
+        checks = [
+            ("geral", {"*": self.lifetime()}, lambda row: "*"),
+            ("mês", self.by_month(), month_key),
+            ("trajeto", self.by_route(), route_key),
+        ]
+        for kind, actual, key in checks:
+            full = aggregate(iter_trips(self.csv_path), key=key)
+            if kind == "geral":
+                full.setdefault("*", self._totals(None))
+            for group in sorted(set(actual) | set(full)):
+                if actual.get(group) != full.get(group):
+                    problems.append(f"{kind} {group}: {actual.get(group)} != {full.get(group)}")
+        return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.running_totals",
+        description="Totais acumulados de reembolso do trips.csv (geral e do mês).",
+    )
+    parser.add_argument("csv_path", nargs="?", default="data/trips.csv", help="caminho do trips.csv")
+    parser.add_argument("--month", help="mês a mostrar (AAAA-MM; padrão: o atual)")
+    parser.add_argument("--rebuild", action="store_true", help="refaz os totais a partir do CSV")
+    parser.add_argument("--verify", action="store_true", help="confere os totais com uma soma completa")
+    args = parser.parse_args(argv)
+
+    totals = RunningTotals(args.csv_path)
+    if args.rebuild:
+        totals.rebuild()
+    lifetime = totals.lifetime()
+    month = totals.month(args.month)
+    print(f"Total: R$ {lifetime['total_expense']} em {lifetime['trips']} viagens ({lifetime['distance']} km)")
+    print(
+        f"Mês {args.month or date.today().isoformat()[:7]}: R$ {month['total_expense']} "
+        f"em {month['trips']} viagens ({month['distance']} km)"
+    )
+    if args.verify:
+        problems = totals.verify()
+        for problem in problems:
+            print(f"Diferença: {problem}", file=sys.stderr)
+        if problems:
+            return 1
+        print("Totais conferem com a soma completa do CSV.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""
+Serviço HTTP do Mileage Tracker (asyncio, sem dependências externas).
+
+Vários clientes (scripts, outras instâncias) gravam e consultam as viagens de
+um único diretório data/, precificadas pelo ExpenseCalculator. As viagens
+passam pelo mesmo repositório do aplicativo Tk (app/repository.py, escolhido
+por TRIPS_BACKEND), então o serviço e as janelas abertas dividem o mesmo
+histórico, seja no trips.csv ou no trips.sqlite3.
+
+Rotas (corpo e respostas em JSON):
+    GET  /health
+    POST /price     {"distance": 120.5, "tolls": 10, "parking": 0, "trip_date": "2024-03-01"}
+    POST /trips     {"origin", "destination", "start_odometer", "end_odometer",
+                     "distance"?, "tolls"?, "parking"?, "timestamp"?}
+    GET  /trips?limit=50&offset=0&q=paulista     (mais recentes primeiro)
+    GET  /trips?from=2024-03-01&to=2024-04-01    (período pelo índice por data)
+    GET  /metrics                                (texto do Prometheus)
+
+Uso (na raiz do projeto):
+    python3 -m app.server --port 8080
+    python3 -m app.server --host 0.0.0.0 --port 8080 --data-dir /aplication/data
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from dataclasses import replace
+from datetime import datetime
+from itertools import islice
+from urllib.parse import parse_qs, urlsplit
+
+from app.cli import parse_number, parse_trip
+from app.expense import ExpenseCalculator
+from app.metrics import Metrics
+from app.repository import CSV_HEADER, data_normalizer, open_repository
+
+# Limites de uma requisição
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+# Máximo de viagens devolvidas por consulta
+MAX_LIMIT = 1000
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class TripService:
+    """
+    Operações do serviço sobre um diretório de dados: precificação,
+    gravação de viagens e consultas ao histórico.
+    """
+
+    def __init__(self, data_dir, calculator=None, sync=True, backend=None):
+        """
+        Args:
+            data_dir (str): Diretório com o trips.csv (criado se não existir)
+            calculator (ExpenseCalculator): Calculador de despesas (padrão: taxa padrão)
+            sync (bool): fsync a cada lote de gravações no CSV (ver TripLog)
+            backend (str): "csv" ou "sqlite" (padrão: TRIPS_BACKEND, como o aplicativo)
+
+        Raises:
+            ValueError: Backend desconhecido
+        """
+        self.csv_path = os.path.join(data_dir, "trips.csv")
+        self.calculator = calculator or ExpenseCalculator()
+        backend = backend or os.getenv("TRIPS_BACKEND", "csv").strip().lower() or "csv"
+        # mesmos apelidos de endereço do aplicativo nas buscas do SQLite
+        self.repository = open_repository(
+            backend, self.csv_path, CSV_HEADER, normalizer=data_normalizer(self.csv_path), sync=sync
+        )
+        self.history = self.repository.history()
+
+    def price(self, payload):
+        """
+        Returns:
+            dict: Resultado de ExpenseCalculator.calculate_total_expense
+
+        Raises:
+            ValueError: Valores ausentes ou inválidos
+        """
+        try:
+            distance = parse_number(payload.get("distance"))
+            tolls = parse_number(payload.get("tolls"), 0.0)
+            parking = parse_number(payload.get("parking"), 0.0)
+        except ValueError:
+            raise ValueError("distance é obrigatório; distance, tolls e parking devem ser numéricos")
+        return self.calculator.calculate_total_expense(
+            distance, tolls, parking, trip_date=payload.get("trip_date") or None
+        )
+
+    def submit(self, payload):
+        """
+        Precifica e grava uma viagem (bloqueia até o fsync; chamar fora do
+        laço de eventos).
+
+        Returns:
+            dict: Viagem gravada, com os campos do trips.csv
+
+        Raises:
+            ValueError: Registro incompleto ou com valores inválidos
+        """
+        trip = parse_trip(payload)
+        if not trip.timestamp:
+            trip = replace(trip, timestamp=datetime.now().isoformat(timespec='seconds'))
+        row = trip.to_row(self.calculator.price_trip(trip))
+        self.repository.append(row)
+        return dict(zip(CSV_HEADER, row))
+
+    def recent(self, limit=50, offset=0, query=None):
+        """
+        Viagens mais recentes primeiro, opcionalmente só as com query na
+        origem ou no destino (lê o disco; chamar fora do laço de eventos).
+
+        A busca não muda o HistorySource compartilhado: cada requisição usa
+        o resultado guardado para o seu query (HistorySource.matches).
+
+        Returns:
+            dict: {'total': int, 'trips': list[dict]}
+        """
+        history = self.history
+        history.refresh()
+        # o offset conta a partir do fim do histórico inteiro: precisa do índice
+        history.build_index()
+        query = (query or "").strip()
+        numbers = history.matches(query) if query else None
+        total = len(numbers) if query else history.total
+        end = max(0, total - offset)
+        start = max(0, end - limit)
+        if query:
+            rows = history.rows_at(numbers[start:end])
+        else:
+            rows = history.rows(start, end - start)
+        return {'total': total, 'trips': [dict(zip(CSV_HEADER, row)) for row in reversed(rows)]}
+
+    def between(self, start=None, end=None, limit=MAX_LIMIT):
+        """
+        Viagens com start <= timestamp < end, em ordem de gravação (lê o
+        disco; chamar fora do laço de eventos).
+
+        Returns:
+            dict: {'trips': list[dict], 'truncated': bool}
+        """
+        rows = list(islice(self.repository.between(start, end), limit + 1))
+        return {
+            'trips': [dict(zip(CSV_HEADER, row)) for row in rows[:limit]],
+            'truncated': len(rows) > limit,
+        }
+
+    def close(self):
+        self.repository.close()
+        if self.repository.normalizer is not None:
+            self.repository.normalizer.close()
+
+
+class TripServer:
+    """
+    Servidor HTTP/1.1 mínimo (com keep-alive) sobre asyncio.start_server.
+    As gravações e as consultas ao histórico rodam em threads, para o fsync
+    e a leitura do CSV não pararem o laço de eventos; as gravações que
+    chegam juntas são gravadas num só lote pelo TripLog.
+    """
+
+    def __init__(self, service, metrics=None):
+        self.service = service
+        self.metrics = metrics or Metrics()
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """
+        Returns:
+            int: Porta em uso (útil com port=0)
+        """
+        self._server = await asyncio.start_server(
+            self._handle, host, port, limit=MAX_HEADER_BYTES
+        )
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(self._response(431, {'error': "cabeçalho muito grande"}, False))
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    writer.write(self._response(400, {'error': "requisição malformada"}, False))
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0 or "transfer-encoding" in headers:
+                    writer.write(self._response(400, {'error': "informe o Content-Length do corpo"}, False))
+                    break
+                if length > MAX_BODY_BYTES:
+                    writer.write(self._response(413, {'error': "corpo muito grande"}, False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._dispatch(method, target, body)
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        route = url.path.rstrip("/") or "/"
+        with self.metrics.span("request", route=route):
+            try:
+                return await self._route(method, route, parse_qs(url.query), body)
+            except HTTPError as e:
+                return e.status, {'error': str(e)}
+            except ValueError as e:
+                return 400, {'error': str(e)}
+            except Exception as e:
+                self.metrics.inc("server_errors")
+                print(f"Erro em {method} {target}: {e!r}", file=sys.stderr)
+                return 500, {'error': "erro interno"}
+
+    async def _route(self, method, route, query, body):
+        service = self.service
+        if route == "/health":
+            return 200, {'status': "ok"}
+        if route == "/metrics":
+            return 200, self.metrics.render_prometheus()
+        if route == "/price":
+            self._allow(method, "POST")
+            return 200, service.price(self._json(body))
+        if route == "/trips":
+            if method == "POST":
+                payload = self._json(body)
+                loop = asyncio.get_running_loop()
+                trip = await loop.run_in_executor(None, service.submit, payload)
+                self.metrics.inc("trips_saved", source="server")
+                return 201, trip
+            self._allow(method, "GET")
+            limit = min(MAX_LIMIT, self._int(query, "limit", 50))
+            loop = asyncio.get_running_loop()
+            if "from" in query or "to" in query:
+                return 200, await loop.run_in_executor(
+                    None, service.between, query.get("from", [None])[0], query.get("to", [None])[0], limit
+                )
+            return 200, await loop.run_in_executor(
+                None, service.recent, limit, self._int(query, "offset", 0), query.get("q", [None])[0]
+            )
+        raise HTTPError(404, f"rota desconhecida: {route}")
+
+    @staticmethod
+    def _allow(method, allowed):
+        if method != allowed:
+            raise HTTPError(405, f"use {allowed}")
+
+    @staticmethod
+    def _json(body):
+        try:
+            # NaN e Infinity não são JSON válido (o json do Python os aceita)
+            payload = json.loads(body or b"{}", parse_constant=TripServer._reject_constant)
+        except ValueError:
+            raise HTTPError(400, "corpo não é um JSON válido")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "o corpo deve ser um objeto JSON")
+        return payload
+
+    @staticmethod
+    def _reject_constant(name):
+        raise ValueError(f"constante não permitida: {name}")
+
+    @staticmethod
+    def _int(query, name, default):
+        try:
+            value = int(query.get(name, [default])[0])
+        except ValueError:
+            raise HTTPError(400, f"{name} deve ser um número inteiro")
+        if value < 0:
+            raise HTTPError(400, f"{name} não pode ser negativo")
+        return value
+
+    @staticmethod
+    def _response(status, payload, keep_alive):
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+
+async def run(host, port, data_dir):
+    service = TripService(data_dir)
+    server = TripServer(service, Metrics(enabled=True))
+    port = await server.start(host, port)
+    print(f"Mileage Tracker servindo em http://{host}:{port} (dados em {service.csv_path})", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.server",
+        description="Serviço HTTP para gravar, precificar e consultar viagens.",
+    )
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", "8080")))
+    parser.add_argument("--data-dir", default="data", help="diretório do trips.csv")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(run(args.host, args.port, args.data_dir))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
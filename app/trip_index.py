@@ -0,0 +1,322 @@
+"""
+Índice esparso por data do data/trips.csv.
+
+A cada N viagens o índice guarda o offset (em bytes) da linha que abre o
+bloco e o menor/maior timestamp do bloco. Uma consulta por período lê só os
+blocos que podem conter viagens do período, indo direto ao offset com seek,
+sem percorrer o arquivo inteiro.
+
+O índice fica ao lado do CSV (trips.csv.idx) e é atualizado de forma
+incremental depois de cada gravação. Se o CSV mudar por outro caminho
+(arquivo truncado, editado ou substituído), o índice é reconstruído.
+
+O arquivo é JSON Lines: a primeira linha é o índice completo e cada
+atualização acrescenta uma linha só com os blocos que mudaram. Quando as
+linhas acrescentadas passam do número de blocos, o arquivo é regravado com
+uma linha só, então o custo de cada gravação não cresce com o histórico.
+
+Uso (na raiz do projeto):
+    python3 -m app.trip_index data/trips.csv --from 2024-03-01 --to 2024-04-01
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import threading
+from datetime import date, datetime
+
+TIMESTAMP_FIELD = "timestamp"
+
+
+def timestamp_key(value):
+    """
+    Converte uma data/hora no texto ISO usado na coluna timestamp, para
+    comparar como texto (None continua None).
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(timespec='seconds')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def upgrade_csv_header(csv_path, header):
+    """
+    Troca o cabeçalho antigo (sem a coluna timestamp) pelo atual, regravando
+    o arquivo uma única vez. As viagens antigas continuam sem data.
+
+    Returns:
+        bool: True se o arquivo foi regravado
+    """
+    if not os.path.exists(csv_path):
+        return False
+    with open(csv_path, 'rb') as f:
+        first = f.readline()
+        current = next(csv.reader([first.decode('utf-8')]), [])
+        if current == header or current != [h for h in header if h != TIMESTAMP_FIELD]:
+            return False
+        partial = csv_path + ".tmp"
+        with open(partial, 'w', newline='', encoding='utf-8') as out:
+            csv.writer(out).writerow(header)
+        with open(partial, 'ab') as out:
+            shutil.copyfileobj(f, out, 1 << 20)
+    os.replace(partial, csv_path)
+    return True
+
+
+class TripDateIndex:
+    """
+    Índice esparso (timestamp -> offset a cada `every` viagens) de um
+    trips.csv que só recebe acréscimos.
+
+    Os blocos guardam o menor e o maior timestamp, então a consulta continua
+    correta mesmo que as datas não estejam em ordem (relógio ajustado,
+    viagens antigas sem data).
+    """
+
+    VERSION = 2
+    # bytes do final da parte indexada usados para detectar um CSV alterado
+    TAIL_BYTES = 64
+    # linhas acrescentadas aceitas antes de regravar o índice (no mínimo)
+    COMPACT_MIN = 64
+
+    def __init__(self, csv_path, every=1000, index_path=None):
+        """
+        Args:
+            csv_path (str): Caminho do trips.csv
+            every (int): Viagens por bloco do índice
+            index_path (str): Arquivo do índice (padrão: <csv_path>.idx)
+        """
+        self.csv_path = csv_path
+        self.index_path = index_path or csv_path + ".idx"
+        self.every = every
+        self._state = None
+        # linhas acrescentadas desde a última regravação (None = regravar)
+        self._appended = None
+        # consultas de várias threads (serviço HTTP) atualizam o mesmo estado
+        self._lock = threading.RLock()
+
+    def _empty_state(self):
+        return {
+            "version": self.VERSION,
+            "every": self.every,
+            "header": None,
+            "ts_column": None,
+            "size": 0,
+            "tail": "",
+            # [offset da primeira linha, viagens, menor timestamp, maior timestamp]
+            "blocks": [],
+        }
+
+    def _load(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                lines = f.read().split('\n')
+            state = json.loads(lines[0])
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != self.VERSION:
+            return None
+        if state.get("every") != self.every:
+            return None
+
+        self._appended = 0
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                change = json.loads(line)
+                start = change["from"]
+                state["blocks"][start:] = change["blocks"]
+                state["size"] = change["size"]
+                state["tail"] = change["tail"]
+            except (ValueError, KeyError, TypeError):
+                # linha incompleta (gravação interrompida): o que veio antes
+                # continua válido; o resto do CSV é indexado de novo
+                self._appended = None
+                break
+            self._appended += 1
+        return state
+
+    def _save(self, state, start=0):
+        """
+        Grava o índice: acrescenta os blocos a partir de `start` ao arquivo
+        ou, se já há linhas acrescentadas demais, regrava o índice completo.
+        """
+        limit = max(self.COMPACT_MIN, len(state["blocks"]))
+        if self._appended is not None and self._appended < limit:
+            change = {
+                "from": start,
+                "blocks": state["blocks"][start:],
+                "size": state["size"],
+                "tail": state["tail"],
+            }
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(change, ensure_ascii=False) + '\n')
+            self._appended += 1
+            return
+        partial = self.index_path + ".tmp"
+        with open(partial, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(state, ensure_ascii=False) + '\n')
+        os.replace(partial, self.index_path)
+        self._appended = 0
+
+    def _read_tail(self, f, end):
+        start = max(0, end - self.TAIL_BYTES)
+        f.seek(start)
+        return f.read(end - start).hex()
+
+    def _is_current(self, state, f, size):
+        """O CSV ainda começa com o que foi indexado (só recebeu acréscimos)?"""
+        covered = state["size"]
+        if covered > size:
+            return False
+        if covered == 0:
+            return True
+        if self._read_tail(f, covered) != state["tail"]:
+            return False
+        f.seek(0)
+        return f.readline().decode('utf-8') == state["header"]
+
+    def _index_tail(self, state, f, size):
+        """Indexa as linhas completas entre o fim da parte indexada e size."""
+        f.seek(state["size"])
+        data = f.read(size - state["size"])
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return False
+        lines = data[:end].split(b'\n')[:-1]
+
+        pos = state["size"]
+        if state["header"] is None:
+            header = lines.pop(0) + b'\n'
+            state["header"] = header.decode('utf-8')
+            fields = next(csv.reader([state["header"]]), [])
+            if TIMESTAMP_FIELD in fields:
+                state["ts_column"] = fields.index(TIMESTAMP_FIELD)
+            pos += len(header)
+
+        col = state["ts_column"]
+        blocks = state["blocks"]
+        # os endereços nunca têm quebra de linha: uma linha do arquivo = uma viagem
+        rows = csv.reader(line.decode('utf-8') for line in lines)
+        for line, row in zip(lines, rows):
+            if row:
+                if not blocks or blocks[-1][1] >= self.every:
+                    blocks.append([pos, 0, None, None])
+                block = blocks[-1]
+                block[1] += 1
+                ts = row[col] if col is not None and len(row) > col else ""
+                if ts:
+                    if block[2] is None or ts < block[2]:
+                        block[2] = ts
+                    if block[3] is None or ts > block[3]:
+                        block[3] = ts
+            pos += len(line) + 1
+
+        state["size"] = pos
+        state["tail"] = self._read_tail(f, pos)
+        return True
+
+    def update(self):
+        """
+        Acrescenta ao índice as viagens gravadas desde a última atualização,
+        ou reconstrói o índice se o CSV não é mais o que foi indexado.
+
+        Returns:
+            dict: Estado atual do índice
+        """
+        with self._lock:
+            state = self._state or self._load()
+            if not os.path.exists(self.csv_path):
+                self._state = self._empty_state()
+                return self._state
+            # índice ausente, descartado ou com linha incompleta: regrava inteiro
+            changed = self._appended is None
+            with open(self.csv_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if state is None or not self._is_current(state, f, size):
+                    state = self._empty_state()
+                    self._appended = None
+                    changed = True
+                # o último bloco pode receber viagens; os anteriores não mudam
+                start = max(len(state["blocks"]) - 1, 0)
+                if state["size"] < size:
+                    changed = self._index_tail(state, f, size) or changed
+            self._state = state
+            if changed:
+                self._save(state, start)
+            return state
+
+    def rebuild(self):
+        """Descarta o índice e indexa o CSV inteiro de novo."""
+        with self._lock:
+            self._state = self._empty_state()
+            self._appended = None
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            return self.update()
+
+    def trips_between(self, start=None, end=None):
+        """
+        Gera as viagens (listas de texto, como no CSV) com
+        start <= timestamp < end. Viagens sem data são ignoradas.
+
+        Args:
+            start (date | datetime | str): Início do período (None = sem limite)
+            end (date | datetime | str): Fim do período, exclusivo (None = sem limite)
+        """
+        with self._lock:
+            # cópia: outra thread pode acrescentar blocos durante a leitura
+            state = self.update()
+            col = state["ts_column"]
+            blocks = list(state["blocks"])
+            size = state["size"]
+        if col is None:
+            return
+        lo = timestamp_key(start)
+        hi = timestamp_key(end)
+        with open(self.csv_path, 'rb') as f:
+            for i, (offset, _, first, last) in enumerate(blocks):
+                if first is None:
+                    continue
+                if (hi is not None and first >= hi) or (lo is not None and last < lo):
+                    continue
+                stop = blocks[i + 1][0] if i + 1 < len(blocks) else size
+                f.seek(offset)
+                data = f.read(stop - offset).decode('utf-8')
+                for row in csv.reader(io.StringIO(data, newline='')):
+                    ts = row[col] if len(row) > col else ""
+                    if ts and (lo is None or ts >= lo) and (hi is None or ts < hi):
+                        yield row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m app.trip_index",
+        description="Lista as viagens de um período usando o índice por data do trips.csv.",
+    )
+    parser.add_argument("csv_path", nargs="?", default="data/trips.csv", help="caminho do trips.csv")
+    parser.add_argument("--from", dest="start", help="início do período (AAAA-MM-DD)")
+    parser.add_argument("--to", dest="end", help="fim do período, exclusivo (AAAA-MM-DD)")
+    parser.add_argument("--rebuild", action="store_true", help="reconstrói o índice antes da consulta")
+    args = parser.parse_args(argv)
+
+    index = TripDateIndex(args.csv_path)
+    if args.rebuild:
+        index.rebuild()
+    writer = csv.writer(sys.stdout)
+    header = index.update()["header"]
+    if header:
+        writer.writerow(next(csv.reader([header])))
+    writer.writerows(index.trips_between(args.start, args.end))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Gravação segura de viagens no data/trips.csv, compartilhado entre processos.
+
+Cada gravação trava o arquivo <csv>.lock, então duas instâncias do Mileage
+Tracker usando o mesmo volume data/ não disputam o cabeçalho nem intercalam
+linhas pela metade. Linhas enviadas ao mesmo tempo por várias threads são
+gravadas juntas (group commit): um único write e um único fsync por lote.
+
+Se um processo morrer no meio de uma gravação, a linha incompleta que ficou
+no fim do arquivo é removida antes da próxima gravação.
+"""
+import csv
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# sem tradução de quebras de linha no Windows
+_BINARY = getattr(os, "O_BINARY", 0)
+
+
+def _lock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _read_at(fd, size, offset):
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def encode_row(row):
+    """Linha do CSV em bytes, exatamente como o csv.writer a grava no arquivo."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue().encode("utf-8")
+
+
+class _Ticket:
+    __slots__ = ("data", "rows", "done", "error")
+
+    def __init__(self, data, rows):
+        self.data = data
+        self.rows = rows
+        self.done = False
+        self.error = None
+
+
+class TripLog:
+    """
+    Acrescenta viagens a um CSV com trava entre processos, fsync por lote e
+    recuperação de linhas incompletas. Seguro para uso a partir de várias
+    threads: quem chega enquanto um lote é gravado entra no lote seguinte.
+    """
+
+    # Tamanho do trecho lido do fim do arquivo ao procurar a última linha completa
+    RECOVERY_CHUNK = 8192
+
+    def __init__(self, csv_path, header, sync=True):
+        """
+        Args:
+            csv_path (str): Caminho do trips.csv
+            header (list[str]): Cabeçalho gravado quando o arquivo está vazio
+            sync (bool): Chama fsync a cada lote (desligar só em testes/benchmarks)
+        """
+        self.csv_path = csv_path
+        self.header = list(header)
+        self.sync = sync
+        self.rows = 0
+        self.batches = 0
+        self.recovered_bytes = 0
+        self._pending = []
+        self._flushing = False
+        self._cond = threading.Condition()
+
+        directory = os.path.dirname(csv_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock_fd = os.open(csv_path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+
+    def append(self, row):
+        """
+        Grava uma viagem e só retorna depois que ela está no disco.
+
+        Raises:
+            OSError: Falha ao gravar o lote em que a viagem entrou
+        """
+        self.append_many([row])
+
+    def append_many(self, rows):
+        """Grava várias viagens no mesmo lote."""
+        rows = list(rows)
+        ticket = _Ticket(b"".join(encode_row(row) for row in rows), len(rows))
+        with self._cond:
+            self._pending.append(ticket)
+            while not ticket.done:
+                if self._flushing:
+                    self._cond.wait()
+                    continue
+                # nenhum lote em andamento: esta thread grava tudo o que está na fila
+                self._flushing = True
+                batch, self._pending = self._pending, []
+                self._cond.release()
+                try:
+                    error = None
+                    try:
+                        self._commit(b"".join(t.data for t in batch))
+                    except BaseException as e:
+                        error = e
+                finally:
+                    self._cond.acquire()
+                    self._flushing = False
+                    for t in batch:
+                        t.done = True
+                        t.error = error
+                    if error is None:
+                        self.rows += sum(t.rows for t in batch)
+                        self.batches += 1
+                    self._cond.notify_all()
+        if ticket.error is not None:
+            raise ticket.error
+
+    def _commit(self, data):
+        _lock(self._lock_fd)
+        try:
+            fd = os.open(self.csv_path, os.O_RDWR | os.O_APPEND | os.O_CREAT | _BINARY, 0o644)
+            try:
+                size = self._recover(fd)
+                if size == 0:
+                    data = encode_row(self.header) + data
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                if self.sync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            if size == 0 and self.sync:
+                self._sync_directory()
+        finally:
+            _unlock(self._lock_fd)
+
+    def _recover(self, fd):
+        """
+        Remove a linha incompleta no fim do arquivo (gravação interrompida).
+        Precisa da trava. Retorna o tamanho do arquivo depois da limpeza.
+        """
+        size = os.fstat(fd).st_size
+        if size == 0 or _read_at(fd, 1, size - 1) == b"\n":
+            return size
+        end = size
+        while end > 0:
+            start = max(0, end - self.RECOVERY_CHUNK)
+            newline = _read_at(fd, end - start, start).rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        os.ftruncate(fd, end)
+        self.recovered_bytes += size - end
+        return end
+
+    def recover(self):
+        """
+        Remove uma linha incompleta deixada no fim do CSV por um processo
+        interrompido (também é feito antes de cada lote).
+
+        Returns:
+            int: Bytes removidos
+        """
+        if not os.path.exists(self.csv_path):
+            return 0
+        before = self.recovered_bytes
+        _lock(self._lock_fd)
+        try:
+            fd = os.open(self.csv_path, os.O_RDWR | _BINARY)
+            try:
+                self._recover(fd)
+            finally:
+                os.close(fd)
+        finally:
+            _unlock(self._lock_fd)
+        return self.recovered_bytes - before
+
+    @contextmanager
+    def locked(self):
+        """
+        Segura a trava do CSV durante o bloco `with` (para regravar o arquivo
+        sem que outra instância acrescente viagens no meio).
+        """
+        with self._cond:
+            _lock(self._lock_fd)
+            try:
+                yield
+            finally:
+                _unlock(self._lock_fd)
+
+    def _sync_directory(self):
+        # a entrada do arquivo recém-criado também precisa chegar ao disco
+        if os.name != "posix":
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.csv_path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def stats(self):
+        """
+        Retorna os contadores de gravação.
+
+        Returns:
+            dict: {'rows': int, 'batches': int, 'rows_per_batch': float,
+                   'recovered_bytes': int}
+        """
+        with self._cond:
+            return {
+                'rows': self.rows,
+                'batches': self.batches,
+                'rows_per_batch': self.rows / self.batches if self.batches else 0.0,
+                'recovered_bytes': self.recovered_bytes,
+            }
+
+    def close(self):
+        with self._cond:
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
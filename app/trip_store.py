@@ -0,0 +1,321 @@
+import csv
+import json
+import os
+from array import array
+from decimal import Decimal
+
+from app.trip_index import TIMESTAMP_FIELD
+
+# Campos de uma viagem, na ordem do data/trips.csv
+TRIP_FIELDS = [
+    "origin",
+    "destination",
+    "start_odometer",
+    "end_odometer",
+    "distance",
+    "tolls",
+    "parking",
+    "km_expense",
+    "total_expense",
+]
+
+# Colunas numéricas: nome -> casas decimais (guardadas como inteiros escalados)
+NUMERIC_SCALES = {
+    "start_odometer": 1,
+    "end_odometer": 1,
+    "distance": 1,
+    "tolls": 2,
+    "parking": 2,
+    "km_expense": 2,
+    "total_expense": 2,
+}
+
+# Colunas de endereço: guardam o id do texto na tabela de strings
+ADDRESS_FIELDS = ("origin", "destination")
+
+# Colunas do armazenamento: as do trips.csv, incluindo a data/hora (inteiro
+# AAAAMMDD ou AAAAMMDDhhmmss, 0 quando vazia)
+STORE_FIELDS = TRIP_FIELDS + [TIMESTAMP_FIELD]
+
+
+def to_fixed(text, scale):
+    """
+    Converte o texto de um número com até scale casas decimais no inteiro
+    escalado correspondente, garantindo que a volta (from_fixed) devolve
+    exatamente o mesmo texto.
+    """
+    text = text.strip()
+    whole, _, frac = text.partition('.')
+    if len(frac) > scale:
+        raise ValueError(f"'{text}' tem mais de {scale} casas decimais")
+    value = int(whole + frac.ljust(scale, '0'))
+    if from_fixed(value, scale) != text:
+        raise ValueError(f"'{text}' não está no formato com {scale} casas decimais")
+    return value
+
+
+def from_fixed(value, scale):
+    sign = '-' if value < 0 else ''
+    whole, frac = divmod(abs(value), 10 ** scale)
+    return f"{sign}{whole}.{frac:0{scale}d}"
+
+
+def to_timestamp(text):
+    """
+    Converte o texto ISO da coluna timestamp ("2024-03-01" ou
+    "2024-03-01T08:30:00") no inteiro 20240301 ou 20240301083000 (vazio
+    vira 0), garantindo que a volta (from_timestamp) devolve exatamente o
+    mesmo texto. Os inteiros ficam na mesma ordem das datas.
+    """
+    text = text.strip()
+    if not text:
+        return 0
+    digits = text.replace('-', '').replace('T', '').replace(':', '')
+    if len(digits) not in (8, 14) or not digits.isascii() or not digits.isdigit():
+        raise ValueError(f"'{text}' não é uma data AAAA-MM-DD ou AAAA-MM-DDThh:mm:ss")
+    value = int(digits)
+    if from_timestamp(value) != text:
+        raise ValueError(f"'{text}' não é uma data AAAA-MM-DD ou AAAA-MM-DDThh:mm:ss")
+    return value
+
+
+def from_timestamp(value):
+    if not value:
+        return ""
+    digits = str(value)
+    day = f"{digits[:4]}-{digits[4:6]}-{digits[6:8]}"
+    if len(digits) == 8:
+        return day
+    return f"{day}T{digits[8:10]}:{digits[10:12]}:{digits[12:14]}"
+
+
+class ColumnarTripStore:
+    """
+    Armazenamento opcional das viagens em colunas binárias de largura fixa,
+    mantido ao lado do data/trips.csv (que continua sendo o registro oficial).
+
+    Cada coluna é um arquivo próprio com inteiros de 8 bytes (valores em
+    décimos de km ou centavos, datas como AAAAMMDD[hhmmss]); os endereços
+    ficam numa tabela de strings internadas e as colunas guardam apenas o id. Gravações são só de
+    acréscimo (append), e somar uma coluna não exige converter texto.
+    """
+
+    STRINGS_FILE = "strings.jsonl"
+
+    def __init__(self, directory):
+        """
+        Abre (ou cria) o armazenamento e descarta restos de uma gravação
+        interrompida (colunas com tamanhos diferentes).
+
+        Args:
+            directory (str): Pasta do armazenamento (ex.: data/trips_store)
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._strings = []
+        self._string_ids = {}
+        self._load_strings()
+        self._recover()
+
+    def _column_path(self, name):
+        return os.path.join(self.directory, f"{name}.i64")
+
+    def _load_strings(self):
+        path = os.path.join(self.directory, self.STRINGS_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            # última linha incompleta (gravação interrompida): descarta
+            with open(path, 'r+b') as f:
+                f.truncate(complete)
+        for line in data[:complete].splitlines():
+            text = json.loads(line)
+            self._string_ids[text] = len(self._strings)
+            self._strings.append(text)
+
+    def _size(self, name):
+        path = self._column_path(name)
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def _recover(self):
+        timestamp_path = self._column_path(TIMESTAMP_FIELD)
+        if not os.path.exists(timestamp_path):
+            # armazenamento anterior à coluna timestamp: viagens sem data
+            with open(timestamp_path, 'wb') as f:
+                f.write(bytes(8 * min(self._size(name) for name in TRIP_FIELDS)))
+        sizes = [self._size(name) for name in STORE_FIELDS]
+        self._rows = min(sizes)
+        for name, size in zip(STORE_FIELDS, sizes):
+            path = self._column_path(name)
+            if size > self._rows or (os.path.exists(path) and os.path.getsize(path) % 8):
+                with open(path, 'r+b') as f:
+                    f.truncate(self._rows * 8)
+
+    def __len__(self):
+        return self._rows
+
+    def _intern(self, text, new_strings):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._string_ids[text] = string_id
+            self._strings.append(text)
+            new_strings.append(text)
+        return string_id
+
+    def append(self, row):
+        """
+        Acrescenta uma viagem (mesmos campos/textos de uma linha do trips.csv;
+        linhas sem o timestamp, do formato antigo, ficam sem data).
+        """
+        self.append_many([row])
+
+    def append_many(self, rows):
+        """
+        Acrescenta várias viagens de uma vez.
+
+        Raises:
+            ValueError: Linha com quantidade de campos errada ou número fora do formato
+        """
+        columns = {name: array('q') for name in STORE_FIELDS}
+        new_strings = []
+        try:
+            for row in rows:
+                if len(row) == len(TRIP_FIELDS):
+                    row = [*row, ""]
+                elif len(row) != len(STORE_FIELDS):
+                    raise ValueError(
+                        f"Linha com {len(row)} campos; esperado {len(STORE_FIELDS)}"
+                    )
+                for name, value in zip(STORE_FIELDS, row):
+                    if name == TIMESTAMP_FIELD:
+                        columns[name].append(to_timestamp(value))
+                    elif name in NUMERIC_SCALES:
+                        columns[name].append(to_fixed(value, NUMERIC_SCALES[name]))
+                    else:
+                        columns[name].append(self._intern(value, new_strings))
+        except ValueError:
+            # nada foi gravado: desfaz os endereços internados neste lote
+            for text in new_strings:
+                del self._string_ids[text]
+            del self._strings[len(self._strings) - len(new_strings):]
+            raise
+
+        if new_strings:
+            with open(os.path.join(self.directory, self.STRINGS_FILE), 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(s, ensure_ascii=False) + "\n" for s in new_strings)
+        for name in STORE_FIELDS:
+            with open(self._column_path(name), 'ab') as f:
+                columns[name].tofile(f)
+        self._rows += len(columns[STORE_FIELDS[0]])
+
+    def column(self, name):
+        """
+        Lê uma coluna inteira como array de inteiros (escalados, ids de
+        endereço para origin/destination, ou AAAAMMDD[hhmmss] para timestamp).
+        """
+        values = array('q')
+        if self._rows:
+            with open(self._column_path(name), 'rb') as f:
+                values.fromfile(f, self._rows)
+        return values
+
+    def address(self, string_id):
+        return self._strings[string_id]
+
+    def totals(self, columns=None):
+        """
+        Soma exata (Decimal) das colunas numéricas.
+
+        Returns:
+            dict: nome da coluna -> Decimal
+        """
+        columns = columns or [n for n in TRIP_FIELDS if n in NUMERIC_SCALES]
+        return {
+            name: Decimal(sum(self.column(name))).scaleb(-NUMERIC_SCALES[name])
+            for name in columns
+        }
+
+    def group_totals(self, key, columns=None):
+        """
+        Soma exata das colunas numéricas agrupadas por origin ou destination.
+
+        Returns:
+            dict: endereço -> {coluna: Decimal}
+        """
+        if key not in ADDRESS_FIELDS:
+            raise ValueError(f"Agrupamento inválido: {key}")
+        columns = columns or [n for n in TRIP_FIELDS if n in NUMERIC_SCALES]
+        keys = self.column(key)
+        sums = {}
+        for name in columns:
+            acc = {}
+            for k, v in zip(keys, self.column(name)):
+                acc[k] = acc.get(k, 0) + v
+            for k, total in acc.items():
+                sums.setdefault(k, {})[name] = Decimal(total).scaleb(-NUMERIC_SCALES[name])
+        return {self._strings[k]: values for k, values in sums.items()}
+
+    def rows(self):
+        """
+        Percorre as viagens como listas de texto, iguais às linhas do CSV.
+        """
+        columns = [self.column(name) for name in STORE_FIELDS]
+        for values in zip(*columns):
+            yield [
+                from_timestamp(v) if name == TIMESTAMP_FIELD
+                else from_fixed(v, NUMERIC_SCALES[name]) if name in NUMERIC_SCALES
+                else self._strings[v]
+                for name, v in zip(STORE_FIELDS, values)
+            ]
+
+    def import_csv(self, csv_path, batch_size=10_000):
+        """
+        Acrescenta todas as viagens de um trips.csv ao armazenamento.
+
+        Returns:
+            int: Quantidade de viagens importadas
+        """
+        count = 0
+        batch = []
+        picks = None
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for line_no, row in enumerate(csv.reader(f), start=1):
+                if line_no == 1 and set(TRIP_FIELDS) <= set(row):
+                    # cabeçalho: colunas desconhecidas são ignoradas, e um
+                    # CSV sem timestamp gera viagens sem data
+                    fields = [name for name in STORE_FIELDS if name in row]
+                    if row != fields:
+                        picks = [row.index(name) for name in fields]
+                    continue
+                if picks is not None and len(row) > max(picks):
+                    # linhas curtas seguem como estão e são rejeitadas em append_many
+                    row = [row[i] for i in picks]
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    count += self._import_batch(batch, line_no)
+                    batch = []
+            if batch:
+                count += self._import_batch(batch, line_no)
+        return count
+
+    def _import_batch(self, batch, last_line):
+        try:
+            self.append_many(batch)
+        except ValueError as e:
+            raise ValueError(
+                f"Erro ao importar CSV (linhas até {last_line}): {e}"
+            )
+        return len(batch)
+
+    def export_csv(self, csv_path):
+        """
+        Gera um trips.csv (com cabeçalho) a partir do armazenamento.
+        """
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(STORE_FIELDS)
+            writer.writerows(self.rows())
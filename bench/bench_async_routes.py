@@ -0,0 +1,158 @@
+"""
+Benchmark: distâncias de muitos pares pela Routes API, uma requisição por vez
+(como get_distance_from_gmaps) vs. o cliente asyncio (app/async_routes.py).
+
+A API é um servidor local (asyncio) que espera --latency segundos antes de
+responder cada computeRoutes. Parte dos pares se repete, como num lote real
+de viagens; pares iguais em andamento dividem uma só requisição.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_async_routes.py
+    python3 bench/bench_async_routes.py --pairs 1000 --latency 0.1 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.async_routes import AsyncRoutesResolver  # noqa: E402
+from app.routes_client import RoutesClient, distance_from_route, route_request  # noqa: E402
+
+
+def fake_distance(origin, dest):
+    return 1000 + 37 * len(origin) + 101 * len(dest)
+
+
+class FakeRoutesAPI:
+    """computeRoutes falso com latência, num event loop em outra thread."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.writers = set()
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self.thread.start()
+        ready.wait()
+        self.url = f"http://127.0.0.1:{self.port}/directions/v2:computeRoutes"
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=1024)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        ready.set()
+        self.loop.run_forever()
+
+    async def _handle(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                request = json.loads(await reader.readexactly(length))
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+                meters = fake_distance(request["origin"]["address"], request["destination"]["address"])
+                body = json.dumps({"routes": [{"distanceMeters": meters}]}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def _shutdown(self):
+        # fecha as conexões keep-alive; cada _handle termina ao ler o fim
+        self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=1)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+
+def make_pairs(n, distinct, seed=42):
+    rnd = random.Random(seed)
+    unique = [(f"Rua {i}, São Paulo", f"Av. {rnd.randrange(10 ** 6)}, Campinas") for i in range(distinct)]
+    return [unique[i] if i < distinct else rnd.choice(unique) for i in range(n)]
+
+
+def run_sequential(url, pairs):
+    # o que get_distance_from_gmaps faz, viagem a viagem
+    client = RoutesClient(timeout=10)
+    t0 = time.perf_counter()
+    for origin, dest in pairs:
+        headers, body = route_request("bench", origin, dest)
+        assert distance_from_route(client.post(url, headers=headers, json=body).json()) > 0
+    elapsed = time.perf_counter() - t0
+    client.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=1000)
+    parser.add_argument("--distinct", type=float, default=0.8, help="fração de pares distintos")
+    parser.add_argument("--latency", type=float, default=0.1, help="espera da API simulada por requisição (s)")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--sequential-sample", type=int, default=30,
+                        help="pares consultados um a um (o total é extrapolado)")
+    args = parser.parse_args()
+
+    api = FakeRoutesAPI(args.latency)
+    try:
+        pairs = make_pairs(args.pairs, max(1, int(args.pairs * args.distinct)))
+        sample = pairs[:args.sequential_sample]
+        t_sample = run_sequential(api.url, sample)
+        t_seq = t_sample / len(sample) * len(pairs)
+
+        resolver = AsyncRoutesResolver("bench", url=api.url, max_concurrency=args.concurrency)
+        before = api.requests
+        t0 = time.perf_counter()
+        distances, errors = resolver.resolve(pairs)
+        t_async = time.perf_counter() - t0
+        assert not any(errors), errors[:3]
+        assert distances == [fake_distance(o, d) / 1000.0 for o, d in pairs]
+        stats = resolver.last_stats
+    finally:
+        api.close()
+
+    print(f"{len(pairs)} pares ({len(set(pairs))} distintos), API simulada {args.latency * 1000:.0f} ms/requisição")
+    print(f"  um por vez (requests):  {t_seq:7.2f} s  (extrapolado de {len(sample)} pares)")
+    print(f"  asyncio, {args.concurrency:>3} simultâneas: {t_async:7.2f} s  ({t_seq / t_async:.0f}x, "
+          f"{t_async / args.latency:.1f} latências de ida e volta)")
+    print(f"  requisições: {api.requests - before} ({stats['coalesced']} pares divididos), "
+          f"conexões: {stats['connections']}, pico simultâneo: {stats['max_in_flight']}, "
+          f"latência p50 {stats['latency_p50'] * 1000:.0f} ms / p95 {stats['latency_p95'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
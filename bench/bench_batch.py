@@ -0,0 +1,63 @@
+"""
+Benchmark: ExpenseCalculator.calculate_batch vs. laço com calculate_total_expense.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_batch.py
+    python3 bench/bench_batch.py --sizes 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.expense import ExpenseCalculator  # noqa: E402
+
+
+def make_trips(n, seed=42):
+    rnd = random.Random(seed)
+    distances = [round(rnd.uniform(0, 800), 1) for _ in range(n)]
+    tolls = [round(rnd.uniform(0, 60), 2) if rnd.random() < 0.4 else 0 for _ in range(n)]
+    parking = [round(rnd.uniform(0, 40), 2) if rnd.random() < 0.3 else 0 for _ in range(n)]
+    return distances, tolls, parking
+
+
+def run(n):
+    calc = ExpenseCalculator(km_rate=0.50)
+    distances, tolls, parking = make_trips(n)
+
+    t0 = time.perf_counter()
+    loop_totals = [
+        calc.calculate_total_expense(d, t, p)['total']
+        for d, t, p in zip(distances, tolls, parking)
+    ]
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = calc.calculate_batch(distances, tolls, parking)
+    t_batch = time.perf_counter() - t0
+
+    if batch['total'] != loop_totals:
+        raise SystemExit(f"Divergência entre laço e lote para n={n}")
+
+    print(
+        f"{n:>9} viagens | laço: {t_loop:8.3f} s | lote: {t_batch:8.3f} s | "
+        f"ganho: {t_loop / t_batch:5.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+        help="quantidades de viagens a medir",
+    )
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: importação em massa (app/importer.py) com a Routes API simulada.
+
+Compara o pipeline (etapas em threads ligadas por filas) com as mesmas etapas
+feitas uma depois da outra, lote a lote, como no modo em lote (cli). A API é
+um resolvedor falso que espera --latency segundos por lote, como uma chamada
+ao computeRouteMatrix.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_importer.py
+    python3 bench/bench_importer.py --rows 100000 --latency 0.2 --batch-size 2000
+"""
+import argparse
+import csv
+import filecmp
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.cli import price_trips  # noqa: E402
+from app.expense import ExpenseCalculator  # noqa: E402
+from app.importer import CSV_HEADER, RejectWriter, TripImporter, normalize_record, read_csv  # noqa: E402
+from app.trip_log import TripLog  # noqa: E402
+
+
+class StubResolver:
+    """Resolvedor falso: uma espera de `latency` por lote, distância pelo tamanho dos endereços."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def resolve(self, pairs):
+        time.sleep(self.latency)
+        return [len(o) + len(d) / 10 for o, d in pairs], [None] * len(pairs)
+
+
+class LogWriter:
+    """TripWriter do cli gravando no TripLog, um lote por fsync."""
+
+    def __init__(self, log, batch_size):
+        self.log = log
+        self.batch_size = batch_size
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.log.append_many(self.rows)
+            self.rows = []
+
+
+def write_input(path, n, invalid=0.01, seed=42):
+    """Planilha exportada com ';' e vírgula decimal, com ~1% de linhas inválidas."""
+    rnd = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Origem", "Destino", "KM inicial", "KM final", "Pedágio", "Estacionamento", "Data"])
+        for i in range(n):
+            start = rnd.randint(0, 100000)
+            end = start + rnd.randint(1, 800) / 10
+            if rnd.random() < invalid:
+                end = start - 1
+            writer.writerow([
+                f"Rua {rnd.randrange(500)}, São Paulo", f"Av. {rnd.randrange(500)}, Campinas",
+                str(start), f"{end:.1f}".replace(".", ","), f"{rnd.choice([0, 5.5, 12.3]):.2f}".replace(".", ","),
+                "0", f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T08:00:00",
+            ])
+
+
+def run_sequential(input_path, csv_path, args):
+    log = TripLog(csv_path, CSV_HEADER, sync=not args.no_sync)
+    writer = LogWriter(log, args.batch_size)
+    with open(os.devnull, "w") as errors, open(input_path, newline="", encoding="utf-8") as source:
+        t0 = time.perf_counter()
+        written, rejected = price_trips(
+            ((n, normalize_record(r)) for n, r in read_csv(source)), writer,
+            ExpenseCalculator(), StubResolver(args.latency), args.batch_size, errors=errors,
+        )
+        writer.flush()
+        elapsed = time.perf_counter() - t0
+    log.close()
+    return written, rejected, elapsed
+
+
+def run_pipeline(input_path, csv_path, rejects_path, args):
+    importer = TripImporter(
+        csv_path, resolver=StubResolver(args.latency), batch_size=args.batch_size, sync=not args.no_sync
+    )
+    rejects = RejectWriter(rejects_path)
+    try:
+        with open(input_path, newline="", encoding="utf-8") as source:
+            stats = importer.run(read_csv(source), rejects)
+    finally:
+        rejects.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.2, help="espera da API simulada por lote (s)")
+    parser.add_argument("--no-sync", action="store_true", help="sem fsync por lote")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "entrada.csv")
+        write_input(input_path, args.rows)
+
+        written, rejected, t_seq = run_sequential(input_path, os.path.join(tmp, "seq.csv"), args)
+        stats = run_pipeline(input_path, os.path.join(tmp, "pipe.csv"), os.path.join(tmp, "rej.jsonl"), args)
+        assert stats['imported'] == written and stats['rejected'] == rejected
+        # mesmas viagens, na mesma ordem da entrada
+        assert filecmp.cmp(os.path.join(tmp, "seq.csv"), os.path.join(tmp, "pipe.csv"), shallow=False)
+
+    t_pipe = stats['elapsed']
+    print(f"{args.rows:,} registros ({rejected} rejeitados), lotes de {args.batch_size}, API simulada {args.latency * 1000:.0f} ms/lote")
+    print(f"  etapas em sequência: {t_seq:6.2f} s  {written / t_seq * 60:>12,.0f} viagens/min")
+    print(f"  pipeline:            {t_pipe:6.2f} s  {written / t_pipe * 60:>12,.0f} viagens/min ({t_seq / t_pipe:.1f}x)")
+    busy = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in stats['busy'].items())
+    print(f"  tempo ocupado por etapa: {busy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: cálculo em lote com taxa única vs. tabela de taxas por data/faixa
+(RateSchedule) com muitas versões.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_rate_schedule.py
+    python3 bench/bench_rate_schedule.py --trips 1000000 --versions 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.expense import ExpenseCalculator, RateSchedule  # noqa: E402
+
+
+def make_schedule(versions, start):
+    entries = []
+    for v in range(versions):
+        effective = start + timedelta(days=30 * v)
+        base = 0.45 + v * 0.005
+        entries += [
+            (effective, 0, round(base, 3)),
+            (effective, 100, round(base - 0.05, 3)),
+            (effective, 500, round(base - 0.10, 3)),
+        ]
+    return RateSchedule(entries)
+
+
+def timed(calculator, distances, tolls, parking, dates):
+    t0 = time.perf_counter()
+    calculator.calculate_batch(distances, tolls, parking, centavos=True, dates=dates)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trips", type=int, default=1_000_000)
+    parser.add_argument("--versions", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5, help="repetições (vale a melhor)")
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    start = date(2022, 1, 1)
+    span = 30 * args.versions
+    distances = [round(rnd.uniform(0, 900), 1) for _ in range(args.trips)]
+    tolls = [0] * args.trips
+    parking = [0] * args.trips
+    dates = [(start + timedelta(days=rnd.randrange(span))).isoformat() for _ in range(args.trips)]
+
+    single = ExpenseCalculator(km_rate=0.50)
+    scheduled = ExpenseCalculator(schedule=make_schedule(args.versions, start))
+
+    # execuções intercaladas, para que ruído da máquina afete os dois lados
+    t_single = t_sched = float("inf")
+    for _ in range(args.repeat):
+        t_single = min(t_single, timed(single, distances, tolls, parking, None))
+        t_sched = min(t_sched, timed(scheduled, distances, tolls, parking, dates))
+    print(
+        f"{args.trips} viagens | taxa única: {t_single:6.2f} s | "
+        f"tabela ({args.versions} versões x 3 faixas): {t_sched:6.2f} s | "
+        f"diferença: {(t_sched / t_single - 1) * 100:+5.1f}%"
+    )
+
+
+if __name__ == "__main__":
+    main()
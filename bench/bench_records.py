@@ -0,0 +1,109 @@
+"""
+Benchmark: memória de 1M viagens como dicts vs. registros Trip/Expense
+(__slots__), e o custo de calcular + formatar o resumo de uma viagem.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_records.py
+    python3 bench/bench_records.py --count 200000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.expense import ExpenseCalculator  # noqa: E402
+from app.records import Expense, Trip, format_summary  # noqa: E402
+
+ORIGINS = [f"Rua {i}, São Paulo" for i in range(500)]
+DESTINATIONS = [f"Av. {i}, Campinas" for i in range(500)]
+
+
+def make_values(n, seed=42):
+    rnd = random.Random(seed)
+    for i in range(n):
+        start = float(rnd.randint(0, 100000))
+        distance = rnd.randint(1, 8000) / 10
+        yield (
+            ORIGINS[rnd.randrange(500)], DESTINATIONS[rnd.randrange(500)],
+            start, start + distance, distance, 5.5, 0.0, f"2024-01-01T08:{i % 60:02d}:00",
+        )
+
+
+def as_dicts(values):
+    # o formato de antes: dict da viagem (como o parse_trip devolvia) + dict das despesas
+    for origin, dest, start, end, distance, tolls, parking, timestamp in values:
+        km = round(distance * 0.5, 2)
+        yield (
+            {"origin": origin, "destination": dest, "start_odometer": start, "end_odometer": end,
+             "distance": distance, "tolls": tolls, "parking": parking, "timestamp": timestamp},
+            {"distance_km": distance, "km_expense": km, "tolls": tolls, "parking": parking,
+             "total": km + tolls + parking},
+        )
+
+
+def as_records(values):
+    for origin, dest, start, end, distance, tolls, parking, timestamp in values:
+        km = round(distance * 0.5, 2)
+        yield (
+            Trip(origin, dest, start, end, distance, tolls, parking, timestamp),
+            Expense(distance, km, tolls, parking, km + tolls + parking),
+        )
+
+
+def measure_memory(build, n):
+    gc.collect()
+    tracemalloc.start()
+    items = list(build(make_values(n)))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    gc.collect()
+    return current
+
+
+def measure_summary(number):
+    calculator = ExpenseCalculator(km_rate=0.50)
+    trip = Trip("A", "B", 100.0, 223.4, 123.4, 12.5, 8.0, "2024-01-01T08:00:00")
+
+    def old():
+        calculator.calculate_total_expense(trip.distance, trip.tolls, trip.parking, trip_date=trip.timestamp)
+        calculator.get_expense_summary(trip.distance, trip.tolls, trip.parking, trip_date=trip.timestamp)
+
+    def new():
+        format_summary(calculator.price_trip(trip))
+
+    times = {}
+    for name, fn in (("calcular + get_expense_summary", old), ("price_trip + format_summary", new)):
+        fn()
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times[name] = (time.perf_counter() - t0) / number
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000, help="viagens mantidas em memória")
+    parser.add_argument("--number", type=int, default=20000, help="repetições do resumo")
+    args = parser.parse_args()
+
+    dicts = measure_memory(as_dicts, args.count)
+    records = measure_memory(as_records, args.count)
+    print(f"{args.count:,} viagens em memória (endereços compartilhados)")
+    print(f"  dicts (viagem + despesas):  {dicts / 2**20:8.1f} MiB  {dicts / args.count:6.0f} B/viagem")
+    print(f"  Trip + Expense (__slots__): {records / 2**20:8.1f} MiB  {records / args.count:6.0f} B/viagem "
+          f"({1 - records / dicts:.0%} a menos)")
+
+    print("Resumo de uma viagem salva:")
+    for name, seconds in measure_summary(args.number).items():
+        print(f"  {name:<32} {seconds * 1e6:7.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
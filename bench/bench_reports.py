@@ -0,0 +1,75 @@
+"""
+Benchmark: relatórios agregados (app/reports.py) sobre trips.csv de vários tamanhos,
+para conferir que o tempo cresce de forma linear e a memória fica estável.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_reports.py
+    python3 bench/bench_reports.py --sizes 100000 1000000 10000000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.reports import GROUP_KEYS, aggregate, iter_trips  # noqa: E402
+from app.trip_store import TRIP_FIELDS  # noqa: E402
+
+
+def write_csv(path, n, seed=42):
+    rnd = random.Random(seed)
+    addresses = [f"Endereço {i}" for i in range(200)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(TRIP_FIELDS)
+        for _ in range(n):
+            distance = rnd.randint(1, 8000)
+            tolls = rnd.randint(0, 6000)
+            km = (distance * 5 + 5) // 10
+            writer.writerow([
+                rnd.choice(addresses), rnd.choice(addresses),
+                "0.0", f"{distance / 10:.1f}", f"{distance / 10:.1f}",
+                f"{tolls / 100:.2f}", "0.00", f"{km / 100:.2f}", f"{(km + tolls) / 100:.2f}",
+            ])
+
+
+def run(n, by):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trips.csv")
+        write_csv(path, n)
+
+        t0 = time.perf_counter()
+        groups = aggregate(iter_trips(path), GROUP_KEYS[by])
+        elapsed = time.perf_counter() - t0
+
+    # pico de memória residente do processo (KiB no Linux)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else 0.0
+    print(
+        f"{n:>10} viagens | {len(groups):>6} grupos | {elapsed:8.2f} s | "
+        f"{n / elapsed:>10,.0f} viagens/s | pico RSS: {rss:6.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000],
+        help="quantidades de viagens a medir",
+    )
+    parser.add_argument("--by", choices=sorted(GROUP_KEYS), default="route")
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n, args.by)
+
+
+if __name__ == "__main__":
+    main()
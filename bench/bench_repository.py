@@ -0,0 +1,121 @@
+"""
+Benchmark: repositório SQLite vs. CSV para as consultas do histórico.
+
+Monta um histórico de --rows viagens nos dois formatos e mede a gravação em
+lote, a gravação de uma viagem (como no finish_save) e "últimas 20 viagens
+para X" com destinos sorteados (no CSV, lendo o arquivo do fim para o
+começo até achar as 20).
+
+Uso (na raiz do projeto):
+    python3 bench/bench_repository.py                 # 10M viagens
+    python3 bench/bench_repository.py --rows 1000000 --queries 500
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.repository import CSV_HEADER, CsvTripRepository, SqliteTripRepository  # noqa: E402
+from app.trip_log import encode_row  # noqa: E402
+
+BATCH = 50_000
+
+
+def make_rows(n, destinations, seed=42):
+    rnd = random.Random(seed)
+    for i in range(n):
+        distance = rnd.randint(1, 8000) / 10
+        yield [
+            f"Rua {rnd.randrange(2000)}, São Paulo", destinations[rnd.randrange(len(destinations))],
+            "0.0", f"{distance:.1f}", f"{distance:.1f}", "0.00", "0.00",
+            f"{distance / 2:.2f}", f"{distance / 2:.2f}",
+            f"{2015 + i * 10 // n:04d}-{i % 12 + 1:02d}-{i % 28 + 1:02d}T08:00:00",
+        ]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def time_queries(repository, destinations, n, rnd):
+    times = []
+    for _ in range(n):
+        destination = destinations[rnd.randrange(len(destinations))]
+        t0 = time.perf_counter()
+        rows = repository.recent(20, destination=destination)
+        times.append(time.perf_counter() - t0)
+        assert rows and all(row[1] == destination for row in rows)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--destinations", type=int, default=5000, help="destinos distintos no histórico")
+    parser.add_argument("--queries", type=int, default=1000, help="consultas ao SQLite")
+    parser.add_argument("--csv-queries", type=int, default=20, help="consultas ao CSV (lentas)")
+    args = parser.parse_args()
+    destinations = [f"Av. {i}, Campinas" for i in range(args.destinations)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "trips.csv")
+        sqlite = SqliteTripRepository(os.path.join(tmp, "trips.sqlite3"), csv_path=csv_path)
+
+        t0 = time.perf_counter()
+        batch = []
+        with open(csv_path, "wb") as f:
+            f.write(encode_row(CSV_HEADER))
+            for row in make_rows(args.rows, destinations):
+                batch.append(row)
+                if len(batch) >= BATCH:
+                    f.write(b"".join(encode_row(r) for r in batch))
+                    sqlite.append_many(batch)
+                    batch = []
+            if batch:
+                f.write(b"".join(encode_row(r) for r in batch))
+                sqlite.append_many(batch)
+        t_build = time.perf_counter() - t0
+        print(f"{args.rows:,} viagens ({args.destinations} destinos) gravadas em {t_build:.1f} s "
+              f"({args.rows / t_build:,.0f} viagens/s no SQLite + CSV, lotes de {BATCH:,})")
+
+        csv_repo = CsvTripRepository(csv_path)
+        new_row = next(make_rows(1, destinations, seed=7))
+        print("Gravar 1 viagem (como no finish_save):")
+        for name, repository in (("SQLite", sqlite), ("CSV (TripLog + índice)", csv_repo)):
+            times = []
+            for _ in range(20):
+                t0 = time.perf_counter()
+                repository.append(new_row)
+                times.append(time.perf_counter() - t0)
+            print(f"  {name:<24} p50 {statistics.median(times) * 1000:8.2f} ms")
+
+        rnd = random.Random(1)
+        sqlite_times = time_queries(sqlite, destinations, args.queries, rnd)
+        csv_times = time_queries(csv_repo, destinations, args.csv_queries, rnd)
+        print("Últimas 20 viagens para um destino:")
+        for name, times in (("SQLite", sqlite_times), ("CSV", csv_times)):
+            print(f"  {name:<7} {len(times):>5} consultas | p50 {statistics.median(times) * 1000:9.3f} ms "
+                  f"| p99 {percentile(times, 0.99) * 1000:9.3f} ms")
+
+        source = sqlite.history()
+        t0 = time.perf_counter()
+        source.refresh()
+        source.rows(len(source) - 6, 6)
+        t_open = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        matches = source.set_filter("Av. 123,")
+        t_search = time.perf_counter() - t0
+        print(f"Lista de histórico no SQLite: abrir {t_open * 1000:.2f} ms, "
+              f"busca por endereço {t_search * 1000:.1f} ms ({matches:,} viagens)")
+        sqlite.close()
+        csv_repo.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark: reprecificação paralela (app/reprice.py) com 1, 2, 4, ... processos,
+para medir o ganho em relação a um único processo.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_reprice.py
+    python3 bench/bench_reprice.py --rows 5000000 --workers 1 8 16 32
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.reprice import reprice_file  # noqa: E402
+from bench_trip_store import write_csv  # noqa: E402
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, *[2 ** i for i in range(1, 6) if 2 ** i <= cpus], cpus})
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="viagens no CSV de teste")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trips.csv")
+        write_csv(path, args.rows)
+        baseline = None
+        reference = None
+        for workers in args.workers:
+            out = os.path.join(tmp, f"repriced-{workers}.csv")
+            t0 = time.perf_counter()
+            totals = reprice_file(path, out, 0.60, workers)
+            elapsed = time.perf_counter() - t0
+            if reference is None:
+                baseline, reference = elapsed, totals
+            elif totals != reference:
+                raise SystemExit(f"Totais divergentes com {workers} processos")
+            print(
+                f"{workers:>3} processos | {elapsed:7.2f} s | {args.rows / elapsed:>10,.0f} viagens/s | "
+                f"ganho: {baseline / elapsed:5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Teste de carga do serviço HTTP (app/server.py) em localhost.
+
+Abre várias conexões keep-alive e, durante --seconds, envia uma mistura de
+precificações, consultas ao histórico e gravações de viagens. Sem --url, o
+serviço é iniciado num processo separado com um diretório de dados temporário.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_server.py
+    python3 bench/bench_server.py --connections 64 --seconds 20 --mix price=60,history=30,submit=10
+    python3 bench/bench_server.py --url http://127.0.0.1:8080
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_request(kind, host, rnd):
+    if kind == "price":
+        body = json.dumps({"distance": rnd.randint(1, 500), "tolls": 5.5, "parking": 0})
+        return f"POST /price HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n{body}"
+    if kind == "submit":
+        start = rnd.randint(0, 100000)
+        body = json.dumps({
+            "origin": f"Rua {rnd.randrange(500)}, São Paulo",
+            "destination": f"Av. {rnd.randrange(500)}, Campinas",
+            "start_odometer": start,
+            "end_odometer": start + rnd.randint(1, 300),
+        })
+        data = body.encode("utf-8")
+        return f"POST /trips HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(data)}\r\n\r\n{body}"
+    return f"GET /trips?limit=20 HTTP/1.1\r\nHost: {host}\r\n\r\n"
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = int(re.search(rb"(?i)content-length:\s*(\d+)", head).group(1))
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, kinds, weights, deadline, latencies, errors, seed):
+    rnd = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind = rnd.choices(kinds, weights)[0]
+            t0 = time.perf_counter()
+            writer.write(build_request(kind, host, rnd).encode("utf-8"))
+            status = await read_response(reader)
+            latencies[kind].append(time.perf_counter() - t0)
+            if status >= 400:
+                errors[kind] += 1
+    finally:
+        writer.close()
+
+
+async def load(host, port, connections, seconds, mix):
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    latencies = {k: [] for k in kinds}
+    errors = {k: 0 for k in kinds}
+    deadline = time.perf_counter() + seconds
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, kinds, weights, deadline, latencies, errors, seed)
+        for seed in range(connections)
+    ))
+    return time.perf_counter() - t0, latencies, errors
+
+
+def start_server(data_dir):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--port", "0", "--data-dir", data_dir],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline()
+    match = re.search(r"http://([\d.]+):(\d+)", line)
+    if not match:
+        proc.kill()
+        raise RuntimeError(f"o serviço não iniciou: {line!r}")
+    return proc, match.group(1), int(match.group(2))
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("price", "history", "submit"):
+            raise argparse.ArgumentTypeError(f"tipo desconhecido: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="serviço já em execução (padrão: inicia um local)")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("price=70,history=20,submit=10"))
+    args = parser.parse_args()
+
+    proc = None
+    tmp = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        proc, host, port = start_server(tmp.name)
+    try:
+        elapsed, latencies, errors = asyncio.run(
+            load(host, port, args.connections, args.seconds, args.mix)
+        )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+            tmp.cleanup()
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{total} requisições em {elapsed:.1f} s com {args.connections} conexões: {total / elapsed:,.0f} req/s")
+    for kind, values in latencies.items():
+        if not values:
+            continue
+        values.sort()
+        p99 = values[min(len(values) - 1, int(0.99 * len(values)))]
+        print(
+            f"  {kind:<8} {len(values):>8} req | p50 {statistics.median(values) * 1000:6.2f} ms | "
+            f"p99 {p99 * 1000:6.2f} ms | erros {errors[kind]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark: tempo de abertura do MileageTracker com um histórico grande.
+
+Cada medição roda num processo novo (importações a frio), num diretório
+temporário com data/trips.csv de --rows viagens. Mede a importação de
+app.app, o construtor até a primeira pintura da janela e o tempo até o
+histórico e os totais, carregados em segundo plano, aparecerem. Para
+comparação, mede também o caminho antigo: importar requests e carregar
+histórico e totais antes de a janela aparecer.
+
+Sem display (Tk indisponível), mede a importação e a carga em segundo plano
+sem criar a janela.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_startup.py
+    python3 bench/bench_startup.py --rows 100000 --budget 0.5
+"""
+import time
+
+T0 = time.perf_counter()
+
+import argparse  # noqa: E402
+import csv  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_trips(path, n, header, seed=42):
+    rnd = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(n):
+            distance = rnd.randint(1, 8000) / 10
+            writer.writerow([
+                f"Rua {rnd.randrange(500)}, São Paulo", f"Av. {rnd.randrange(500)}, Campinas",
+                "0.0", f"{distance:.1f}", f"{distance:.1f}", "0.00", "0.00",
+                f"{distance / 2:.2f}", f"{distance / 2:.2f}", f"2024-{i % 12 + 1:02d}-01T08:00:00",
+            ])
+
+
+def child_main(mode):
+    """Roda no diretório temporário; imprime as medições em JSON."""
+    sys.path.insert(0, ROOT)
+    result = {}
+    from app import app as app_module
+    result["import"] = time.perf_counter() - T0
+
+    if mode == "legacy":
+        # o que o construtor fazia antes: requests importado e CSV lido antes da janela
+        t = time.perf_counter()
+        try:
+            import requests  # noqa: F401
+        except ImportError:
+            pass
+        from app.history_source import HistorySource
+        from app.running_totals import RunningTotals
+        csv_path = os.path.join(os.getcwd(), "data", "trips.csv")
+        source = HistorySource(csv_path)
+        source.build_index()
+        RunningTotals(csv_path).lifetime()
+        result["load"] = time.perf_counter() - t
+        result["first_paint"] = time.perf_counter() - T0
+        result["ready"] = result["first_paint"]
+        print(json.dumps(result))
+        return
+
+    try:
+        root = app_module.tk.Tk()
+    except app_module.tk.TclError:
+        root = None
+    if root is None:
+        # sem display: só a carga feita pela thread de start_background_load
+        from app.repository import open_repository
+        csv_path = os.path.join(os.getcwd(), "data", "trips.csv")
+        result["first_paint"] = None
+        t = time.perf_counter()
+        repository = open_repository(os.getenv("TRIPS_BACKEND", "csv"), csv_path)
+        repository.history().refresh()
+        repository.totals()
+        result["load"] = time.perf_counter() - t
+        result["ready"] = time.perf_counter() - T0
+        print(json.dumps(result))
+        return
+
+    tracker = app_module.MileageTracker(root)
+    root.update()
+    result["first_paint"] = time.perf_counter() - T0
+    while tracker._background_load is not None or tracker.totals_label.cget("text").endswith("..."):
+        root.update()
+        time.sleep(0.005)
+    result["ready"] = time.perf_counter() - T0
+    result["load"] = result["ready"] - result["first_paint"]
+    root.destroy()
+    print(json.dumps(result))
+
+
+def run_child(tmp, mode):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode],
+        cwd=tmp, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def format_time(seconds):
+    return f"{'-':>11}" if seconds is None else f"{seconds * 1000:8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="viagens no trips.csv")
+    parser.add_argument("--repeat", type=int, default=3, help="aberturas medidas de cada tipo")
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="tempo máximo (s) até a primeira pintura; sai com erro se estourar")
+    parser.add_argument("--child", choices=["current", "legacy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child_main(args.child)
+        return 0
+
+    sys.path.insert(0, ROOT)
+    from app.app import MileageTracker
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "data", "trips.csv")
+        os.makedirs(os.path.dirname(csv_path))
+        write_trips(csv_path, args.rows, MileageTracker.CSV_HEADER)
+
+        runs = {}
+        for label, mode, cold in [
+            ("legado, totais a frio", "legacy", True),
+            ("legado", "legacy", False),
+            ("atual, totais a frio", "current", True),
+            ("atual", "current", False),
+        ]:
+            best = None
+            for _ in range(args.repeat):
+                if cold and os.path.exists(csv_path + ".totals"):
+                    # sem o arquivo de totais: soma o CSV inteiro
+                    os.remove(csv_path + ".totals")
+                result = run_child(tmp, mode)
+                if best is None or result["ready"] < best["ready"]:
+                    best = result
+            runs[label] = best
+
+    print(f"{args.rows:,} viagens no trips.csv (melhor de {args.repeat} aberturas)")
+    print(f"  {'':<24} {'importação':>11} {'1ª pintura':>11} {'histórico pronto':>17}")
+    for label, r in runs.items():
+        print(f"  {label:<24} {format_time(r['import'])} {format_time(r['first_paint'])} "
+              f"{format_time(r['ready']):>17}")
+
+    paint = [r["first_paint"] for label, r in runs.items() if label.startswith("atual")]
+    if any(p is None for p in paint):
+        print("Sem display: a primeira pintura não foi medida (só importação e carga).")
+        paint = [r["import"] for label, r in runs.items() if label.startswith("atual")]
+    worst = max(paint)
+    if worst > args.budget:
+        print(f"Acima do orçamento: {worst:.3f} s > {args.budget:.3f} s")
+        return 1
+    print(f"Dentro do orçamento: {worst:.3f} s <= {args.budget:.3f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Suíte de benchmarks dos caminhos principais do salvamento de viagens:
+
+- ExpenseCalculator.calculate_total_expense e get_expense_summary (por chamada)
+- MileageTracker.load_existing com 1k, 100k e 1M viagens no CSV
+- acréscimo de viagens no CSV, como em finish_save (por viagem)
+- MileageTracker.get_distance_from_gmaps contra um servidor local com latência injetada
+
+Cada execução grava os resultados em bench/results/<commit>.json e compara
+com a execução anterior de outro commit (ou com --baseline), apontando as
+medições que pioraram mais que --threshold.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_suite.py
+    python3 bench/bench_suite.py --quick --only calculator
+    python3 bench/bench_suite.py --baseline bench/results/abc1234.json --check
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.app import MileageTracker  # noqa: E402
+from app.expense import ExpenseCalculator  # noqa: E402
+from app.metrics import Metrics  # noqa: E402
+from app.repository import CsvTripRepository  # noqa: E402
+from app.routes_client import RoutesClient  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+
+class HeadlessHistory:
+    """
+    Substitui o HistoryView (Tk) no load_existing: lê do HistorySource as
+    mesmas linhas que a lista mostraria, sem criar widgets.
+    """
+
+    def __init__(self, height):
+        self.source = None
+        self.height = height
+        self.visible = []
+
+    def set_source(self, source):
+        self.source = source
+
+    def refresh(self):
+        self.source.refresh()
+        total = len(self.source)
+        rows = self.source.rows(max(0, total - self.height), self.height)
+        self.visible = [" | ".join(row) for row in rows]
+
+
+def write_trips(path, n, seed=42):
+    rnd = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(MileageTracker.CSV_HEADER)
+        for i in range(n):
+            distance = rnd.randint(1, 8000) / 10
+            writer.writerow([
+                f"Rua {rnd.randrange(500)}, São Paulo", f"Av. {rnd.randrange(500)}, Campinas",
+                "0.0", f"{distance:.1f}", f"{distance:.1f}", "0.00", "0.00",
+                f"{distance / 2:.2f}", f"{distance / 2:.2f}", f"2024-01-01T08:{i % 60:02d}:00",
+            ])
+
+
+def wanted(args, name):
+    return not args.only or args.only in name
+
+
+def measure(fn, number, repeat):
+    """Executa fn number vezes por rodada; devolve o tempo por chamada de cada rodada."""
+    fn()  # aquecimento
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+    return times
+
+
+def bench_calculator(args, tmp):
+    calculator = ExpenseCalculator(km_rate=0.50)
+    yield "calculator.calculate_total_expense", 20000, lambda: calculator.calculate_total_expense(123.4, 12.5, 8.0)
+    yield "calculator.get_expense_summary", 20000, lambda: calculator.get_expense_summary(123.4, 12.5, 8.0)
+
+
+def bench_load_existing(args, tmp):
+    for size in args.sizes:
+        if not wanted(args, f"load_existing[{size}]"):
+            continue
+        path = os.path.join(tmp, f"trips_{size}.csv")
+        write_trips(path, size)
+
+        def load(path=path):
+            # abertura a frio, como na inicialização da janela (o índice do
+            # histórico inteiro é montado depois, em segundo plano)
+            tracker = SimpleNamespace(
+                csv_path=path,
+                repository=CsvTripRepository(path),
+                history=HeadlessHistory(MileageTracker.HISTORY_ROWS),
+                metrics=Metrics(enabled=False),
+                start_history_index=lambda source: None,
+            )
+            MileageTracker.load_existing(tracker)
+            assert tracker.history.visible
+            tracker.repository.close()
+
+        yield f"load_existing[{size}]", 1, load
+
+
+def bench_csv_append(args, tmp):
+    path = os.path.join(tmp, "append.csv")
+    write_trips(path, 1000)
+    row = [
+        "Rua 1, São Paulo", "Av. 2, Campinas", "100.0", "190.0", "90.0", "0.00", "0.00",
+        "45.00", "45.00", "2024-01-01T08:00:00",
+    ]
+
+    def append():
+        # mesmo padrão do finish_save: abre, acrescenta uma linha e fecha
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(row)
+
+    yield "csv_append", 2000, append
+
+
+class _RoutesStub(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        body = b'{"routes": [{"distanceMeters": 12345}]}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench_gmaps(args, tmp):
+    for latency_ms in args.latencies:
+        if not wanted(args, f"get_distance_from_gmaps[{latency_ms}ms]"):
+            continue
+        handler = type("Handler", (_RoutesStub,), {"latency": latency_ms / 1000})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        tracker = SimpleNamespace(
+            api_key="bench",
+            routes_url=f"http://127.0.0.1:{server.server_address[1]}/directions/v2:computeRoutes",
+            routes_client=RoutesClient(timeout=5),
+        )
+        try:
+            yield (
+                f"get_distance_from_gmaps[{latency_ms}ms]",
+                20,
+                lambda: MileageTracker.get_distance_from_gmaps(tracker, "Origem", "Destino"),
+            )
+        finally:
+            tracker.routes_client.close()
+            server.shutdown()
+            server.server_close()
+
+
+BENCHMARKS = [bench_calculator, bench_load_existing, bench_csv_append, bench_gmaps]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def previous_results(commit):
+    """Resultados mais recentes gravados por outro commit (ou None)."""
+    paths = [
+        p for p in glob.glob(os.path.join(RESULTS_DIR, "*.json"))
+        if os.path.basename(p) != f"{commit}.json"
+    ]
+    if not paths:
+        return None
+    with open(max(paths, key=os.path.getmtime), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def format_time(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="rodadas por medição (vale a mediana)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--latencies", type=int, nargs="+", default=[0, 20], help="latência do servidor local (ms)")
+    parser.add_argument("--quick", action="store_true", help="menos rodadas e CSVs de até 100k viagens")
+    parser.add_argument("--only", help="roda só as medições cujo nome contém este texto")
+    parser.add_argument("--baseline", help="JSON de resultados usado na comparação")
+    parser.add_argument("--threshold", type=float, default=0.25, help="piora relativa tolerada (0.25 = 25%%)")
+    parser.add_argument("--check", action="store_true", help="sai com código 1 se houver regressão")
+    parser.add_argument("--no-save", action="store_true", help="não grava os resultados")
+    args = parser.parse_args()
+    if args.quick:
+        args.repeat = min(args.repeat, 3)
+        args.sizes = [s for s in args.sizes if s <= 100_000]
+
+    commit = current_commit()
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    else:
+        baseline = previous_results(commit)
+    old = baseline["results"] if baseline else {}
+
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for bench in BENCHMARKS:
+            for name, number, fn in bench(args, tmp):
+                if not wanted(args, name):
+                    continue
+                times = measure(fn, number, args.repeat)
+                median = statistics.median(times)
+                results[name] = {"median": median, "min": min(times), "number": number, "repeat": args.repeat}
+                line = f"{name:<40} {format_time(median):>10} (mín. {format_time(min(times))})"
+                if name in old:
+                    change = median / old[name]["median"] - 1
+                    line += f"  {change:+.0%} vs. {baseline['commit']}"
+                    if change > args.threshold:
+                        regressions.append(name)
+                        line += "  << regressão"
+                print(line, flush=True)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{commit}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": commit,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2)
+        print(f"resultados gravados em {os.path.relpath(path, ROOT)}")
+    if regressions:
+        print(f"{len(regressions)} medição(ões) piorou(aram) mais de {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
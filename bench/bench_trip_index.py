@@ -0,0 +1,91 @@
+"""
+Benchmark: viagens de um mês pelo índice por data vs. leitura do trips.csv inteiro.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_trip_index.py
+    python3 bench/bench_trip_index.py --trips 1000000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.trip_index import TIMESTAMP_FIELD, TripDateIndex  # noqa: E402
+from app.trip_store import TRIP_FIELDS  # noqa: E402
+
+
+def write_csv(path, n, seed=42):
+    # n viagens espalhadas em ~3 anos, em ordem cronológica
+    rnd = random.Random(seed)
+    step = timedelta(days=3 * 365) / n
+    moment = datetime(2022, 1, 1, 8)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(TRIP_FIELDS + [TIMESTAMP_FIELD])
+        for i in range(n):
+            distance = rnd.randint(1, 8000)
+            writer.writerow([
+                f"Endereço {rnd.randrange(500)}", f"Endereço {rnd.randrange(500)}",
+                "0.0", f"{distance / 10:.1f}", f"{distance / 10:.1f}", "0.00", "0.00",
+                f"{distance / 20:.2f}", f"{distance / 20:.2f}",
+                (moment + step * i).isoformat(timespec="seconds"),
+            ])
+
+
+def full_scan(path, start, end):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return [row for row in reader if start <= row[TIMESTAMP_FIELD] < end]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trips", type=int, default=1_000_000)
+    parser.add_argument("--saves", type=int, default=200, help="gravações de uma viagem medidas")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trips.csv")
+        write_csv(path, args.trips)
+        start, end = "2023-03-01", "2023-04-01"
+
+        t0 = time.perf_counter()
+        index = TripDateIndex(path)
+        index.update()
+        t_build = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        indexed = list(index.trips_between(start, end))
+        t_index = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        scanned = full_scan(path, start, end)
+        t_scan = time.perf_counter() - t0
+
+        assert len(indexed) == len(scanned)
+
+        # uma viagem gravada por vez, como no app: custo de cada atualização
+        row = list(scanned[-1].values())
+        t0 = time.perf_counter()
+        for _ in range(args.saves):
+            with open(path, "a", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(row)
+            index.update()
+        t_save = (time.perf_counter() - t0) / args.saves
+
+        print(
+            f"{args.trips} viagens, {len(indexed)} em março/2023 | "
+            f"montar índice: {t_build:.2f} s | consulta indexada: {t_index * 1000:.1f} ms | "
+            f"leitura completa: {t_scan * 1000:.1f} ms | "
+            f"atualização por gravação: {t_save * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
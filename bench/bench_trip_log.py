@@ -0,0 +1,122 @@
+"""
+Benchmark: gravação concorrente no trips.csv com TripLog (trava + group
+commit) vs. abrir, acrescentar uma linha e dar fsync a cada viagem.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_trip_log.py
+    python3 bench/bench_trip_log.py --writers 16 --rows 200 --processes 4
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.app import MileageTracker  # noqa: E402
+from app.trip_log import TripLog  # noqa: E402
+
+
+def make_row(writer, i):
+    return [
+        f"Rua {writer}, {i}, São Paulo", "Av. Paulista, 1000, São Paulo", "100.0", "190.0",
+        "90.0", "0.00", "0.00", "45.00", "45.00", "2024-01-01T08:00:00",
+    ]
+
+
+def naive_append(path, row):
+    # o padrão antigo do finish_save, com fsync para ter a mesma durabilidade
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(row)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def run_threads(path, writers, rows, use_log):
+    log = TripLog(path, MileageTracker.CSV_HEADER) if use_log else None
+
+    def work(n):
+        for i in range(rows):
+            if log is not None:
+                log.append(make_row(n, i))
+            else:
+                naive_append(path, make_row(n, i))
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(writers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stats = log.stats() if log is not None else None
+    if log is not None:
+        log.close()
+    return elapsed, stats
+
+
+def process_worker(path, writers, rows):
+    run_threads(path, writers, rows, use_log=True)
+
+
+def run_processes(path, processes, writers, rows):
+    procs = [
+        multiprocessing.Process(target=process_worker, args=(path, writers, rows))
+        for p in range(processes)
+    ]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    return time.perf_counter() - t0
+
+
+def check(path, expected):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == MileageTracker.CSV_HEADER, "cabeçalho ausente ou repetido"
+    assert len(rows) == expected + 1, f"{len(rows) - 1} viagens, esperado {expected}"
+    assert all(len(r) == len(MileageTracker.CSV_HEADER) for r in rows[1:]), "linha corrompida"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8, help="threads gravando ao mesmo tempo")
+    parser.add_argument("--rows", type=int, default=100, help="viagens por thread")
+    parser.add_argument("--processes", type=int, default=4, help="processos no teste entre processos")
+    args = parser.parse_args()
+    total = args.writers * args.rows
+
+    with tempfile.TemporaryDirectory() as tmp:
+        naive_path = os.path.join(tmp, "naive.csv")
+        naive_append(naive_path, MileageTracker.CSV_HEADER)
+        t_naive, _ = run_threads(naive_path, args.writers, args.rows, use_log=False)
+        check(naive_path, total)
+
+        log_path = os.path.join(tmp, "log.csv")
+        t_log, stats = run_threads(log_path, args.writers, args.rows, use_log=True)
+        check(log_path, total)
+
+        print(
+            f"{args.writers} threads x {args.rows} viagens | "
+            f"uma gravação + fsync por viagem: {total / t_naive:,.0f} viagens/s | "
+            f"TripLog: {total / t_log:,.0f} viagens/s "
+            f"({stats['rows_per_batch']:.1f} viagens por fsync, {t_naive / t_log:.1f}x)"
+        )
+
+        shared_path = os.path.join(tmp, "shared.csv")
+        t_procs = run_processes(shared_path, args.processes, args.writers, args.rows)
+        check(shared_path, args.processes * total)
+        print(
+            f"{args.processes} processos x {args.writers} threads no mesmo arquivo: "
+            f"{args.processes * total / t_procs:,.0f} viagens/s, sem linhas corrompidas"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: somar colunas do armazenamento colunar vs. reler o trips.csv como texto.
+
+Uso (na raiz do projeto):
+    python3 bench/bench_trip_store.py
+    python3 bench/bench_trip_store.py --sizes 100000 1000000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.trip_store import TRIP_FIELDS, ColumnarTripStore  # noqa: E402
+
+
+def write_csv(path, n, seed=42):
+    rnd = random.Random(seed)
+    addresses = [f"Endereço {i}" for i in range(500)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(TRIP_FIELDS)
+        odometer = 0
+        for _ in range(n):
+            distance = rnd.randint(1, 8000)
+            tolls = rnd.randint(0, 6000) if rnd.random() < 0.4 else 0
+            parking = rnd.randint(0, 4000) if rnd.random() < 0.3 else 0
+            km = (distance * 5 + 5) // 10
+            writer.writerow([
+                rnd.choice(addresses),
+                rnd.choice(addresses),
+                f"{odometer // 10}.{odometer % 10}",
+                f"{(odometer + distance) // 10}.{(odometer + distance) % 10}",
+                f"{distance // 10}.{distance % 10}",
+                f"{tolls / 100:.2f}",
+                f"{parking / 100:.2f}",
+                f"{km / 100:.2f}",
+                f"{(km + tolls + parking) / 100:.2f}",
+            ])
+            odometer += distance
+
+
+def csv_totals(path):
+    totals = [Decimal(0)] * 7
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            for i, value in enumerate(row[2:]):
+                totals[i] += Decimal(value)
+    return totals
+
+
+def run(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "trips.csv")
+        write_csv(csv_path, n)
+        store = ColumnarTripStore(os.path.join(tmp, "trips_store"))
+
+        t0 = time.perf_counter()
+        store.import_csv(csv_path)
+        t_import = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        expected = csv_totals(csv_path)
+        t_csv = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        totals = store.totals()
+        t_store = time.perf_counter() - t0
+
+        if list(totals.values()) != expected:
+            raise SystemExit(f"Totais divergentes para n={n}")
+
+    print(
+        f"{n:>9} viagens | importação: {t_import:7.2f} s | somas CSV: {t_csv:7.3f} s | "
+        f"somas colunar: {t_store * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100_000, 1_000_000],
+        help="quantidades de viagens a medir",
+    )
+    args = parser.parse_args()
+    for n in args.sizes:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
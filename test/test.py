@@ -1,10 +1,115 @@
+import asyncio
 import unittest
 import tkinter as tk
 from unittest.mock import MagicMock, patch
 from app.app import MileageTracker, ExpenseCalculator
+from app.address_normalizer import AddressNormalizer, canonicalize_address
+from app.async_routes import AsyncRoutesClient, AsyncRoutesResolver
+from app.distance_estimator import OfflineDistanceEstimator, haversine_km
+from app.expense import RateSchedule
+from app.history_source import HistorySource, read_last_rows
+from app.importer import RejectWriter, TripImporter, read_csv
+from app.metrics import Metrics
+from app.records import Expense, Trip, expenses_from_batch, format_summary
+from app.repository import (
+    CsvTripRepository, SqliteTripRepository, TripRepository, migrate_csv, open_repository, sqlite_path,
+)
+from app.route_cache import RouteCache
+from app.route_matrix import RouteMatrixResolver, plan_matrix_blocks
+from app.routes_client import RoutesClient
+from app.running_totals import RunningTotals
+from app.server import TripServer, TripService
+from app.trip_index import TripDateIndex, upgrade_csv_header
+from app.trip_log import TripLog
+from app.trip_store import STORE_FIELDS, TRIP_FIELDS, ColumnarTripStore
+from app import cli
+from app import reports
+from app import reprice
+from decimal import Decimal
+import io
+import socket
+import subprocess
+import sqlite3
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
 import tempfile
+import threading
+import time
 import os
 import csv
+from datetime import date, datetime
+
+
+class FakeRoutesServer:
+    """
+    Servidor HTTP local que imita a Routes API (computeRoutes), para testar
+    a integração sem rede. Responde com distance_meters e conta as chamadas.
+    """
+
+    def __init__(self, distance_meters=12345, status=200, distance_fn=None):
+        self.distance_meters = distance_meters
+        # status pode ser uma lista: um status por requisição (o último se repete)
+        self.statuses = list(status) if isinstance(status, (list, tuple)) else [status]
+        # distance_fn(origem, destino) -> metros, usado pelo computeRouteMatrix
+        self.distance_fn = distance_fn or (lambda origin, dest: distance_meters)
+        self.requests = []
+        self.client_ports = []
+        self.hosts = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 para permitir conexões keep-alive
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                fake.requests.append(request)
+                fake.client_ports.append(self.client_address[1])
+                fake.hosts.append(self.headers.get("Host"))
+                status = fake.statuses.pop(0) if len(fake.statuses) > 1 else fake.statuses[0]
+                if status == 200 and self.path.endswith("computeRouteMatrix"):
+                    payload = [
+                        {
+                            "originIndex": i,
+                            "destinationIndex": j,
+                            "distanceMeters": fake.distance_fn(
+                                o["waypoint"]["address"], d["waypoint"]["address"]
+                            ),
+                            "status": {},
+                            "condition": "ROUTE_EXISTS",
+                        }
+                        for i, o in enumerate(request["origins"])
+                        for j, d in enumerate(request["destinations"])
+                    ]
+                elif status == 200:
+                    payload = {"routes": [{"distanceMeters": fake.distance_meters}]}
+                else:
+                    payload = {"error": {"message": "erro simulado"}}
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.url = f"{base}/directions/v2:computeRoutes"
+        self.matrix_url = f"{base}/distanceMatrix/v2:computeRouteMatrix"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
 
 
 class Test1(unittest.TestCase):
@@ -263,7 +368,7 @@ class TestGoogleMapsDistance(unittest.TestCase):
     def tearDown(self):
         self.root.destroy()
 
-    @patch("app.app.requests.post")
+    @patch("app.routes_client.requests.Session.post")
     def test_get_distance_from_gmaps_success(self, mock_post):
         """
         Caso de sucesso: a API retorna uma rota com distanceMeters
@@ -294,7 +399,7 @@ class TestGoogleMapsDistance(unittest.TestCase):
 
         self.assertIn("Chave da API do Google Maps não configurada", str(ctx.exception))
 
-    @patch("app.app.requests.post")
+    @patch("app.routes_client.requests.Session.post")
     def test_get_distance_from_gmaps_http_error(self, mock_post):
         """
         Se a API responder com erro HTTP (ex.: 400, 500),
@@ -312,7 +417,7 @@ class TestGoogleMapsDistance(unittest.TestCase):
         self.assertIn("Erro HTTP 400", str(ctx.exception))
         self.assertIn("Invalid request", str(ctx.exception))
 
-    @patch("app.app.requests.post")
+    @patch("app.routes_client.requests.Session.post")
     def test_get_distance_from_gmaps_no_routes(self, mock_post):
         """
         Se a API não retornar nenhuma rota, deve lançar RuntimeError
@@ -366,7 +471,7 @@ class TestGoogleMapsDistance(unittest.TestCase):
     def tearDown(self):
         self.root.destroy()
 
-    @patch("app.app.requests.post")
+    @patch("app.routes_client.requests.Session.post")
     def test_get_distance_from_gmaps_success(self, mock_post):
         """
         Caso de sucesso: a API retorna uma rota com distanceMeters
@@ -397,7 +502,7 @@ class TestGoogleMapsDistance(unittest.TestCase):
 
         self.assertIn("Chave da API do Google Maps não configurada", str(ctx.exception))
 
-    @patch("app.app.requests.post")
+    @patch("app.routes_client.requests.Session.post")
     def test_get_distance_from_gmaps_http_error(self, mock_post):
         """
         Se a API responder com erro HTTP (ex.: 400, 500),
@@ -415,7 +520,7 @@ class TestGoogleMapsDistance(unittest.TestCase):
         self.assertIn("Erro HTTP 400", str(ctx.exception))
         self.assertIn("Invalid request", str(ctx.exception))
 
-    @patch("app.app.requests.post")
+    @patch("app.routes_client.requests.Session.post")
     def test_get_distance_from_gmaps_no_routes(self, mock_post):
         """
         Se a API não retornar nenhuma rota, deve lançar RuntimeError
@@ -457,6 +562,2088 @@ class TestGoogleMapsDistance(unittest.TestCase):
         self.assertIsInstance(self.app.listbox, tk.Listbox, "Campo ultimos registros não encontrado")
             
 
+class TestExpenseCalculatorBatch(unittest.TestCase):
+    """Testes para o cálculo em lote (colunar) de despesas"""
+
+    def setUp(self):
+        self.calculator = ExpenseCalculator(km_rate=0.50)
+
+    def test_batch_matches_single_trip(self):
+        """O lote deve bater centavo a centavo com calculate_total_expense"""
+        distances = [100, 50.5, 33.33, 0.01, 0, 10000, 12.345, 0.005]
+        tolls = [20.50, 0, 12.345, "", "7.5", 0, 2.675, 1.005]
+        parking = [15.00, 0, 9.876, None, 0, 3, 0.125, 0]
+
+        batch = self.calculator.calculate_batch(distances, tolls, parking)
+
+        for i, (d, t, p) in enumerate(zip(distances, tolls, parking)):
+            single = self.calculator.calculate_total_expense(d, t, p)
+            for key, value in single.items():
+                self.assertEqual(batch[key][i], value, f"{key} diverge na linha {i}")
+
+    def test_batch_centavos(self):
+        """Com centavos=True os valores vêm como inteiros"""
+        batch = self.calculator.calculate_batch([100], [20.50], [15], centavos=True)
+        self.assertEqual(batch['km_expense'], [5000])
+        self.assertEqual(batch['total'], [8550])
+
+    def test_batch_without_tolls_and_parking(self):
+        """Sem colunas de pedágio/estacionamento, ambas valem zero"""
+        batch = self.calculator.calculate_batch([75, 30])
+        self.assertEqual(batch['total'], [37.50, 15.00])
+        self.assertEqual(batch['tolls'], [0.0, 0.0])
+
+    def test_batch_negative_value_raises_error(self):
+        """Valor negativo em qualquer coluna levanta ValueError"""
+        with self.assertRaises(ValueError):
+            self.calculator.calculate_batch([10, -1])
+        with self.assertRaises(ValueError):
+            self.calculator.calculate_batch([10], [-5], [0])
+
+    def test_batch_length_mismatch_raises_error(self):
+        """Colunas de tamanhos diferentes levantam ValueError"""
+        with self.assertRaises(ValueError):
+            self.calculator.calculate_batch([10, 20], [1])
+
+class TestTripHistory(unittest.TestCase):
+    """Testes para a janela de últimos registros"""
+
+    def write_trips(self, csv_path, count):
+        with open(csv_path, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(MileageTracker.CSV_HEADER)
+            for i in range(count):
+                writer.writerow([f"Origem {i}", f"Destino {i}", "0.0", "10.0", "10.0", "0.00", "0.00", "5.00", "5.00"])
+
+    def test_read_last_rows_returns_tail(self):
+        """Lê apenas as últimas linhas, na ordem do arquivo"""
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "trips.csv")
+            self.write_trips(csv_path, 1000)
+
+            rows = read_last_rows(csv_path, 3, block_size=64)
+
+            self.assertEqual([r[0] for r in rows], ["Origem 997", "Origem 998", "Origem 999"])
+
+    def test_read_last_rows_small_file(self):
+        """Arquivo menor que a janela devolve todas as linhas (com cabeçalho)"""
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "trips.csv")
+            self.write_trips(csv_path, 2)
+
+            rows = read_last_rows(csv_path, 50)
+
+            self.assertEqual(rows[0], MileageTracker.CSV_HEADER)
+            self.assertEqual(len(rows), 3)
+
+    def test_read_last_rows_missing_file(self):
+        """Arquivo inexistente devolve lista vazia"""
+        self.assertEqual(read_last_rows("/caminho/que/nao/existe.csv", 10), [])
+
+    def test_history_window_is_bounded(self):
+        """A lista só contém as linhas visíveis, sem o cabeçalho, e rola pelo histórico"""
+        root = tk.Tk()
+        root.withdraw()
+        try:
+            app = MileageTracker(root)
+            with tempfile.TemporaryDirectory() as tmp:
+                app.csv_path = os.path.join(tmp, "trips.csv")
+                self.write_trips(app.csv_path, 20)
+
+                app.load_existing()
+                self.assertEqual(app.listbox.size(), app.HISTORY_ROWS)
+                self.assertTrue(app.listbox.get(tk.END).startswith("Origem 19"))
+
+                app.history.on_scroll("moveto", "0")
+                self.assertTrue(app.listbox.get(0).startswith("Origem 0 |"))
+
+                with open(app.csv_path, "a", newline='', encoding='utf-8') as f:
+                    csv.writer(f).writerow(["Nova", "Viagem"])
+                app.append_to_history()
+                self.assertEqual(app.listbox.size(), app.HISTORY_ROWS)
+                self.assertEqual(app.listbox.get(tk.END), "Nova | Viagem")
+        finally:
+            root.destroy()
+
+    def test_search_runs_off_the_tk_thread(self):
+        """A busca roda numa thread; a lista é filtrada quando ela termina"""
+        root = tk.Tk()
+        root.withdraw()
+        try:
+            app = MileageTracker(root)
+            with tempfile.TemporaryDirectory() as tmp:
+                app.csv_path = os.path.join(tmp, "trips.csv")
+                self.write_trips(app.csv_path, 50)
+                app.load_existing()
+
+                app.history.entry_search.insert(0, "origem 4")
+                app.history.search()
+                self.assertIsNone(app.history.source.query)
+                self.assertIn("buscando", app.history.info.cget("text"))
+                deadline = time.monotonic() + 5
+                while app.history.source.query is None and time.monotonic() < deadline:
+                    root.update()
+                    time.sleep(0.01)
+                self.assertEqual(len(app.history.source), 11)
+                self.assertEqual(app.listbox.get(tk.END).split(" | ")[0], "Origem 49")
+        finally:
+            root.destroy()
+
+class TestRouteCache(unittest.TestCase):
+    """Testes para o cache persistente de distâncias"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "routes_cache.sqlite3")
+        self.now = 1000.0
+        self.cache = RouteCache(self.path, ttl=60, max_entries=3, clock=lambda: self.now)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_hit_and_miss_counters(self):
+        """Primeira consulta é miss, depois do put vira hit"""
+        self.assertIsNone(self.cache.get("A", "B"))
+        self.cache.put("A", "B", 12.5)
+        self.assertEqual(self.cache.get("A", "B"), 12.5)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+        self.assertEqual(stats['size'], 1)
+
+    def test_key_is_normalized(self):
+        """Espaços extras e maiúsculas não geram entradas diferentes"""
+        self.cache.put("Av. Paulista,  1000", "Rua Augusta", 3.2)
+        self.assertEqual(self.cache.get("  av. paulista, 1000 ", "RUA AUGUSTA"), 3.2)
+        self.assertIsNone(self.cache.get("Av. Paulista, 1000", "Rua Augusta", "WALK"))
+
+    def test_entries_expire_after_ttl(self):
+        """Entradas mais velhas que o TTL são descartadas"""
+        self.cache.put("A", "B", 10.0)
+        self.now += 61
+        self.assertIsNone(self.cache.get("A", "B"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        """Acima do limite, a rota menos usada recentemente sai do cache"""
+        for i, name in enumerate(["A", "B", "C"]):
+            self.now += 1
+            self.cache.put(name, "X", float(i))
+        self.now += 1
+        self.cache.get("A", "X")  # "A" passa a ser a mais recente
+        self.now += 1
+        self.cache.put("D", "X", 4.0)
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.get("B", "X"))
+        self.assertEqual(self.cache.get("A", "X"), 0.0)
+
+    def test_cache_is_persistent(self):
+        """Os dados sobrevivem a uma nova instância no mesmo arquivo"""
+        self.cache.put("A", "B", 7.0)
+        other = RouteCache(self.path, clock=lambda: self.now)
+        try:
+            self.assertEqual(other.get("A", "B"), 7.0)
+        finally:
+            other.close()
+
+
+class TestResolveDistance(unittest.TestCase):
+    """Testes de resolve_distance contra um servidor local da Routes API"""
+
+    def setUp(self):
+        self.root = tk.Tk()
+        self.app = MileageTracker(self.root)
+        self.root.withdraw()
+        self.app.api_key = "fake-api-key-for-tests"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app.route_cache = RouteCache(os.path.join(self.tmp.name, "routes_cache.sqlite3"))
+        self.app.routes_client = RoutesClient(sleep=lambda seconds: None)
+
+    def tearDown(self):
+        self.app.route_cache.close()
+        self.tmp.cleanup()
+        self.root.destroy()
+
+    def test_repeated_trip_uses_cache(self):
+        """A segunda consulta do mesmo trajeto não chama a API"""
+        with FakeRoutesServer(distance_meters=8000) as server:
+            self.app.routes_url = server.url
+
+            first = self.app.resolve_distance("Origem X", "Destino Y")
+            second = self.app.resolve_distance("origem x", "Destino  Y")
+
+        self.assertAlmostEqual(first, 8.0)
+        self.assertAlmostEqual(second, 8.0)
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(self.app.route_cache.stats()['hits'], 1)
+
+    def test_api_error_is_not_cached(self):
+        """Erros da API não são guardados no cache"""
+        with FakeRoutesServer(status=500) as server:
+            self.app.routes_url = server.url
+            with self.assertRaises(RuntimeError):
+                self.app.resolve_distance("Origem X", "Destino Y")
+
+        self.assertEqual(len(self.app.route_cache), 0)
+
+class TestBackgroundLookup(unittest.TestCase):
+    """Testes da consulta de distância em segundo plano no save_trip"""
+
+    def setUp(self):
+        self.root = tk.Tk()
+        self.app = MileageTracker(self.root)
+        self.root.withdraw()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app.csv_path = os.path.join(self.tmp.name, "trips.csv")
+        self.release = threading.Event()
+        self.calls = []
+
+        def slow_resolve(origin, dest):
+            self.calls.append((origin, dest))
+            self.release.wait(5)
+            return 42.0
+
+        self.app.resolve_distance = slow_resolve
+        for entry, value in [
+            (self.app.entry_origin, "Origem X"),
+            (self.app.entry_dest, "Destino Y"),
+            (self.app.entry_start, "100"),
+            (self.app.entry_end, "150"),
+        ]:
+            entry.insert(0, value)
+
+    def tearDown(self):
+        self.release.set()
+        self.tmp.cleanup()
+        self.root.destroy()
+
+    def wait_lookup(self):
+        for _ in range(200):
+            self.root.update()
+            if self.app._pending_lookup is None:
+                return
+            threading.Event().wait(0.01)
+        self.fail("a consulta não terminou")
+
+    def test_save_trip_does_not_block_and_ignores_double_submit(self):
+        """save_trip retorna na hora e um segundo clique é ignorado"""
+        self.app.save_trip()
+        self.app.save_trip()
+
+        self.assertIn("Calculando", self.app.status.cget("text"))
+        self.assertEqual(self.app.btn_save.cget("state"), "disabled")
+        self.assertFalse(os.path.exists(self.app.csv_path))
+
+        self.release.set()
+        self.wait_lookup()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertIn("Google Maps", self.app.status.cget("text"))
+        self.assertEqual(self.app.btn_save.cget("state"), "normal")
+        with open(self.app.csv_path, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[1][4], "42.0")
+        self.assertEqual(rows[0][-1], "timestamp")
+        self.assertTrue(rows[1][-1].startswith(datetime.now().strftime("%Y-%m-%d")))
+        self.assertEqual(list(self.app.repository.between()), rows[1:])
+
+    def test_cancel_lookup_discards_trip(self):
+        """Cancelar a consulta não grava a viagem e mantém os campos"""
+        self.app.save_trip()
+        self.app.cancel_lookup()
+        self.release.set()
+        self.wait_lookup()
+
+        self.assertIn("cancelada", self.app.status.cget("text"))
+        self.assertEqual(self.app.entry_origin.get(), "Origem X")
+        self.assertFalse(os.path.exists(self.app.csv_path))
+
+class TestRouteMatrix(unittest.TestCase):
+    """Testes do resolvedor em lote via computeRouteMatrix"""
+
+    @staticmethod
+    def fake_distance(origin, dest):
+        # distância determinística para conferir o mapeamento de volta
+        return 1000 * (int(origin.split()[-1]) * 100 + int(dest.split()[-1]) + 1)
+
+    def test_plan_respects_api_limits(self):
+        """Nenhum bloco passa de 50 waypoints ou 625 elementos e todos os pares são cobertos"""
+        pairs = {(f"Origem {i % 30}", f"Destino {i}") for i in range(700)}
+        blocks = plan_matrix_blocks(pairs)
+
+        covered = set()
+        for origins, destinations, block_pairs in blocks:
+            self.assertLessEqual(len(origins) + len(destinations), 50)
+            self.assertLessEqual(len(origins) * len(destinations), 625)
+            covered |= block_pairs
+        self.assertEqual(covered, pairs)
+
+    def test_plan_merges_shared_destinations(self):
+        """Origens com os mesmos destinos dividem uma única requisição"""
+        pairs = [(f"Origem {i}", f"Destino {j}") for i in range(5) for j in range(5)]
+        self.assertEqual(len(plan_matrix_blocks(pairs)), 1)
+
+    def test_resolve_maps_results_back_to_trips(self):
+        """Cada viagem recebe a distância do seu próprio par, inclusive repetidos"""
+        pairs = [(f"Origem {i % 7}", f"Destino {i % 60}") for i in range(300)]
+        with FakeRoutesServer(distance_fn=self.fake_distance) as server:
+            resolver = RouteMatrixResolver("fake-key", url=server.matrix_url, max_workers=4)
+            distances, errors = resolver.resolve(pairs)
+
+        self.assertEqual(errors, [None] * len(pairs))
+        for (origin, dest), distance in zip(pairs, distances):
+            self.assertAlmostEqual(distance, self.fake_distance(origin, dest) / 1000.0)
+        self.assertLess(len(server.requests), len(set(pairs)))
+
+    def test_resolve_uses_cache(self):
+        """Pares já presentes no cache não vão para a API"""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RouteCache(os.path.join(tmp, "routes_cache.sqlite3"))
+            try:
+                cache.put("Origem 1", "Destino 2", 5.0)
+                with FakeRoutesServer(distance_fn=self.fake_distance) as server:
+                    resolver = RouteMatrixResolver("fake-key", url=server.matrix_url, cache=cache)
+                    distances, _ = resolver.resolve([("Origem 1", "Destino 2"), ("Origem 1", "Destino 3")])
+
+                self.assertEqual(distances, [5.0, 104.0])
+                self.assertEqual(len(server.requests), 1)
+                self.assertEqual(cache.get("Origem 1", "Destino 3"), 104.0)
+            finally:
+                cache.close()
+
+    def test_resolve_http_error_marks_trips(self):
+        """Erro HTTP vira mensagem de erro para as viagens do bloco"""
+        with FakeRoutesServer(status=500) as server:
+            client = RoutesClient(sleep=lambda seconds: None)
+            resolver = RouteMatrixResolver("fake-key", url=server.matrix_url, client=client)
+            distances, errors = resolver.resolve([("Origem 1", "Destino 1")])
+
+        self.assertEqual(distances, [None])
+        self.assertIn("Erro HTTP 500", errors[0])
+
+class TestRoutesClient(unittest.TestCase):
+    """Testes do cliente HTTP da Routes API (repetições, circuit breaker, pool)"""
+
+    def setUp(self):
+        self.sleeps = []
+        self.now = 0.0
+        self.client = RoutesClient(
+            max_retries=2,
+            failure_threshold=2,
+            reset_timeout=30,
+            sleep=self.sleeps.append,
+            clock=lambda: self.now,
+            rng=lambda: 1.0,
+        )
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_retries_transient_status(self):
+        """503 seguido de 200: repete com backoff exponencial e devolve o sucesso"""
+        with FakeRoutesServer(status=[503, 503, 200]) as server:
+            resp = self.client.post(server.url, json={})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(self.sleeps, [0.5, 1.0])
+        self.assertEqual(self.client.stats()['retries'], 2)
+
+    def test_client_error_is_not_retried(self):
+        """Erros 4xx (exceto 429) não são repetidos"""
+        with FakeRoutesServer(status=400) as server:
+            resp = self.client.post(server.url, json={})
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(len(server.requests), 1)
+        self.assertFalse(self.client.stats()['circuit_open'])
+
+    def test_circuit_breaker_opens_and_recovers(self):
+        """Após falhas seguidas o circuito abre; depois do reset_timeout tenta de novo"""
+        with FakeRoutesServer(status=[500] * 6 + [200]) as server:
+            self.client.post(server.url, json={})
+            self.client.post(server.url, json={})
+            with self.assertRaises(RuntimeError):
+                self.client.post(server.url, json={})
+            self.assertEqual(len(server.requests), 6)
+
+            self.now += 31
+            resp = self.client.post(server.url, json={})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(self.client.stats()['circuit_open'])
+        self.assertEqual(self.client.stats()['short_circuited'], 1)
+
+    def test_failed_probe_reopens_circuit(self):
+        """Com o circuito meio-aberto, uma falha do teste já reabre o circuito"""
+        with FakeRoutesServer(status=500) as server:
+            self.client.post(server.url, json={})
+            self.client.post(server.url, json={})
+            self.now += 31
+            self.client.post(server.url, json={})
+            self.assertEqual(self.client.stats()['circuit_state'], RoutesClient.OPEN)
+            with self.assertRaises(RuntimeError):
+                self.client.post(server.url, json={})
+
+        self.assertEqual(len(server.requests), 9)
+
+    def test_half_open_allows_a_single_probe(self):
+        """Com o circuito meio-aberto, só uma das chamadas simultâneas vai à API"""
+        release = threading.Event()
+        sent = []
+
+        def slow_post(url, **kwargs):
+            sent.append(url)
+            release.wait(5)
+            return MagicMock(status_code=200, headers={})
+
+        self.client._session = MagicMock()
+        self.client._session.post.side_effect = slow_post
+        self.client._record_failure(0)
+        self.client._record_failure(0)
+        self.now += 31
+
+        rejected = []
+
+        def call():
+            try:
+                self.client.post("http://api", json={})
+            except RuntimeError:
+                rejected.append(1)
+
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for t in threads:
+            t.start()
+        # as sete chamadas recusadas terminam enquanto o teste ainda espera a API
+        for _ in range(500):
+            if len(rejected) == 7:
+                break
+            time.sleep(0.01)
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(len(rejected), 7)
+        stats = self.client.stats()
+        self.assertEqual(stats['circuit_state'], RoutesClient.CLOSED)
+        self.assertEqual(stats['short_circuited'], 7)
+
+    def test_connection_is_reused(self):
+        """A sessão mantém a conexão aberta entre chamadas (keep-alive)"""
+        with FakeRoutesServer() as server:
+            for _ in range(3):
+                self.client.post(server.url, json={})
+
+        self.assertEqual(len(set(server.client_ports)), 1)
+        self.assertEqual(self.client.stats()['calls'], 3)
+        self.assertEqual(len(self.client.latencies), 3)
+
+    def test_threads_share_one_session(self):
+        """Threads que usam o cliente ao mesmo tempo criam uma só sessão"""
+        barrier = threading.Barrier(8)
+        sessions = []
+
+        def use():
+            barrier.wait()
+            sessions.append(self.client.session)
+            self.client.stats()
+
+        threads = [threading.Thread(target=use) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(session) for session in sessions}), 1)
+
+class TestColumnarTripStore(unittest.TestCase):
+    """Testes do armazenamento colunar de viagens"""
+
+    ROWS = [
+        ["Origem A", "Destino B", "100.0", "150.0", "50.0", "2.50", "5.00", "25.00", "32.50", "2024-03-01T08:30:00"],
+        ["Origem A", "Destino C", "150.0", "162.3", "12.3", "0.00", "0.00", "6.15", "6.15", "2024-03-02"],
+        ["São Paulo, \"centro\"", "Destino B", "0.0", "0.5", "0.5", "0.00", "1.99", "0.25", "2.24", ""],
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_dir = os.path.join(self.tmp.name, "trips_store")
+        self.store = ColumnarTripStore(self.store_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_reopen(self):
+        """Viagens gravadas continuam lá ao reabrir, com endereços internados"""
+        self.store.append_many(self.ROWS)
+
+        reopened = ColumnarTripStore(self.store_dir)
+        self.assertEqual(len(reopened), 3)
+        self.assertEqual(list(reopened.rows()), self.ROWS)
+        self.assertEqual(list(reopened.column("origin")), [0, 0, 3])
+
+    def test_csv_round_trip_is_lossless(self):
+        """Importar e exportar gera um CSV idêntico ao original, com as datas"""
+        source = os.path.join(self.tmp.name, "trips.csv")
+        exported = os.path.join(self.tmp.name, "export.csv")
+        with open(source, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(STORE_FIELDS)
+            writer.writerows(self.ROWS)
+
+        self.assertEqual(self.store.import_csv(source), 3)
+        self.store.export_csv(exported)
+
+        with open(source, 'rb') as a, open(exported, 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertEqual(list(self.store.column("timestamp")), [20240301083000, 20240302, 0])
+
+    def test_trips_without_timestamp(self):
+        """CSV e armazenamento antigos, sem a coluna timestamp, ficam sem data"""
+        old_rows = [row[:len(TRIP_FIELDS)] for row in self.ROWS]
+        source = os.path.join(self.tmp.name, "trips.csv")
+        with open(source, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(TRIP_FIELDS)
+            writer.writerows(old_rows)
+        self.store.import_csv(source)
+        os.remove(os.path.join(self.store_dir, "timestamp.i64"))
+
+        reopened = ColumnarTripStore(self.store_dir)
+        self.assertEqual(list(reopened.rows()), [row + [""] for row in old_rows])
+        with self.assertRaises(ValueError):
+            reopened.append(old_rows[0] + ["01/03/2024"])
+        self.assertEqual(len(ColumnarTripStore(self.store_dir)), 3)
+
+    def test_totals_are_exact(self):
+        """Somas por coluna e por endereço usam Decimal exato"""
+        self.store.append_many(self.ROWS)
+
+        totals = self.store.totals()
+        self.assertEqual(str(totals["total_expense"]), "40.89")
+        self.assertEqual(str(totals["distance"]), "62.8")
+
+        by_origin = self.store.group_totals("origin", ["total_expense"])
+        self.assertEqual(str(by_origin["Origem A"]["total_expense"]), "38.65")
+
+    def test_invalid_row_is_rejected_without_side_effects(self):
+        """Número fora do formato levanta ValueError e nada é gravado"""
+        bad = ["Nova origem", "Destino B", "100", "150.0", "50.0", "2.50", "5.00", "25.00", "32.50"]
+        with self.assertRaises(ValueError):
+            self.store.append(bad)
+
+        self.store.append(self.ROWS[0])
+        reopened = ColumnarTripStore(self.store_dir)
+        self.assertEqual(list(reopened.rows()), [self.ROWS[0]])
+
+    def test_recovers_from_torn_write(self):
+        """Colunas com tamanhos diferentes (gravação interrompida) são alinhadas"""
+        self.store.append_many(self.ROWS)
+        with open(os.path.join(self.store_dir, "total_expense.i64"), "r+b") as f:
+            f.truncate(2 * 8 + 3)
+
+        reopened = ColumnarTripStore(self.store_dir)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(list(reopened.rows()), self.ROWS[:2])
+
+class TestCli(unittest.TestCase):
+    """Testes do modo em lote sem interface gráfica"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, content, name, *args):
+        source = os.path.join(self.tmp.name, name)
+        target = os.path.join(self.tmp.name, "saida")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(content)
+        stderr = io.StringIO()
+        with patch("sys.stderr", stderr):
+            code = cli.main([source, "-o", target, *args])
+        with open(target, encoding="utf-8") as f:
+            return code, f.read(), stderr.getvalue()
+
+    def test_prices_csv_like_the_form(self):
+        """Mesmos valores que o save_trip gravaria, com vírgula decimal aceita"""
+        code, output, stderr = self.run_cli(
+            "origin,destination,start_odometer,end_odometer,tolls,parking\n"
+            "Origem A,Destino B,100,150,\"2,50\",5\n",
+            "viagens.csv",
+        )
+        rows = list(csv.reader(io.StringIO(output)))
+
+        self.assertEqual(code, 0)
+        self.assertEqual(rows[0], MileageTracker.CSV_HEADER)
+        self.assertEqual(rows[1], ["Origem A", "Destino B", "100.0", "150.0", "50.0", "2.50", "5.00", "25.00", "32.50", ""])
+        self.assertIn("1 viagens precificadas", stderr)
+
+    def test_jsonl_and_rejected_rows(self):
+        """Registros inválidos são relatados e não interrompem o lote"""
+        code, output, stderr = self.run_cli(
+            '{"origin": "A", "destination": "B", "start_odometer": 0, "end_odometer": 10, "distance": 12}\n'
+            '{"origin": "A", "destination": "B", "start_odometer": 10, "end_odometer": 0}\n'
+            'isto não é json\n',
+            "viagens.jsonl",
+            "--output-format", "jsonl", "--km-rate", "1.0",
+        )
+        records = [json.loads(line) for line in output.splitlines()]
+
+        self.assertEqual(code, 1)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["distance"], "12.0")
+        self.assertEqual(records[0]["total_expense"], "12.00")
+        self.assertIn("linha 2: hodômetro final menor que inicial", stderr)
+        self.assertIn("linha 3: registro malformado", stderr)
+
+    def test_non_finite_numbers_are_rejected(self):
+        """nan, inf e 1e400 rejeitam só a linha; o resto do lote é precificado"""
+        code, output, stderr = self.run_cli(
+            "origin,destination,start_odometer,end_odometer\n"
+            "A,B,0,nan\n"
+            "A,B,0,10\n"
+            "A,B,-inf,10\n"
+            "A,B,0,1e400\n",
+            "viagens.csv",
+        )
+        rows = list(csv.reader(io.StringIO(output)))
+
+        self.assertEqual(code, 1)
+        self.assertEqual([r[3] for r in rows[1:]], ["10.0"])
+        self.assertIn("3 registros rejeitados", stderr)
+        for value in ("nan", "inf", "-Infinity", "1e400"):
+            with self.assertRaises(ValueError):
+                cli.parse_number(value)
+
+    def test_parse_timestamp(self):
+        self.assertEqual(cli.parse_timestamp("2024-03-01 08:00"), "2024-03-01T08:00:00")
+        self.assertEqual(cli.parse_timestamp("01/03/24"), "2024-03-01")
+        self.assertEqual(cli.parse_timestamp(" "), "")
+        with self.assertRaises(ValueError):
+            cli.parse_timestamp("03/2024")
+
+    def test_parse_trip_returns_trip(self):
+        """parse_trip devolve um Trip, cuja linha é a mesma da janela"""
+        trip = cli.parse_trip({"origin": " A ", "destination": "B", "start_odometer": "100", "end_odometer": "150,5"})
+        self.assertEqual(trip, Trip("A", "B", 100.0, 150.5, 50.5))
+        calculator = ExpenseCalculator(km_rate=0.5)
+        expense = expenses_from_batch(calculator.calculate_batch([trip.distance]))[0]
+        self.assertEqual(expense, calculator.price_trip(trip))
+        self.assertEqual(trip.to_row(expense)[7:], ["25.25", "25.25", ""])
+
+    def test_does_not_import_tkinter(self):
+        """O modo em lote não carrega o tkinter"""
+        code = (
+            "import sys; from app import cli; cli.build_parser(); "
+            "from app.expense import ExpenseCalculator; "
+            "sys.exit('tkinter' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0)
+
+class TestReports(unittest.TestCase):
+    """Testes dos relatórios agregados sobre o trips.csv"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "trips.csv")
+        with open(self.csv_path, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(MileageTracker.CSV_HEADER)
+            writer.writerow(["Origem A", "Destino B", "0.0", "10.1", "10.1", "0.10", "0.00", "5.05", "5.15"])
+            writer.writerow(["Origem A", "Destino B", "0.0", "20.2", "20.2", "0.20", "1.00", "10.10", "11.30"])
+            writer.writerow(["Origem C", "Destino B", "0.0", "0.3", "0.3", "0.00", "0.00", "0.15", "0.15"])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_report_by_route(self):
+        """Somas exatas por trajeto, sem erro de ponto flutuante"""
+        rows = reports.report(self.csv_path, by="route")
+
+        self.assertEqual([r['group'] for r in rows], ["Origem A → Destino B", "Origem C → Destino B"])
+        self.assertEqual(rows[0]['trips'], 2)
+        self.assertEqual(rows[0]['distance'], Decimal("30.30"))
+        self.assertEqual(rows[0]['tolls'], Decimal("0.30"))
+        self.assertEqual(rows[0]['total_expense'], Decimal("16.45"))
+
+    def test_report_by_destination(self):
+        """Agrupamento por destino junta as duas origens"""
+        rows = reports.report(self.csv_path, by="destination")
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['trips'], 3)
+        self.assertEqual(rows[0]['km_expense'], Decimal("15.30"))
+
+    def test_month_and_driver_use_optional_columns(self):
+        """Sem colunas de data/motorista, as viagens caem no grupo "não informado" """
+        rows = [
+            {"timestamp": "2026-03-05T10:00:00", "driver": "Ana", "distance": "1.5"},
+            {"timestamp": "2026-03-20T08:00:00", "driver": "", "distance": "2,25"},
+            {"distance": "1"},
+        ]
+        by_month = reports.aggregate(rows, reports.month_key, fields=["distance"])
+        by_driver = reports.aggregate(rows, reports.driver_key, fields=["distance"])
+
+        self.assertEqual(by_month["2026-03"]["distance"], Decimal("3.75"))
+        self.assertEqual(by_month[reports.MISSING_KEY]["trips"], 1)
+        self.assertEqual(by_driver["Ana"]["distance"], Decimal("1.50"))
+        self.assertEqual(by_driver[reports.MISSING_KEY]["trips"], 2)
+
+    def test_to_units_is_exact(self):
+        """Conversão de texto em inteiro escalado, inclusive negativos e muitas casas"""
+        self.assertEqual(reports.to_units("12.34"), 123400)
+        self.assertEqual(reports.to_units("-1.5"), -15000)
+        self.assertEqual(reports.to_units("0.123456"), Decimal("1234.56"))
+        self.assertEqual(reports.to_decimal(reports.to_units("0.00005") * 3), Decimal("0.00015"))
+
+class TestReprice(unittest.TestCase):
+    """Testes da reprecificação paralela do histórico"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "trips.csv")
+        with open(self.csv_path, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(MileageTracker.CSV_HEADER)
+            for i in range(500):
+                distance = f"{i * 7 % 900 / 10:.1f}"
+                writer.writerow([f"Origem {i}", "Destino", "0.0", distance, distance, f"{i % 13}.25", "0.00", "0.00", "0.00"])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_chunks_are_aligned_to_rows(self):
+        """As faixas cobrem o corpo inteiro e cada uma começa numa linha"""
+        ranges = reprice.chunk_offsets(self.csv_path, 7)
+        with open(self.csv_path, "rb") as f:
+            data = f.read()
+
+        self.assertEqual(ranges[0][0], data.index(b"\n") + 1)
+        self.assertEqual(ranges[-1][1], len(data))
+        for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(data[next_start - 1:next_start], b"\n")
+
+    def test_parallel_matches_single_process(self):
+        """Saída e totais em paralelo são idênticos aos de um único processo"""
+        parallel = os.path.join(self.tmp.name, "paralelo.csv")
+        single = os.path.join(self.tmp.name, "unico.csv")
+
+        totals = reprice.reprice_file(self.csv_path, parallel, 0.60, workers=2)
+        _, body_start = reprice.read_header(self.csv_path)
+        expected = reprice.reprice_range(self.csv_path, body_start, os.path.getsize(self.csv_path), 0.60, single)
+
+        self.assertEqual(totals, expected)
+        with open(parallel, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        with open(single, newline='', encoding='utf-8') as f:
+            self.assertEqual(rows[1:], list(csv.reader(f)))
+
+        calculator = ExpenseCalculator(km_rate=0.60)
+        expense = calculator.calculate_total_expense(float(rows[10][4]), float(rows[10][5]), 0)
+        self.assertEqual(rows[10][7], f"{expense['km_expense']:.2f}")
+        self.assertEqual(rows[10][8], f"{expense['total']:.2f}")
+
+    def test_range_is_read_in_bounded_blocks(self):
+        """A faixa é lida em blocos pequenos, sem perder nem cortar linhas"""
+        reads = []
+
+        class File(io.BytesIO):
+            def read(self, size=-1):
+                reads.append(size)
+                return super().read(size)
+
+        with open(self.csv_path, "rb") as f:
+            data = f.read()
+        _, body_start = reprice.read_header(self.csv_path)
+        lines = list(reprice.read_lines(File(data), body_start, len(data), block_size=100))
+        self.assertEqual(lines, data[body_start:].decode("utf-8").splitlines(keepends=True))
+        self.assertEqual(max(reads), 100)
+
+
+class TestRateSchedule(unittest.TestCase):
+    def setUp(self):
+        self.schedule = RateSchedule([
+            ("2024-01-01", 0, 0.50),
+            ("2024-01-01", 100, 0.45),
+            ("2024-07-01", 0, 0.55),
+            ("2024-07-01", 100, 0.50),
+            ("2024-07-01", 500, 0.40),
+        ])
+        self.calculator = ExpenseCalculator(schedule=self.schedule)
+
+    def test_rate_by_date_and_tier(self):
+        """A versão vem da data e a faixa vem da distância"""
+        self.assertEqual(self.schedule.rate_for("2024-03-15", 50), 0.50)
+        self.assertEqual(self.schedule.rate_for("2024-03-15", 100), 0.45)
+        self.assertEqual(self.schedule.rate_for("2024-06-30T23:59:00", 600), 0.45)
+        self.assertEqual(self.schedule.rate_for("2024-07-01", 99.9), 0.55)
+        self.assertEqual(self.schedule.rate_for(date(2025, 1, 1), 600), 0.40)
+
+    def test_whole_trip_uses_tier_rate(self):
+        """A viagem inteira é reembolsada pela taxa da sua faixa"""
+        expense = self.calculator.calculate_total_expense(200, 10, 5, trip_date="2024-08-01")
+        self.assertEqual(expense['km_expense'], 100.0)
+        self.assertEqual(expense['total'], 115.0)
+
+    def test_date_before_first_version(self):
+        with self.assertRaises(ValueError):
+            self.calculator.calculate_km_expense(10, "2023-12-31")
+        with self.assertRaises(ValueError) as ctx:
+            self.calculator.calculate_batch([10, 10], dates=["2024-02-01", "2023-12-31"])
+        self.assertIn("linha 1", str(ctx.exception))
+
+    def test_batch_matches_single_trip(self):
+        """O lote com datas bate centavo a centavo com o cálculo viagem a viagem"""
+        distances = [0, 12.345, 99.99, 100, 250.5, 500, 733.3]
+        dates = ["2024-01-01", "2024-05-05", date(2024, 7, 1), "2024-06-30", "2024-12-31", "2024-07-02", "2025-03-01"]
+        tolls = [0, 1.005, 0, 12.5, 0, 3, 0.015]
+        batch = self.calculator.calculate_batch(distances, tolls, None, dates=dates)
+        for i, (d, t, day) in enumerate(zip(distances, tolls, dates)):
+            expected = self.calculator.calculate_total_expense(d, t, 0, trip_date=day)
+            self.assertEqual(batch['km_expense'][i], expected['km_expense'])
+            self.assertEqual(batch['total'][i], expected['total'])
+
+    def test_invalid_schedules(self):
+        with self.assertRaises(ValueError):
+            RateSchedule([])
+        with self.assertRaises(ValueError):
+            RateSchedule([("2024-01-01", 50, 0.50)])
+        with self.assertRaises(ValueError):
+            RateSchedule([("2024-01-01", 0, 0.50), ("2024-01-01", 0, 0.40)])
+        with self.assertRaises(ValueError):
+            RateSchedule([("2024-01-01", 0, -0.50)])
+
+    def test_load_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "taxas.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump([
+                    {"effective_date": "2024-01-01", "rate": 0.50},
+                    {"effective_date": "2024-01-01", "min_distance_km": 300, "rate": 0.42},
+                ], f)
+            schedule = RateSchedule.load(path)
+        self.assertEqual(schedule.rate_for("2024-02-01", 299), 0.50)
+        self.assertEqual(schedule.rate_for("2024-02-01", 300), 0.42)
+
+
+class TestTripDateIndex(unittest.TestCase):
+    """Testes do índice esparso por data do trips.csv"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "trips.csv")
+        self.write_rows(self.trip_rows(0, 95), header=True)
+        self.index = TripDateIndex(self.csv_path, every=10)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def trip_rows(self, first, count):
+        # uma viagem por dia a partir de 2024-01-01
+        start = date(2024, 1, 1).toordinal()
+        return [
+            [f"Origem {i}", "Destino, Centro", "0.0", "1.0", "1.0", "0.00", "0.00", "0.50", "0.50",
+             f"{date.fromordinal(start + i).isoformat()}T08:30:00"]
+            for i in range(first, first + count)
+        ]
+
+    def write_rows(self, rows, header=False):
+        with open(self.csv_path, "a", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if header:
+                writer.writerow(MileageTracker.CSV_HEADER)
+            writer.writerows(rows)
+
+    def test_range_query(self):
+        """Devolve só as viagens do período, com fim exclusivo"""
+        rows = list(self.index.trips_between("2024-03-01", date(2024, 3, 5)))
+        self.assertEqual([r[0] for r in rows], ["Origem 60", "Origem 61", "Origem 62", "Origem 63"])
+        self.assertEqual(rows[0][1], "Destino, Centro")
+        self.assertEqual(len(list(self.index.trips_between(end="2024-01-03"))), 2)
+        self.assertEqual(len(list(self.index.trips_between())), 95)
+
+    def test_blocks_point_to_row_starts(self):
+        """Cada bloco começa numa linha e guarda o intervalo de datas"""
+        blocks = self.index.update()["blocks"]
+        self.assertEqual(len(blocks), 10)
+        with open(self.csv_path, "rb") as f:
+            data = f.read()
+        for offset, count, first, last in blocks:
+            self.assertEqual(data[offset - 1:offset], b"\n")
+            self.assertTrue(data[offset:].startswith(b"Origem"))
+            self.assertLessEqual(first, last)
+        self.assertEqual(blocks[-1][1], 5)
+
+    def test_append_is_indexed_incrementally(self):
+        """Viagens acrescentadas entram no índice sem reconstruí-lo"""
+        self.index.update()
+        self.write_rows(self.trip_rows(95, 10))
+        with patch.object(TripDateIndex, "_empty_state", side_effect=AssertionError("reconstruído")):
+            rows = list(TripDateIndex(self.csv_path, every=10).trips_between("2024-04-05"))
+        self.assertEqual([r[0] for r in rows], [f"Origem {i}" for i in range(95, 105)])
+
+    def index_lines(self):
+        with open(self.csv_path + ".idx", encoding='utf-8') as f:
+            return f.read().splitlines()
+
+    def test_update_appends_only_changed_blocks(self):
+        """Cada atualização acrescenta uma linha com os blocos novos, sem regravar o índice"""
+        self.index.update()
+        first = self.index_lines()
+        self.write_rows(self.trip_rows(95, 10))
+        state = self.index.update()
+
+        lines = self.index_lines()
+        self.assertEqual(lines[:1], first)
+        self.assertEqual(len(lines), 2)
+        change = json.loads(lines[1])
+        self.assertEqual(change["from"], 9)
+        self.assertEqual(len(change["blocks"]), 2)
+        reloaded = TripDateIndex(self.csv_path, every=10)._load()
+        self.assertEqual(reloaded, state)
+
+    def test_appended_lines_are_compacted(self):
+        """Com linhas acrescentadas demais, o índice é regravado numa linha só"""
+        index = TripDateIndex(self.csv_path, every=50)
+        index.COMPACT_MIN = 3
+        index.update()
+        for i in range(95, 200, 7):
+            self.write_rows(self.trip_rows(i, 7))
+            blocks = index.update()["blocks"]
+            self.assertLessEqual(len(self.index_lines()), 1 + max(3, len(blocks)))
+
+        self.assertLess(len(self.index_lines()), 15)
+        rows = list(TripDateIndex(self.csv_path, every=50).trips_between("2024-06-01"))
+        self.assertEqual(len(rows), 200 - 152)
+
+    def test_incomplete_line_is_ignored(self):
+        """Uma linha cortada no fim do índice é descartada e o resto do CSV, reindexado"""
+        self.index.update()
+        self.write_rows(self.trip_rows(95, 10))
+        with open(self.csv_path + ".idx", "a", encoding='utf-8') as f:
+            f.write('{"from": 9, "blocks": [[')
+
+        rows = list(TripDateIndex(self.csv_path, every=10).trips_between("2024-04-05"))
+        self.assertEqual([r[0] for r in rows], [f"Origem {i}" for i in range(95, 105)])
+        self.assertEqual(len(self.index_lines()), 1)
+
+    def test_stale_index_is_rebuilt(self):
+        """Um CSV substituído por outro invalida o índice salvo"""
+        self.index.update()
+        os.remove(self.csv_path)
+        self.write_rows(self.trip_rows(200, 3), header=True)
+
+        rows = list(TripDateIndex(self.csv_path, every=10).trips_between("2024-01-01"))
+        self.assertEqual([r[0] for r in rows], ["Origem 200", "Origem 201", "Origem 202"])
+
+    def test_old_header_is_upgraded(self):
+        """Históricos sem timestamp ganham a coluna; viagens antigas ficam sem data"""
+        old = os.path.join(self.tmp.name, "antigo.csv")
+        with open(old, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(TRIP_FIELDS)
+            writer.writerow(["A", "B", "0.0", "1.0", "1.0", "0.00", "0.00", "0.50", "0.50"])
+
+        self.assertTrue(upgrade_csv_header(old, MileageTracker.CSV_HEADER))
+        self.assertFalse(upgrade_csv_header(old, MileageTracker.CSV_HEADER))
+        with open(old, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], MileageTracker.CSV_HEADER)
+        self.assertEqual(rows[1][0], "A")
+        self.assertEqual(list(TripDateIndex(old).trips_between()), [])
+
+
+class TestHistorySource(unittest.TestCase):
+    """Testes do acesso paginado ao histórico usado pela lista virtualizada"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "trips.csv")
+        self.write_rows(0, 1000, header=True)
+        self.source = HistorySource(self.csv_path, every=16, page_rows=8, max_pages=4)
+        self.source.refresh()
+        self.source.build_index()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_rows(self, first, count, header=False):
+        with open(self.csv_path, "a", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if header:
+                writer.writerow(MileageTracker.CSV_HEADER)
+            for i in range(first, first + count):
+                writer.writerow([f"Rua {i % 7}, {i}", "Centro" if i % 10 else "Aeroporto", "0.0", "1.0",
+                                 "1.0", "0.00", "0.00", "0.50", "0.50", ""])
+
+    def test_first_refresh_reads_only_the_tail(self):
+        """Antes do índice, a lista mostra as últimas viagens lidas do fim do arquivo"""
+        source = HistorySource(self.csv_path, every=16, page_rows=8, seed_rows=5)
+        with patch.object(HistorySource, "_index_tail", side_effect=AssertionError("arquivo indexado")):
+            source.refresh()
+        self.assertFalse(source.indexed)
+        self.assertEqual(len(source._offsets), 0)
+        self.assertEqual([r[0] for r in source.rows(0, 10)],
+                         ["Rua 1, 995", "Rua 2, 996", "Rua 3, 997", "Rua 4, 998", "Rua 5, 999"])
+
+        source.build_index()
+        self.assertTrue(source.indexed)
+        self.assertEqual(len(source), 1000)
+
+    def test_tail_of_small_file_skips_header(self):
+        os.remove(self.csv_path)
+        self.write_rows(0, 2, header=True)
+        source = HistorySource(self.csv_path, seed_rows=5)
+        source.refresh()
+        self.assertEqual([r[0] for r in source.rows(0, 5)], ["Rua 0, 0", "Rua 1, 1"])
+
+    def test_search_builds_index_on_demand(self):
+        source = HistorySource(self.csv_path, every=16, page_rows=8)
+        source.refresh()
+        self.assertEqual(source.set_filter("aeroporto"), 100)
+        self.assertTrue(source.indexed)
+
+    def test_search_reads_without_holding_the_lock(self):
+        """A busca lê o arquivo sem travar a fonte: a lista rola durante a busca"""
+        seen = []
+        search = self.source._search
+
+        def slow_search(*args):
+            scroll = threading.Thread(target=lambda: seen.append(self.source.rows(0, 2)))
+            scroll.start()
+            scroll.join(5)
+            return search(*args)
+
+        with patch.object(self.source, "_search", side_effect=slow_search):
+            found = self.source.matches("rua 3, 10")
+        self.assertEqual([r[0] for r in seen[0]], ["Rua 0, 0", "Rua 1, 1"])
+        self.assertEqual(list(found), [i for i in range(1000) if "rua 3, 10" in f"rua {i % 7}, {i}"])
+
+    def test_repeated_search_reads_only_new_rows(self):
+        """Buscas recentes ficam guardadas (até max_queries) e só leem as viagens novas"""
+        source = HistorySource(self.csv_path, every=16, max_queries=2)
+        source.SEARCH_BYTES = 256
+        expected = [i for i in range(1000) if "rua 5, 99" in f"rua {i % 7}, {i}"]
+        self.assertEqual(list(source.matches("RUA 5, 99")), expected)
+        self.write_rows(1000, 3000)
+        source.refresh()
+        with patch.object(source, "_search", wraps=source._search) as search:
+            found = source.matches("rua 5, 99")
+            self.assertEqual(search.call_count, 1)
+            self.assertEqual(search.call_args.args[:2], ("rua 5, 99", 1000))
+        self.assertEqual(list(found), [i for i in range(4000) if "rua 5, 99" in f"rua {i % 7}, {i}"])
+        source.matches("centro")
+        source.matches("aeroporto")
+        self.assertEqual(list(source._results), ["centro", "aeroporto"])
+        self.assertEqual(list(source.matches("rua 2, 3999")), [3999])
+
+    def test_pages_are_read_on_demand(self):
+        """Qualquer trecho é lido do disco, com cache de páginas limitado"""
+        self.assertEqual(len(self.source), 1000)
+        self.assertEqual([r[0] for r in self.source.rows(37, 3)], ["Rua 2, 37", "Rua 3, 38", "Rua 4, 39"])
+        self.assertEqual(self.source.rows(998, 10)[-1][0], "Rua 5, 999")
+        for start in range(0, 1000, 50):
+            self.source.rows(start, 6)
+        self.assertLessEqual(len(self.source._pages), 4)
+        self.assertEqual(len(self.source._offsets), 63)
+
+    def test_refresh_reads_only_new_rows(self):
+        """Viagens acrescentadas aparecem sem reindexar o arquivo"""
+        self.source.rows(992, 8)
+        self.write_rows(1000, 5)
+        with patch.object(self.source, "_reset", side_effect=AssertionError("reindexado")):
+            self.assertEqual(self.source.refresh(), 5)
+        self.assertEqual([r[0] for r in self.source.rows(998, 10)][-1], "Rua 3, 1004")
+
+    def test_search_by_address(self):
+        """A busca ignora maiúsculas e acompanha novas viagens"""
+        self.assertEqual(self.source.set_filter("rua 5, 99"), 2)
+        self.assertEqual(self.source.set_filter("aeroPORTO"), 100)
+        self.assertEqual(self.source.rows(0, 2)[1][0], "Rua 3, 10")
+
+        self.write_rows(1000, 1000)
+        self.source.refresh()
+        self.assertEqual(len(self.source), 200)
+        self.assertEqual(self.source.total, 2000)
+        self.assertEqual(self.source.rows(199, 1)[0][0], "Rua 2, 1990")
+
+        self.source.set_filter("")
+        self.assertEqual(len(self.source), 2000)
+
+    def test_replaced_file_is_reindexed(self):
+        os.remove(self.csv_path)
+        self.write_rows(500, 3, header=True)
+        self.source.refresh()
+        self.assertEqual([r[0] for r in self.source.rows(0, 10)], ["Rua 3, 500", "Rua 4, 501", "Rua 5, 502"])
+
+
+class TestAddressNormalizer(unittest.TestCase):
+    """Testes da forma canônica de endereços e dos apelidos"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.normalizer = AddressNormalizer(os.path.join(self.tmp.name, "addresses.sqlite3"))
+        self.cache = RouteCache(os.path.join(self.tmp.name, "routes_cache.sqlite3"), normalizer=self.normalizer)
+
+    def tearDown(self):
+        self.cache.close()
+        self.normalizer.close()
+        self.tmp.cleanup()
+
+    def test_canonical_form(self):
+        """Acentos, maiúsculas, abreviações, pontuação e espaços não mudam o endereço"""
+        expected = "avenida paulista 1000"
+        for text in ["Av. Paulista, 1000", "avenida paulista 1000 ", "AV PAULISTA, Nº 1000", "Avenida  Paulista n. 1000"]:
+            self.assertEqual(canonicalize_address(text), expected)
+        self.assertEqual(canonicalize_address("R. Dr. Arnaldo, 455 - São Paulo"), "rua doutor arnaldo 455 sao paulo")
+        self.assertEqual(canonicalize_address("CEP 01310-100"), "cep 01310100")
+        # "r" só é rua no começo de uma parte do endereço
+        self.assertEqual(canonicalize_address("Bloco R, Av. Brasil"), "bloco r avenida brasil")
+
+    def test_route_cache_shares_entries(self):
+        """Grafias diferentes do mesmo trajeto usam a mesma entrada do cache"""
+        self.cache.put("Av. Paulista, 1000", "R. Augusta 200", 3.2)
+        self.assertEqual(self.cache.get("avenida paulista 1000 ", "Rua Augusta, nº 200"), 3.2)
+        self.assertEqual(len(self.cache), 1)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['hit_rate'], 1.0)
+        self.assertGreater(stats['addresses']['folded'], 0)
+
+    def test_aliases_are_persistent(self):
+        """Apelidos apontam para o endereço e sobrevivem a uma nova instância"""
+        self.normalizer.add_alias("Escritório", "Av. Paulista, 1000")
+        self.cache.put("escritorio", "Aeroporto", 30.0)
+        self.assertEqual(self.cache.get("Avenida Paulista 1000", "Aeroporto"), 30.0)
+
+        other = AddressNormalizer(self.normalizer.path)
+        try:
+            self.assertEqual(other.resolve("ESCRITÓRIO"), "avenida paulista 1000")
+            self.assertEqual(other.aliases(), [("escritorio", "avenida paulista 1000")])
+            self.assertEqual(other.stats()['alias_hits'], 1)
+        finally:
+            other.close()
+
+        with self.assertRaises(ValueError):
+            self.normalizer.add_alias("Av Paulista 1000", "Avenida Paulista, 1000")
+        self.normalizer.remove_alias("escritório")
+        self.assertEqual(self.normalizer.resolve("Escritório"), "escritorio")
+
+    def test_matrix_resolver_dedupes_spellings(self):
+        """Grafias diferentes do mesmo par viram uma única consulta à API"""
+        pairs = [("Av. Paulista, 1000", "Aeroporto"), ("avenida paulista 1000", "aeroporto"), ("Rua X", "Aeroporto")]
+        with FakeRoutesServer(distance_meters=7000) as server:
+            resolver = RouteMatrixResolver("fake-key", url=server.matrix_url, cache=self.cache)
+            distances, errors = resolver.resolve(pairs)
+
+        self.assertEqual(distances, [7.0, 7.0, 7.0])
+        self.assertEqual(errors, [None] * 3)
+        self.assertEqual(len(server.requests[0]["origins"]) * len(server.requests[0]["destinations"]), 2)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_alias_is_sent_as_its_address(self):
+        """A Routes API recebe o endereço do apelido, não o nome digitado"""
+        self.normalizer.add_alias("Casa", "Rua Augusta, 200")
+        self.normalizer.add_alias("Escritório", "Av. Paulista,  1000")
+        self.normalizer.add_alias("Trabalho", "escritorio")
+        self.assertEqual(self.normalizer.request_address("ESCRITÓRIO"), "Av. Paulista, 1000")
+        self.assertEqual(self.normalizer.request_address("trabalho"), "Av. Paulista, 1000")
+        self.assertEqual(self.normalizer.request_address("Rua X"), "Rua X")
+
+        with FakeRoutesServer(distance_meters=7000) as server:
+            resolver = RouteMatrixResolver("fake-key", url=server.matrix_url, cache=self.cache)
+            distances, _ = resolver.resolve([("Escritório", "Casa")])
+        self.assertEqual(distances, [7.0])
+        self.assertEqual(server.requests[0]["origins"], [{"waypoint": {"address": "Av. Paulista, 1000"}}])
+        self.assertEqual(server.requests[0]["destinations"], [{"waypoint": {"address": "Rua Augusta, 200"}}])
+
+        async def main(url):
+            client = AsyncRoutesClient("chave", url=url, cache=self.cache)
+            try:
+                return await client.resolve_many([("Trabalho", "Aeroporto")])
+            finally:
+                await client.aclose()
+
+        with FakeRoutesServer(distance_meters=7000) as server:
+            asyncio.run(main(server.url))
+        self.assertEqual(server.requests[0]["origin"], {"address": "Av. Paulista, 1000"})
+        self.assertEqual(self.cache.get("Av Paulista 1000", "aeroporto"), 7.0)
+
+    def test_old_alias_table_gets_address_text(self):
+        """Bancos sem a coluna do texto enviado à API continuam funcionando"""
+        path = self.normalizer.path
+        self.cache.close()
+        self.normalizer.close()
+        with sqlite3.connect(path) as conn:
+            conn.execute("DROP TABLE aliases")
+            conn.execute("CREATE TABLE aliases (alias TEXT PRIMARY KEY, address TEXT NOT NULL, created_at REAL NOT NULL)")
+            conn.execute("INSERT INTO aliases VALUES ('escritorio', 'avenida paulista 1000', 0)")
+        self.normalizer = AddressNormalizer(path)
+        self.cache = RouteCache(os.path.join(self.tmp.name, "routes_cache.sqlite3"), normalizer=self.normalizer)
+        self.assertEqual(self.normalizer.request_address("Escritório"), "avenida paulista 1000")
+
+
+class TestOfflineDistanceEstimator(unittest.TestCase):
+    """Testes da estimativa de distância sem rede"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "trips.csv")
+        self.estimator = OfflineDistanceEstimator()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_trips(self, trips):
+        with open(self.csv_path, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(MileageTracker.CSV_HEADER)
+            for origin, dest, distance in trips:
+                writer.writerow([origin, dest, "0.0", f"{distance:.1f}", f"{distance:.1f}",
+                                 "0.00", "0.00", "0.00", "0.00", ""])
+
+    def straight(self, origin, dest):
+        a = self.estimator.locate(origin)
+        b = self.estimator.locate(dest)
+        return haversine_km(a[0], a[1], b[0], b[1])
+
+    def test_locate_uses_city_closest_to_the_end(self):
+        sp = self.estimator.locate("São Paulo")
+        self.assertEqual(self.estimator.locate("Rua Santos Dumont, 100 - São Paulo/SP"), sp)
+        self.assertEqual(self.estimator.locate("Av. Rio de Janeiro, Belo Horizonte")[2], "MG")
+        self.assertEqual(self.estimator.locate("Praça X, Vitória da Conquista")[2], "BA")
+        self.assertIsNone(self.estimator.locate("Rua Sem Cidade, 10"))
+        self.assertAlmostEqual(haversine_km(*sp[:2], *self.estimator.locate("Rio de Janeiro")[:2]), 361, delta=5)
+
+    def test_uncalibrated_estimate_uses_default_bound(self):
+        result = self.estimator.estimate("São Paulo", "Campinas")
+        self.assertEqual(result['samples'], 0)
+        self.assertEqual(result['error_rate'], OfflineDistanceEstimator.DEFAULT_ERROR_RATE)
+        self.assertIsNone(self.estimator.estimate("Rua A, São Paulo", "Rua B, São Paulo"))
+        self.assertIsNone(self.estimator.estimate("Rua A", "Campinas"))
+
+    def test_calibration_learns_circuity_per_region(self):
+        """O fator da região vem das viagens gravadas; erros de digitação são ignorados"""
+        sp_cities = ["Campinas", "Santos", "Sorocaba", "Jundiaí", "Piracicaba", "Bauru"]
+        trips = [(f"Centro, {city}", "Av. Paulista, São Paulo", 0) for city in sp_cities]
+        trips = [(o, d, self.straight(o, d) * (1.25 + 0.01 * i)) for i, (o, d, _) in enumerate(trips)]
+        trips.append(("Campinas", "São Paulo", 5000.0))    # hodômetro digitado errado
+        trips.append(("Rua A, São Paulo", "Rua B, São Paulo", 12.0))  # mesma cidade
+        self.write_trips(trips)
+
+        self.assertEqual(self.estimator.calibrate(self.csv_path), 6)
+        result = self.estimator.estimate("Ribeirão Preto", "São Paulo")
+        expected = self.straight("Ribeirão Preto", "São Paulo") * 1.275
+        self.assertEqual(result['region'], "SP")
+        self.assertEqual(result['samples'], 6)
+        self.assertAlmostEqual(result['distance_km'], expected, delta=0.01 * expected)
+        self.assertLess(result['error_rate'], 0.05)
+        self.assertAlmostEqual(result['error_km'], result['distance_km'] * result['error_rate'])
+
+        # outra região, sem amostras próprias, usa o fator geral
+        self.assertEqual(self.estimator.estimate("Curitiba", "Florianópolis")['samples'], 6)
+
+    def test_calibration_from_repository_trips(self):
+        """Calibra com as viagens de qualquer repositório, uma vez por origem"""
+        trips = [("Centro, Campinas", "São Paulo", self.straight("Campinas", "São Paulo") * 1.3)] * 5
+        source = MagicMock(side_effect=lambda: iter(trips))
+        self.estimator.ensure_calibrated("repositório", source)
+        self.estimator.ensure_calibrated("repositório", source)
+        source.assert_called_once_with()
+        self.assertEqual(self.estimator.estimate("Santos", "São Paulo")['samples'], 5)
+
+    def test_calibration_replaces_samples_at_the_end(self):
+        """Durante a calibração (numa thread) as estimativas usam a calibração anterior"""
+        ratio = self.straight("Campinas", "São Paulo") * 1.3
+        seen = []
+
+        def trips():
+            for i in range(10):
+                if i == 8:
+                    seen.append(self.estimator.estimate("Santos", "São Paulo")['samples'])
+                yield ("Centro, Campinas", "São Paulo", ratio)
+
+        self.assertFalse(self.estimator.is_calibrated("repositório"))
+        self.estimator.ensure_calibrated("repositório", trips)
+        self.assertEqual(seen, [0])
+        self.assertTrue(self.estimator.is_calibrated("repositório"))
+        self.assertEqual(self.estimator.estimate("Santos", "São Paulo")['samples'], 10)
+
+    def test_estimate_is_fast(self):
+        self.estimator.estimate("Av. Paulista, São Paulo", "Centro, Campinas")
+        start = time.perf_counter()
+        for _ in range(1000):
+            self.estimator.estimate("Av. Paulista, São Paulo", "Centro, Campinas")
+        self.assertLess((time.perf_counter() - start) / 1000, 0.0005)
+
+
+class TestMetrics(unittest.TestCase):
+    """Testes das métricas de tempo e contadores"""
+
+    def test_disabled_records_nothing(self):
+        metrics = Metrics(enabled=False)
+        self.assertIs(metrics.span("a"), metrics.span("b"))
+        with metrics.span("validate"):
+            pass
+        metrics.inc("api_failures")
+        metrics.observe("csv_append", 0.5)
+        self.assertEqual(metrics.snapshot(), {'timings': [], 'counters': []})
+
+    def test_quantiles_and_counters(self):
+        metrics = Metrics(window=100)
+        for ms in range(1, 201):
+            metrics.observe("routes_lookup", ms / 1000)
+        with metrics.span("csv_append"):
+            pass
+        metrics.inc("api_failures")
+        metrics.inc("trips_saved", source="gmaps")
+        metrics.inc("trips_saved", 2, source="gmaps")
+
+        snapshot = metrics.snapshot()
+        lookup = snapshot['timings'][1]
+        self.assertEqual(lookup['name'], "routes_lookup")
+        self.assertEqual(lookup['count'], 200)
+        self.assertAlmostEqual(lookup['sum'], 20.1)
+        # quantis só das últimas 100 medições (101..200 ms)
+        self.assertAlmostEqual(lookup['p50'], 0.150)
+        self.assertAlmostEqual(lookup['p95'], 0.195)
+        self.assertAlmostEqual(lookup['p99'], 0.199)
+        self.assertEqual(snapshot['timings'][0]['count'], 1)
+        self.assertIn({'name': "trips_saved", 'labels': {'source': "gmaps"}, 'value': 3},
+                      snapshot['counters'])
+
+        text = metrics.render_prometheus()
+        self.assertIn("# TYPE mileage_routes_lookup_seconds summary", text)
+        self.assertIn('mileage_routes_lookup_seconds{quantile="0.99"} 0.199', text)
+        self.assertIn("mileage_routes_lookup_seconds_count 200", text)
+        self.assertIn("mileage_api_failures_total 1", text)
+        self.assertIn('mileage_trips_saved_total{source="gmaps"} 3', text)
+
+    def test_http_endpoint_and_json_dump(self):
+        metrics = Metrics()
+        metrics.inc("odometer_fallbacks")
+        port = metrics.serve(port=0)
+        try:
+            import urllib.request
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+                body = response.read().decode("utf-8")
+        finally:
+            metrics.close()
+        self.assertIn("mileage_odometer_fallbacks_total 1", body)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metrics.json")
+            metrics.dump_json(path)
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        self.assertEqual(data['counters'][0]['value'], 1)
+
+    def test_disabled_overhead_is_small(self):
+        metrics = Metrics(enabled=False)
+        start = time.perf_counter()
+        for _ in range(10000):
+            with metrics.span("validate"):
+                pass
+            metrics.inc("api_failures")
+        self.assertLess((time.perf_counter() - start) / 10000, 0.00002)
+
+
+class TestTripLog(unittest.TestCase):
+    """Testes da gravação concorrente do trips.csv"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "trips.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_rows(self):
+        with open(self.csv_path, newline='', encoding='utf-8') as f:
+            return list(csv.reader(f))
+
+    def test_same_format_as_csv_writer(self):
+        log = TripLog(self.csv_path, MileageTracker.CSV_HEADER)
+        row = ['Rua "A", 10', "Av. B", "1.0", "2.0", "1.0", "0.00", "0.00", "0.50", "0.50", ""]
+        log.append(row)
+        log.close()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(MileageTracker.CSV_HEADER)
+        writer.writerow(row)
+        with open(self.csv_path, encoding='utf-8', newline='') as f:
+            self.assertEqual(f.read(), buffer.getvalue())
+
+    def test_concurrent_writers_share_header_and_never_interleave(self):
+        """Duas instâncias (como dois trackers no mesmo volume) e várias threads"""
+        logs = [TripLog(self.csv_path, MileageTracker.CSV_HEADER) for _ in range(2)]
+
+        def write(n):
+            log = logs[n % 2]
+            for i in range(50):
+                log.append([f"Origem {n}-{i}", "Destino " + "x" * 200, "0.0", "1.0"])
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        rows = self.read_rows()
+        self.assertEqual(rows[0], MileageTracker.CSV_HEADER)
+        self.assertEqual(len(rows), 1 + 8 * 50)
+        self.assertEqual(sorted(r[0] for r in rows[1:]),
+                         sorted(f"Origem {n}-{i}" for n in range(8) for i in range(50)))
+        self.assertTrue(all(len(r) == 4 for r in rows[1:]))
+        stats = [log.stats() for log in logs]
+        self.assertEqual(sum(s['rows'] for s in stats), 400)
+        # threads que chegam durante uma gravação entram no lote seguinte
+        self.assertLess(sum(s['batches'] for s in stats), 400)
+        for log in logs:
+            log.close()
+
+    def test_torn_trailing_row_is_truncated(self):
+        log = TripLog(self.csv_path, ["a", "b"])
+        log.append(["1", "2"])
+        with open(self.csv_path, "ab") as f:
+            f.write(b"3,4")  # processo interrompido no meio da linha
+        self.assertEqual(log.recover(), 3)
+        self.assertEqual(log.recover(), 0)
+        with open(self.csv_path, "ab") as f:
+            f.write(b"5," + b"6" * 20000)
+        log.append(["7", "8"])
+        self.assertEqual(self.read_rows(), [["a", "b"], ["1", "2"], ["7", "8"]])
+        self.assertEqual(log.stats()['recovered_bytes'], 3 + 20002)
+
+        # cabeçalho incompleto: o arquivo volta a ficar vazio e ganha cabeçalho
+        with open(self.csv_path, "wb") as f:
+            f.write(b"a,")
+        log.append(["9", "10"])
+        self.assertEqual(self.read_rows(), [["a", "b"], ["9", "10"]])
+        log.close()
+
+
+class TestTripServer(unittest.TestCase):
+    """Testes do serviço HTTP (asyncio)"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = TripService(self.tmp.name, sync=False)
+
+    def tearDown(self):
+        self.service.close()
+        self.tmp.cleanup()
+
+    def run_with_server(self, scenario):
+        async def main():
+            server = TripServer(self.service)
+            port = await server.start("127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+            async def request(method, path, payload=None):
+                body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+                writer.write(
+                    f"{method} {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                head = await reader.readuntil(b"\r\n\r\n")
+                status = int(head.split(b" ")[1])
+                length = int(head.lower().split(b"content-length: ")[1].split(b"\r\n")[0])
+                data = await reader.readexactly(length)
+                return status, json.loads(data) if b"json" in head else data.decode()
+
+            try:
+                await scenario(request, port)
+            finally:
+                writer.close()
+                await server.close()
+
+        asyncio.run(main())
+
+    def trip(self, i, **extra):
+        return {"origin": f"Rua {i}", "destination": "Av. Paulista", "start_odometer": 100,
+                "end_odometer": 100 + i, **extra}
+
+    def test_does_not_import_tkinter(self):
+        """O serviço e a migração de backend rodam em máquinas sem tkinter"""
+        code = (
+            "import sys; from app import server, repository; "
+            "sys.exit('tkinter' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0)
+
+    def test_non_finite_numbers_are_rejected(self):
+        """nan, inf e 1e400 devolvem 400 e não chegam ao trips.csv"""
+        async def scenario(request, port):
+            for value in ("nan", "inf", "1e400", float("nan"), float("inf")):
+                status, body = await request("POST", "/trips", self.trip(1, end_odometer=value))
+                self.assertEqual(status, 400, value)
+                status, body = await request("POST", "/price", {"distance": value})
+                self.assertEqual(status, 400, value)
+            status, body = await request("GET", "/trips")
+            self.assertEqual(body['total'], 0)
+
+        self.run_with_server(scenario)
+
+    def test_price_and_errors(self):
+        async def scenario(request, port):
+            status, body = await request("POST", "/price", {"distance": "100,5", "tolls": 10})
+            self.assertEqual(status, 200)
+            self.assertEqual(body, ExpenseCalculator().calculate_total_expense(100.5, 10, 0))
+            status, body = await request("POST", "/price", {"tolls": 10})
+            self.assertEqual(status, 400)
+            self.assertIn("distance", body['error'])
+            self.assertEqual((await request("GET", "/price"))[0], 405)
+            self.assertEqual((await request("GET", "/nada"))[0], 404)
+            self.assertEqual((await request("GET", "/health"))[1], {'status': "ok"})
+
+        self.run_with_server(scenario)
+
+    def test_submit_and_query_history(self):
+        async def scenario(request, port):
+            status, trip = await request("POST", "/trips", self.trip(10, timestamp="2024-03-05T10:00:00"))
+            self.assertEqual(status, 201)
+            self.assertEqual(trip['distance'], "10.0")
+            self.assertEqual(trip['total_expense'], "5.00")
+            await request("POST", "/trips", self.trip(20, timestamp="2024-04-01T09:00:00", destination="Centro"))
+            status, body = await request("POST", "/trips", {"origin": "A"})
+            self.assertEqual(status, 400)
+
+            status, body = await request("GET", "/trips?limit=1")
+            self.assertEqual(body['total'], 2)
+            self.assertEqual([t['origin'] for t in body['trips']], ["Rua 20"])
+            body = (await request("GET", "/trips?q=paulista"))[1]
+            self.assertEqual([t['origin'] for t in body['trips']], ["Rua 10"])
+            body = (await request("GET", "/trips?from=2024-03-01&to=2024-04-01"))[1]
+            self.assertEqual([t['timestamp'] for t in body['trips']], ["2024-03-05T10:00:00"])
+            self.assertEqual((await request("GET", "/trips?limit=-1"))[0], 400)
+
+        self.run_with_server(scenario)
+        with open(self.service.csv_path, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], MileageTracker.CSV_HEADER)
+        self.assertEqual(len(rows), 3)
+
+    def test_concurrent_submissions(self):
+        async def scenario(request, port):
+            async def submit(i):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                body = json.dumps(self.trip(i)).encode()
+                writer.write(
+                    b"POST /trips HTTP/1.1\r\nConnection: close\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                response = await reader.read()
+                writer.close()
+                return response.split(b" ")[1]
+
+            statuses = await asyncio.gather(*(submit(i) for i in range(1, 51)))
+            self.assertEqual(set(statuses), {b"201"})
+            self.assertEqual((await request("GET", "/trips"))[1]['total'], 50)
+
+        self.run_with_server(scenario)
+        self.assertEqual(self.service.repository.log.stats()['rows'], 50)
+
+    def test_sqlite_backend_shares_the_app_store(self):
+        """Com TRIPS_BACKEND=sqlite o serviço grava e lê o mesmo banco do aplicativo"""
+        service = TripService(self.tmp.name, sync=False, backend="sqlite")
+        try:
+            for i in range(1, 6):
+                service.submit(self.trip(i, destination="Centro" if i % 2 else "Av. Paulista",
+                                         timestamp=f"2024-03-0{i}"))
+            recent = service.recent(limit=1, offset=1, query="paulista")
+            between = service.between("2024-03-02", "2024-03-04")
+        finally:
+            service.close()
+
+        repository = SqliteTripRepository(sqlite_path(self.service.csv_path))
+        try:
+            self.assertEqual(len(repository), 5)
+            self.assertEqual([r[0] for r in repository.recent(2, destination="av paulista")], ["Rua 4", "Rua 2"])
+        finally:
+            repository.close()
+        self.assertEqual(recent['total'], 2)
+        self.assertEqual([t['origin'] for t in recent['trips']], ["Rua 2"])
+        self.assertEqual([t['origin'] for t in between['trips']], ["Rua 2", "Rua 3"])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "trips.csv.idx")))
+
+    def test_history_queries_run_off_the_event_loop(self):
+        """Consultas ao histórico rodam em threads; buscas alternadas não releem o CSV"""
+        for i in range(1, 31):
+            self.service.submit(self.trip(i, destination="Centro" if i % 3 else "Av. Paulista"))
+        threads = []
+        for name in ("recent", "between"):
+            method = getattr(self.service, name)
+
+            def wrapper(*args, method=method):
+                threads.append(threading.current_thread())
+                return method(*args)
+
+            setattr(self.service, name, wrapper)
+
+        async def scenario(request, port):
+            loop_thread = threading.current_thread()
+            with patch.object(self.service.history, "_search", wraps=self.service.history._search) as search:
+                for q in ("paulista", "centro", "paulista", "centro"):
+                    body = (await request("GET", f"/trips?q={q}&limit=5"))[1]
+                    self.assertEqual(body['total'], 10 if q == "paulista" else 20)
+                self.assertEqual(search.call_count, 2)
+            self.assertEqual(body['trips'][0]['origin'], "Rua 29")
+            self.assertEqual((await request("GET", "/trips?from=2000-01-01"))[0], 200)
+            self.assertEqual((await request("GET", "/trips"))[1]['total'], 30)
+            self.assertEqual(len(threads), 6)
+            self.assertNotIn(loop_thread, threads)
+
+        self.run_with_server(scenario)
+
+
+class TestRunningTotals(unittest.TestCase):
+    """Testes dos totais acumulados (trips.csv.totals)"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "trips.csv")
+        self.log = TripLog(self.csv_path, MileageTracker.CSV_HEADER, sync=False)
+
+    def tearDown(self):
+        self.log.close()
+        self.tmp.cleanup()
+
+    def row(self, origin, total, timestamp):
+        return [origin, "Centro", "0.0", "10.0", "10.0", "0.00", "0.00", total, total, timestamp]
+
+    def test_incremental_totals_match_full_recompute(self):
+        self.log.append_many([
+            self.row("A", "10.00", "2024-03-01T08:00:00"),
+            self.row("B", "2.50", "2024-04-02T08:00:00"),
+            self.row("A", "0.125", ""),
+        ])
+        totals = RunningTotals(self.csv_path, checkpoint_every=1)
+        self.assertEqual(totals.lifetime()['total_expense'], Decimal("12.625"))
+        self.assertEqual(totals.lifetime()['trips'], 3)
+        self.assertEqual(totals.month("2024-03")['total_expense'], Decimal("10.00"))
+        self.assertEqual(totals.month("1999-01")['trips'], 0)
+
+        self.log.append(self.row("A", "1.10", "2024-03-09T08:00:00"))
+        self.assertEqual(totals.update(), 1)
+        self.assertEqual(totals.month("2024-03")['trips'], 2)
+        self.assertEqual(totals.by_route()["A → Centro"]['total_expense'], Decimal("11.225"))
+        self.assertEqual(totals.verify(), [])
+
+        # reaberto a partir do arquivo auxiliar, sem reler o CSV
+        reopened = RunningTotals(self.csv_path)
+        with patch.object(RunningTotals, "_add_tail") as add_tail:
+            self.assertEqual(reopened.lifetime(), totals.lifetime())
+        add_tail.assert_not_called()
+
+    def test_unsaved_trips_are_reread_and_replaced_csv_is_rebuilt(self):
+        self.log.append(self.row("A", "1.00", "2024-03-01T08:00:00"))
+        RunningTotals(self.csv_path).update()  # primeira soma sempre é gravada
+        self.log.append(self.row("B", "2.00", "2024-03-02T08:00:00"))
+        RunningTotals(self.csv_path).update()  # menos que checkpoint_every: não grava
+        self.assertEqual(RunningTotals(self.csv_path).lifetime()['trips'], 2)
+
+        os.remove(self.csv_path)
+        self.log.append(self.row("C", "5.00", "2024-05-01T08:00:00"))
+        totals = RunningTotals(self.csv_path)
+        self.assertEqual(totals.lifetime()['total_expense'], Decimal("5.00"))
+        self.assertEqual(totals.verify(), [])
+
+        # edição no meio do arquivo não é vista pela soma incremental, mas o verify acusa
+        self.log.append_many([self.row("D", "1.00", "2024-05-02T08:00:00")] * 3)
+        totals.update()
+        with open(self.csv_path, "r+b") as f:
+            f.seek(f.read().index(b"5.00"))
+            f.write(b"6")
+        self.assertTrue(totals.verify())
+        totals.rebuild()
+        self.assertEqual(totals.verify(), [])
+
+
+class TestStartup(unittest.TestCase):
+    """Testes da abertura rápida da janela"""
+
+    def test_import_does_not_load_requests(self):
+        """Importar o app não carrega requests nem http.server"""
+        code = (
+            "import sys; import app.app; "
+            "sys.exit('requests' in sys.modules or 'http.server' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0)
+
+    def test_history_loads_after_first_paint(self):
+        """O histórico e os totais chegam depois da janela, sem bloquear o construtor"""
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "data", "trips.csv")
+            log = TripLog(csv_path, MileageTracker.CSV_HEADER, sync=False)
+            log.append_many([
+                ["A", "B", "0.0", "10.0", "10.0", "0.00", "0.00", "5.00", "5.00", "2024-01-01T08:00:00"]
+            ] * 500)
+            log.close()
+
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            root = tk.Tk()
+            try:
+                app = MileageTracker(root)
+                root.withdraw()
+                self.assertIsNone(app.history.source)
+                for _ in range(500):
+                    root.update()
+                    if app.history.source is not None and app._background_load is None:
+                        break
+                    threading.Event().wait(0.01)
+                else:
+                    self.fail("a carga do histórico não terminou")
+                self.assertEqual(len(app.history.source), 500)
+                self.assertIn("500 viagens", app.totals_label.cget("text"))
+            finally:
+                root.destroy()
+                os.chdir(cwd)
+
+
+class TestImporter(unittest.TestCase):
+    """Testes da importação em massa (app/importer.py)"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "data", "trips.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_trips(self):
+        with open(self.csv_path, newline='', encoding='utf-8') as f:
+            return list(csv.reader(f))
+
+    def test_imports_spreadsheet_and_rejects_invalid_rows(self):
+        """Planilha com ';' e vírgula decimal; linhas inválidas vão para o arquivo de rejeitados"""
+        source = io.StringIO(
+            "Origem;Destino;KM inicial;KM final;Pedágio;Data\r\n"
+            "Rua A;Rua B;100,5;150,5;5,50;2024-03-01T08:00:00\r\n"
+            "Rua C;;1;2;0;\r\n"
+            "Rua D;Rua E;200;150;0;\r\n"
+            "Rua F;Rua G;abc;30;0;\r\n"
+            "Rua H;Rua I;10;30;;2024-03-02T09:00:00\r\n"
+        )
+        rejects = RejectWriter(os.path.join(self.tmp.name, "rejeitados.jsonl"))
+        stats = TripImporter(self.csv_path, sync=False).run(read_csv(source), rejects)
+        rejects.close()
+
+        self.assertEqual((stats['read'], stats['imported'], stats['rejected']), (5, 2, 3))
+        rows = self.read_trips()
+        self.assertEqual(rows[0], MileageTracker.CSV_HEADER)
+        self.assertEqual(rows[1], ["Rua A", "Rua B", "100.5", "150.5", "50.0", "5.50", "0.00", "25.00", "30.50", "2024-03-01T08:00:00"])
+        self.assertEqual(rows[2][0], "Rua H")
+        with open(rejects.path, encoding='utf-8') as f:
+            rejected = [json.loads(line) for line in f]
+        self.assertEqual([r['line'] for r in rejected], [3, 4, 5])
+        self.assertIn("obrigatórios", rejected[0]['error'])
+        self.assertEqual(rejected[1]['record']['KM final'], "150")
+
+    def test_non_finite_rows_are_rejected(self):
+        """nan, inf e 1e400 vão para o arquivo de rejeitados; as outras linhas são importadas"""
+        source = io.StringIO(
+            "origem,destino,km_inicial,km_final,pedagio\n"
+            "A,B,0,10,0\n"
+            "A,B,0,nan,0\n"
+            "A,B,0,20,inf\n"
+            "A,B,0,1e400,0\n"
+            "A,B,0,30,0\n"
+        )
+        rejects = RejectWriter(os.path.join(self.tmp.name, "rejeitados.jsonl"))
+        stats = TripImporter(self.csv_path, sync=False).run(read_csv(source), rejects)
+        rejects.close()
+
+        self.assertEqual((stats['imported'], stats['rejected']), (2, 3))
+        self.assertEqual([r[3] for r in self.read_trips()[1:]], ["10.0", "30.0"])
+        with open(rejects.path, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['line'] for line in f], [3, 4, 5])
+
+    def test_dates_are_stored_as_iso(self):
+        """Datas com o dia primeiro viram ISO; formatos desconhecidos são rejeitados"""
+        source = io.StringIO(
+            "origem,destino,km_inicial,km_final,data\n"
+            "A,B,0,10,01/03/2024\n"
+            "A,B,0,10,05/03/2024 08:30\n"
+            "A,B,0,10,março de 2024\n"
+            "A,B,0,10,31/02/2024\n"
+        )
+        rejects = RejectWriter(os.path.join(self.tmp.name, "rejeitados.jsonl"))
+        stats = TripImporter(self.csv_path, sync=False).run(read_csv(source), rejects)
+        rejects.close()
+
+        self.assertEqual((stats['imported'], stats['rejected']), (2, 2))
+        self.assertEqual([r[-1] for r in self.read_trips()[1:]], ["2024-03-01", "2024-03-05T08:30:00"])
+        with open(rejects.path, encoding='utf-8') as f:
+            self.assertTrue(all("data inválida" in json.loads(line)['error'] for line in f))
+
+    def test_resolved_distances_keep_input_order(self):
+        """Lotes consultados em paralelo são gravados na ordem da entrada"""
+        class SlowResolver:
+            def resolve(self, pairs):
+                # lotes anteriores demoram mais: terminam fora de ordem
+                time.sleep(0.02 * (int(pairs[0][0]) % 3))
+                return [None if int(o) % 5 == 0 else 7.0 for o, d in pairs], [None] * len(pairs)
+
+        records = [
+            (i + 2, {"origin": str(i), "destination": "X", "start_odometer": "0", "end_odometer": "10"})
+            for i in range(60)
+        ]
+        stats = TripImporter(self.csv_path, resolver=SlowResolver(), batch_size=4, sync=False).run(records)
+
+        rows = self.read_trips()[1:]
+        self.assertEqual([r[0] for r in rows], [str(i) for i in range(60)])
+        self.assertEqual([r[4] for r in rows[:6]], ["10.0", "7.0", "7.0", "7.0", "7.0", "10.0"])
+        self.assertEqual(stats['resolved'], 48)
+
+    def test_write_failure_stops_import(self):
+        """Falha ao gravar interrompe a importação com o erro"""
+        records = [
+            (i + 2, {"origin": "A", "destination": "B", "start_odometer": "0", "end_odometer": "1"})
+            for i in range(100)
+        ]
+        importer = TripImporter(self.csv_path, batch_size=10, queue_size=1, sync=False)
+        with patch.object(TripLog, "append_many", side_effect=OSError("disco cheio")):
+            with self.assertRaises(OSError):
+                importer.run(iter(records))
+
+
+class TestRecords(unittest.TestCase):
+    """Testes dos registros Trip/Expense e do resumo memorizado"""
+
+    def setUp(self):
+        self.calculator = ExpenseCalculator(km_rate=0.50)
+        self.trip = Trip("A", "B", 100.0, 150.5, 50.5, 12.345, 9.876, "2024-03-01T08:00:00")
+
+    def test_expense_matches_calculate_total_expense(self):
+        """calculate_expense e calculate_total_expense devolvem os mesmos valores"""
+        expense = self.calculator.price_trip(self.trip)
+        self.assertEqual(expense.as_dict(), self.calculator.calculate_total_expense(50.5, 12.345, 9.876))
+        self.assertEqual(expense['total'], expense.total)
+        with self.assertRaises(KeyError):
+            expense['nada']
+
+    def test_summary_from_computed_expense(self):
+        """O resumo sai do resultado já calculado e é reaproveitado"""
+        expense = self.calculator.price_trip(self.trip)
+        format_summary.cache_clear()
+        summary = format_summary(expense)
+        self.assertEqual(summary, self.calculator.get_expense_summary(50.5, 12.345, 9.876))
+        self.assertIs(format_summary(Expense(**expense.as_dict())), summary)
+        self.assertGreaterEqual(format_summary.cache_info().hits, 1)
+
+    def test_records_are_compact_and_immutable(self):
+        """Sem __dict__ por instância e sem alteração depois de criado"""
+        self.assertFalse(hasattr(self.trip, "__dict__"))
+        with self.assertRaises(AttributeError):
+            self.trip.distance = 10
+        moved = self.trip.with_distance(80.0)
+        self.assertEqual((moved.distance, self.trip.distance), (80.0, 50.5))
+
+    def test_to_row(self):
+        """Linha no formato do trips.csv"""
+        row = self.trip.to_row(self.calculator.price_trip(self.trip))
+        self.assertEqual(row, ["A", "B", "100.0", "150.5", "50.5", "12.35", "9.88", "25.25", "47.48", "2024-03-01T08:00:00"])
+        self.assertEqual(len(row), len(MileageTracker.CSV_HEADER))
+
+
+class TestRepository(unittest.TestCase):
+    """Testes dos repositórios de viagens (CSV e SQLite)"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, "trips.csv")
+        self.rows = []
+        for i in range(300):
+            distance = 10 + i % 17
+            self.rows.append([
+                f"Rua {i % 7}", f"Av. {i % 5}", "0.0", f"{distance:.1f}", f"{distance:.1f}", "0.00", "1.50",
+                f"{distance / 2:.2f}", f"{distance / 2 + 1.5:.2f}",
+                f"2024-{i % 3 + 1:02d}-{i % 28 + 1:02d}T08:00:00" if i % 50 else "",
+            ])
+        self.csv = CsvTripRepository(self.csv_path, sync=False)
+        self.csv.append_many(self.rows)
+        self.sqlite = SqliteTripRepository(sqlite_path(self.csv_path), csv_path=self.csv_path)
+
+    def tearDown(self):
+        self.csv.close()
+        self.sqlite.close()
+        self.tmp.cleanup()
+
+    def test_migrated_sqlite_matches_csv(self):
+        """Depois da migração, o SQLite responde igual ao CSV"""
+        self.assertEqual(migrate_csv(self.csv_path, self.sqlite, batch_size=64), 300)
+        self.assertEqual(len(self.sqlite), 300)
+        for month in ("2024-02", "2023-12"):
+            self.assertEqual(self.sqlite.totals(month), self.csv.totals(month))
+        self.assertEqual(self.sqlite.recent(20, destination="  av. 3 "), self.csv.recent(20, destination="Av. 3"))
+        self.assertEqual(self.sqlite.recent(5, origin="Rua 2", destination="Av. 2"), self.csv.recent(5, origin="Rua 2", destination="Av. 2"))
+        self.assertEqual(self.sqlite.recent(3), self.rows[::-1][:3])
+        self.assertEqual(list(self.sqlite.between("2024-02-01", "2024-03-01")), list(self.csv.between("2024-02-01", "2024-03-01")))
+
+    def test_history_source(self):
+        """A lista de histórico lê páginas e filtra por endereço no SQLite"""
+        self.sqlite.append_many(self.rows)
+        source = self.sqlite.history()
+        self.assertIs(source, self.sqlite.history())
+        source.refresh()
+        self.assertEqual(len(source), 300)
+        self.assertEqual(source.rows(295, 5), self.rows[295:])
+        self.assertEqual(source.set_filter("av. 4"), 60)
+        self.assertTrue(all(row[1] == "Av. 4" for row in source.rows(0, 60)))
+        self.sqlite.append(self.rows[4])
+        self.assertEqual(source.refresh(), 1)
+        self.assertEqual(len(source), 61)
+
+    def test_migration_only_into_empty_database(self):
+        """A migração não duplica viagens num banco que já tem dados"""
+        migrate_csv(self.csv_path, self.sqlite)
+        with self.assertRaises(ValueError):
+            migrate_csv(self.csv_path, self.sqlite)
+        self.assertEqual(len(self.sqlite), 300)
+
+    def test_open_repository(self):
+        """TRIPS_BACKEND escolhe o repositório"""
+        repository = open_repository("sqlite", self.csv_path)
+        self.assertIsInstance(repository, SqliteTripRepository)
+        self.assertEqual(repository.path, os.path.join(self.tmp.name, "trips.sqlite3"))
+        repository.close()
+        with self.assertRaises(ValueError):
+            open_repository("postgres", self.csv_path)
+
+    def test_repository_is_abstract(self):
+        with self.assertRaises(TypeError):
+            TripRepository()
+
+    def test_both_backends_use_the_address_normalizer(self):
+        """Grafias e apelidos do AddressNormalizer valem no CSV e no SQLite"""
+        normalizer = AddressNormalizer(os.path.join(self.tmp.name, "addresses.sqlite3"))
+        normalizer.add_alias("Escritório", "Avenida Paulista, 1000")
+        row = ["Escritório", "R. Augusta nº 50", "0.0", "1.0", "1.0", "0.00", "0.00", "0.50", "0.50", ""]
+        csv_repo = CsvTripRepository(os.path.join(self.tmp.name, "b.csv"), sync=False, normalizer=normalizer)
+        sqlite = SqliteTripRepository(os.path.join(self.tmp.name, "b.sqlite3"), normalizer=normalizer)
+        for repository in (csv_repo, sqlite):
+            repository.append(row)
+            self.assertEqual(repository.recent(5, origin="av. paulista 1000", destination="Rua Augusta, 50"), [row])
+        source = sqlite.history()
+        source.refresh()
+        self.assertEqual(source.set_filter("escritório"), 1)
+        csv_repo.close()
+        sqlite.close()
+        normalizer.close()
+
+    def test_old_sqlite_keys_are_recomputed(self):
+        """Bancos com chaves de uma versão anterior são atualizados ao abrir"""
+        self.sqlite.append_many(self.rows)
+        path = self.sqlite.path
+        self.sqlite.close()
+        with sqlite3.connect(path) as conn:
+            conn.execute("UPDATE trips SET origin_key = lower(origin), destination_key = lower(destination)")
+            conn.execute("PRAGMA user_version = 0")
+        self.sqlite = SqliteTripRepository(path)
+        self.assertEqual(len(self.sqlite.recent(100, destination="Avenida 3")), 60)
+        self.assertEqual(self.sqlite.stats()['addresses'], 12)
+
+    def test_trips_in_order(self):
+        self.sqlite.append_many(self.rows)
+        self.assertEqual(list(self.sqlite.trips(page=64)), self.rows)
+        self.assertEqual(list(self.csv.trips()), self.rows)
+
+
+class TestAsyncRoutes(unittest.TestCase):
+    """Testes do cliente asyncio da Routes API"""
+
+    def resolve(self, url, pairs, **options):
+        async def main():
+            client = AsyncRoutesClient("chave", url=url, backoff_base=0.01, **options)
+            try:
+                return await client.resolve_many(pairs), client.stats()
+            finally:
+                await client.aclose()
+
+        return asyncio.run(main())
+
+    def test_identical_pairs_share_one_request(self):
+        """Pares iguais em andamento viram uma só requisição"""
+        pairs = [(f"Origem {i % 5}", "Destino") for i in range(40)]
+        with FakeRoutesServer(distance_meters=12345) as server:
+            (distances, errors), stats = self.resolve(server.url, pairs, max_concurrency=4)
+        self.assertEqual(distances, [12.345] * 40)
+        self.assertEqual(errors, [None] * 40)
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(stats['coalesced'], 35)
+        # a ordem de chegada das requisições simultâneas não é fixa
+        self.assertEqual(
+            sorted(server.requests, key=lambda r: r["origin"]["address"]),
+            [
+                {"origin": {"address": f"Origem {i}"}, "destination": {"address": "Destino"}, "travelMode": "DRIVE"}
+                for i in range(5)
+            ],
+        )
+        self.assertEqual(set(server.hosts), {server.url.split("/")[2]})
+
+    def test_concurrency_limit(self):
+        """Nunca mais que max_concurrency requisições ao mesmo tempo"""
+        pairs = [(f"Origem {i}", "Destino") for i in range(12)]
+        with FakeRoutesServer() as server:
+            (distances, _), stats = self.resolve(server.url, pairs, max_concurrency=3)
+        self.assertEqual(len(server.requests), 12)
+        self.assertEqual(stats['max_in_flight'], 3)
+        self.assertLessEqual(stats['connections'], 3)
+
+    def test_error_body_and_retry(self):
+        """Status transitório é repetido; 4xx mostra a mensagem do Google"""
+        with FakeRoutesServer(status=[503, 200]) as server:
+            (distances, _), stats = self.resolve(server.url, [("A", "B")])
+        self.assertEqual(distances, [12.345])
+        self.assertEqual(stats['retries'], 1)
+        with FakeRoutesServer(status=400) as server:
+            (distances, errors), _ = self.resolve(server.url, [("A", "B")])
+        self.assertEqual(distances, [None])
+        self.assertIn("Erro HTTP 400", errors[0])
+        self.assertIn("erro simulado", errors[0])
+
+    def test_invalid_distance(self):
+        """distanceMeters <= 0 é rejeitado como no get_distance_from_gmaps"""
+        with FakeRoutesServer(distance_meters=0) as server:
+            (distances, errors), _ = self.resolve(server.url, [("A", "B")])
+        self.assertEqual(distances, [None])
+        self.assertIn("inválida", errors[0])
+
+    def test_request_deadline(self):
+        """Servidor que não responde: a requisição falha no prazo"""
+        with socket.create_server(("127.0.0.1", 0)) as silent:
+            url = f"http://127.0.0.1:{silent.getsockname()[1]}/directions/v2:computeRoutes"
+            start = time.monotonic()
+            (distances, errors), _ = self.resolve(url, [("A", "B"), ("C", "D")], timeout=0.2, max_retries=0)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(distances, [None, None])
+        self.assertIn("Tempo esgotado", errors[0])
+
+    def test_resolver_interface(self):
+        """AsyncRoutesResolver.resolve funciona fora de código assíncrono e usa o cache"""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RouteCache(os.path.join(tmp, "routes.sqlite3"))
+            with FakeRoutesServer(distance_meters=5000) as server:
+                resolver = AsyncRoutesResolver("chave", url=server.url, cache=cache)
+                first = resolver.resolve([("A", "B"), (" a ", "b")])
+                second = resolver.resolve([("A", "B")])
+            cache.close()
+        self.assertEqual(first, ([5.0, 5.0], [None, None]))
+        self.assertEqual(second, ([5.0], [None]))
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(resolver.last_stats['cache_hits'], 1)
+        self.assertEqual(AsyncRoutesResolver("").resolve([("A", "B")])[0], [None])
 
 
 if __name__ == "__main__":